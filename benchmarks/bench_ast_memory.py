@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory held by a parsed program as node objects and as a
+FlatAST.
+
+tracemalloc counts the memory blocks and bytes still held once each
+representation is built. The flat encoding shares its strings with the
+tokens, so only its columns and string table are counted.
+"""
+
+import os
+import sys
+import argparse
+import tracemalloc
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+from src.parser.flat import FlatAST
+from bench_parser import build_source
+
+
+def retained(build):
+    """Return (result, blocks, bytes) still allocated after build()."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    return (result, sum(stat.count_diff for stat in stats),
+            sum(stat.size_diff for stat in stats))
+
+
+def megabytes(count):
+    return f"{count / (1 << 20):8.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AST memory use')
+    parser.add_argument('--statements', type=int, default=5000, help='Number of assignments')
+    parser.add_argument('--length', type=int, default=20, help='Operands per expression')
+    args = parser.parse_args()
+
+    tokens = Lexer(build_source(args.statements, args.length)).tokenize()
+    ast, node_blocks, node_bytes = retained(lambda: Parser(tokens).parse())
+    flat, flat_blocks, flat_bytes = retained(lambda: FlatAST.from_ast(ast))
+
+    print(f"{len(flat)} nodes, {len(flat.strings)} distinct strings")
+    print(f"     nodes: {node_blocks:>9} blocks, retained {megabytes(node_bytes)}")
+    print(f"      flat: {flat_blocks:>9} blocks, retained {megabytes(flat_bytes)}")
+    print(f"Flat AST: {node_bytes / max(flat_bytes, 1):.1f}x less memory, "
+          f"{node_blocks / max(flat_blocks, 1):.0f}x fewer blocks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark the execution engines on small compute-bound programs, or with
+--examples on the programs in examples/.
+
+Each program is parsed and optimized once, then run on a fresh instance
+of every engine. Compilation is part of the measured time, since that is
+what running a program costs (the python engine's code cache is not
+used).
+"""
+
+import io
+import os
+import glob
+import sys
+import time
+import argparse
+import contextlib
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+from src.optimizer import Optimizer
+from src.interpreter import Interpreter
+from src.interpreter.closures import ClosureInterpreter
+from src.bytecode.vm import VirtualMachine
+from src.transpiler.pycode import PythonCompiler, run, program_variables
+from src.parser.cache import parse_file
+
+ENGINES = {
+    'ast': Interpreter,
+    'closures': ClosureInterpreter,
+    'bytecode': VirtualMachine,
+    'python': PythonCompiler,
+}
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+PROGRAMS = {
+    'fib': """
+def fib(n):
+    if n < 2: return n
+    return fib(n - 1) + fib(n - 2)
+x = fib({size})
+""",
+    'loops': """
+def row(i):
+    j = 0
+    total = 0
+    while j < 400:
+        total = total + (i * j) % 7
+        j = j + 1
+    return total
+i = 0
+total = 0
+while i < {size}:
+    total = total + row(i)
+    i = i + 1
+""",
+    'primes': """
+def is_prime(n):
+    if n < 2: return false
+    d = 2
+    while d * d <= n:
+        if n % d == 0: return false
+        d = d + 1
+    return true
+n = 0
+count = 0
+while n < {size}:
+    if is_prime(n): count = count + 1
+    n = n + 1
+""",
+}
+
+SIZES = {'fib': 20, 'loops': 50, 'primes': 500}
+
+
+def run_program(engine, ast):
+    """Run ast on a fresh instance of engine; returns the final variables."""
+    if engine is PythonCompiler:
+        # Compiles the whole program rather than one statement at a time
+        return program_variables(run(PythonCompiler().compile(ast)))
+    interpreter = engine()
+    for node in ast:
+        interpreter.evaluate(node)
+    return interpreter.variables
+
+
+def time_run(engine, ast, repeat):
+    """Return the best run time over repeat runs, and the final variables."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            variables = run_program(engine, ast)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, variables
+
+
+def compare(name, ast, repeat):
+    """Time every engine on ast; returns their times."""
+    times = {}
+    results = set()
+    for engine_name, engine in ENGINES.items():
+        times[engine_name], variables = time_run(engine, ast, repeat)
+        results.add(repr(list(variables.items())))
+    if len(results) != 1:
+        print(f"{name}: engines disagree on the final variables")
+    return times
+
+
+def load_examples():
+    """Parse the example programs that run without errors."""
+    programs = {}
+    for path in sorted(glob.glob(os.path.join(EXAMPLES, '*.lang'))):
+        try:
+            ast = Optimizer().optimize(parse_file(path, use_cache=False))
+            time_run(Interpreter, ast, 1)
+        except Exception:
+            continue  # Some examples use the semicolon syntax or fail on purpose
+        programs[os.path.basename(path)] = ast
+    return programs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the execution engines')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs (best is reported)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply the program sizes')
+    parser.add_argument('--examples', action='store_true', help='Run the programs in examples/')
+    args = parser.parse_args()
+
+    header = ''.join(f"{name:>12}" for name in ENGINES)
+    if args.examples:
+        print(f"{'program':<34}{header}   (ms)")
+        totals = dict.fromkeys(ENGINES, 0.0)
+        for name, ast in load_examples().items():
+            times = compare(name, ast, args.repeat)
+            for engine_name, elapsed in times.items():
+                totals[engine_name] += elapsed
+            print(f"{name:<34}" + ''.join(f"{elapsed * 1000:12.2f}" for elapsed in times.values()))
+        times = totals
+        print(f"{'total':<34}" + ''.join(f"{elapsed * 1000:12.2f}" for elapsed in times.values()))
+    else:
+        print(f"{'program':<10}{header}   (ms)")
+        for name, template in PROGRAMS.items():
+            size = max(1, int(SIZES[name] * args.scale))
+            source = template.replace('{size}', str(size))
+            ast = Parser(Lexer(source, layout=True).tokenize(), layout=True).parse()
+            times = compare(name, Optimizer().optimize(ast), args.repeat)
+            print(f"{name:<10}" + ''.join(f"{elapsed * 1000:12.1f}" for elapsed in times.values()))
+    baseline = times['ast']
+    print("Speedup over ast: " + ', '.join(f"{name} {baseline / elapsed:.1f}x"
+                                          for name, elapsed in times.items() if name != 'ast'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark the lexer backends on a large generated program.
+
+The program is built by repeating every example in examples/ until it
+reaches the requested size, then tokenized with each backend.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+
+def build_source(size):
+    """Concatenate the example programs until the source reaches size characters."""
+    sources = []
+    for name in sorted(os.listdir(EXAMPLES_DIR)):
+        if name.endswith('.lang'):
+            with open(os.path.join(EXAMPLES_DIR, name), 'r') as f:
+                sources.append(f.read())
+    chunk = '\n'.join(sources) + '\n'
+    return chunk * max(1, size // len(chunk))
+
+
+def time_backend(source, backend, repeat):
+    """Return the best tokenize() time for a backend and the token count."""
+    best = None
+    tokens = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = Lexer(source, backend=backend).tokenize()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lexer backends')
+    parser.add_argument('--size', type=int, default=2_000_000, help='Source size in characters')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per backend (best is reported)')
+    args = parser.parse_args()
+
+    source = build_source(args.size)
+    print(f"Source: {len(source)} characters")
+
+    results = {}
+    for backend in Lexer.BACKENDS:
+        elapsed, count = time_backend(source, backend, args.repeat)
+        results[backend] = elapsed
+        print(f"{backend:>8}: {elapsed:.3f}s ({count} tokens)")
+
+    print(f"Speedup (scanner / regex): {results['scanner'] / results['regex']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory used to tokenize a large generated program.
+
+Each mode runs in a fresh interpreter so its peak RSS is not inflated by
+the modes before it. Inside that process tracemalloc counts the memory
+blocks and bytes still held by the token list once tokenize() returns.
+
+Modes:
+    positions  - Token objects with source spans (the default)
+    shared     - positions=False: one SharedToken per distinct text
+"""
+
+import os
+import sys
+import json
+import argparse
+import resource
+import subprocess
+import tracemalloc
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from bench_lexer import build_source
+
+MODES = {
+    'positions': {'positions': True},
+    'shared': {'positions': False},
+}
+
+
+def measure(mode, size, backend):
+    """Tokenize in this process and return the memory statistics as a dict."""
+    source = build_source(size)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tokens = Lexer(source, backend=backend, **MODES[mode]).tokenize()
+    after = tracemalloc.take_snapshot()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    retained = sum(stat.size_diff for stat in stats)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'tokens': len(tokens),
+        'distinct': len(set(map(id, tokens))),
+        'blocks': blocks,
+        'retained': retained,
+        'traced_peak': traced_peak,
+        'rss_growth': (peak_rss - baseline_rss) * scale,
+    }
+
+
+def run_mode(mode, size, backend):
+    """Run one mode in a subprocess and return its statistics."""
+    output = subprocess.check_output([
+        sys.executable, __file__, '--child', mode,
+        '--size', str(size), '--backend', backend,
+    ])
+    return json.loads(output)
+
+
+def megabytes(count):
+    return f"{count / (1 << 20):8.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark lexer memory use')
+    parser.add_argument('--size', type=int, default=2_000_000, help='Source size in characters')
+    parser.add_argument('--backend', choices=Lexer.BACKENDS, default='regex')
+    parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.size, args.backend)))
+        return
+
+    print(f"Source: {len(build_source(args.size))} characters, backend: {args.backend}")
+    results = {mode: run_mode(mode, args.size, args.backend) for mode in MODES}
+    for mode, result in results.items():
+        print(f"{mode:>10}: {result['tokens']} tokens ({result['distinct']} objects), "
+              f"{result['blocks']:>9} blocks, retained {megabytes(result['retained'])}, "
+              f"traced peak {megabytes(result['traced_peak'])}, "
+              f"RSS growth {megabytes(result['rss_growth'])}")
+
+    full, shared = results['positions'], results['shared']
+    print(f"Allocated blocks: {full['blocks'] / max(shared['blocks'], 1):.1f}x fewer, "
+          f"peak RSS growth: {full['rss_growth'] / max(shared['rss_growth'], 1):.1f}x lower "
+          f"with shared tokens")
+
+
+if __name__ == '__main__':
+    main()
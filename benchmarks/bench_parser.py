@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark expression parsing on long arithmetic chains.
+
+Each statement assigns a chain of operands joined by a rotating mix of
+arithmetic, comparison and logical operators, so every precedence level
+of the expression grammar is exercised.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+
+OPERATORS = ['+', '*', '-', '/', '%', '+', '<', '*', '-', 'and', '+', '==', '*', 'or']
+
+
+def build_chain(length, offset=0):
+    """Return an expression with length operands, e.g. 'a1 + 2 * (a3 - 4) ...'."""
+    parts = []
+    for index in range(length):
+        operand = f"a{index}" if index % 2 else str(index + 1)
+        if index % 7 == 3:
+            operand = f"-({operand} + 1)"
+        elif index % 11 == 5:
+            operand = f"{operand}!"
+        parts.append(operand)
+        if index < length - 1:
+            parts.append(OPERATORS[(index + offset) % len(OPERATORS)])
+    return ' '.join(parts)
+
+
+def build_source(statements, length):
+    return '\n'.join(f"x{index} = {build_chain(length, index)}" for index in range(statements))
+
+
+def time_parse(tokens, repeat):
+    """Return the best parse time over repeat runs."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Parser(tokens).parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark expression parsing')
+    parser.add_argument('--statements', type=int, default=2000, help='Number of assignments')
+    parser.add_argument('--length', type=int, default=50, help='Operands per expression')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs (best is reported)')
+    args = parser.parse_args()
+
+    tokens = Lexer(build_source(args.statements, args.length)).tokenize()
+    elapsed = time_parse(tokens, args.repeat)
+    operands = args.statements * args.length
+    print(f"{args.statements} expressions x {args.length} operands ({len(tokens)} tokens)")
+    print(f"parse: {elapsed:.3f}s, {elapsed / args.statements * 1e6:.1f} us per expression, "
+          f"{elapsed / operands * 1e6:.2f} us per operand")
+
+    # A single very long chain: one statement with many operands
+    long_tokens = Lexer(f"x = {build_chain(args.statements * 10)}").tokenize()
+    elapsed = time_parse(long_tokens, args.repeat)
+    print(f"one chain of {args.statements * 10} operands: {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
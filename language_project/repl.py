@@ -13,13 +13,16 @@ import traceback
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.lexer.lexer import Lexer
+from src.lexer.incremental import IncrementalLexer
 from src.parser.parser import Parser
+from src.parser.nodes import ASSIGNMENT, FUNCTION_DEFINITION, SPIT_FUNCTION
 from src.interpreter import Interpreter
 
 class REPL:
     def __init__(self):
         self.interpreter = Interpreter()
-        self.multiline_buffer = []
+        # Multiline input is lexed line by line as it is typed
+        self.multiline_buffer = IncrementalLexer()
         self.in_multiline = False
         
     def print_banner(self):
@@ -86,9 +89,12 @@ class REPL:
     
     def execute_code(self, code):
         """Execute a piece of code and handle errors gracefully"""
+        if isinstance(code, IncrementalLexer):
+            lexer = code
+        else:
+            lexer = Lexer(code)
         try:
             # Tokenize
-            lexer = Lexer(code)
             tokens = lexer.tokenize()
             
             if not tokens:
@@ -103,7 +109,7 @@ class REPL:
                 result = self.interpreter.evaluate(node)
                 # Only print result if it's not None and not an assignment
                 if (result is not None and 
-                    node.get('type') not in ['Assignment', 'FunctionDefinition', 'SpitFunction']):
+                    node.kind not in (ASSIGNMENT, FUNCTION_DEFINITION, SPIT_FUNCTION)):
                     print(f"=> {result}")
                     
         except Exception as e:
@@ -111,6 +117,13 @@ class REPL:
             # Uncomment the line below for debugging
             # traceback.print_exc()
     
+    def end_multiline(self):
+        """Execute the buffered multiline input and leave multiline mode"""
+        buffer = self.multiline_buffer
+        self.multiline_buffer = IncrementalLexer()
+        self.in_multiline = False
+        self.execute_code(buffer)
+    
     def run(self):
         """Run the REPL"""
         self.print_banner()
@@ -147,23 +160,17 @@ class REPL:
                 elif not line:
                     if self.in_multiline:
                         # Empty line ends multiline input
-                        code = ' '.join(self.multiline_buffer)
-                        self.multiline_buffer = []
-                        self.in_multiline = False
-                        self.execute_code(code)
+                        self.end_multiline()
                     continue
                 
                 # Handle multiline input
                 if self.in_multiline:
-                    self.multiline_buffer.append(line)
+                    self.multiline_buffer.append(' ' + line)
                     if not line.endswith(':') and not line.startswith(' '):
                         # End of multiline block
-                        code = ' '.join(self.multiline_buffer)
-                        self.multiline_buffer = []
-                        self.in_multiline = False
-                        self.execute_code(code)
+                        self.end_multiline()
                 elif self.is_multiline_start(line):
-                    self.multiline_buffer = [line]
+                    self.multiline_buffer = IncrementalLexer(line)
                     self.in_multiline = True
                 else:
                     # Single line execution
@@ -171,7 +178,7 @@ class REPL:
                     
             except KeyboardInterrupt:
                 print("\n\nUse 'exit' to quit the REPL.")
-                self.multiline_buffer = []
+                self.multiline_buffer = IncrementalLexer()
                 self.in_multiline = False
             except EOFError:
                 print("\nGoodbye!")
@@ -12,8 +12,59 @@ from pathlib import Path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.lexer.lexer import Lexer
+from src.lexer.mapped import MappedLexer
 from src.parser.parser import Parser
+from src.parser.cache import parse_file
+from src.optimizer import Optimizer
 from src.interpreter import Interpreter
+from src.interpreter.closures import ClosureInterpreter
+from src.interpreter.budget import Budget
+from src.bytecode.vm import VirtualMachine
+from src.transpiler.pycode import PythonCompiler, compile_file, run, program_variables
+
+# --engine choices that evaluate the AST statement by statement
+ENGINES = {
+    'closures': ClosureInterpreter,
+    'ast': Interpreter,
+    'bytecode': VirtualMachine,
+}
+
+# --engine choice that compiles the whole program to a Python code object
+PYTHON_ENGINE = 'python'
+
+def check_program(file_path):
+    """Report every syntax error in a program; returns the number of errors."""
+    # Read the source code (or map it, for very large inputs)
+    try:
+        if args.mmap:
+            lexer = MappedLexer(file_path, layout=not args.semicolons)
+        else:
+            with open(file_path, 'r') as f:
+                source_code = f.read()
+            lexer = Lexer(source_code, layout=not args.semicolons)
+    except FileNotFoundError:
+        print(f"Error: File not found: {file_path}")
+        return
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        return
+    
+    try:
+        tokens = lexer.tokenize()
+        if args.mmap:
+            lexer.close()
+        
+        # Parse with error recovery, collecting every syntax error
+        parser = Parser(tokens, layout=not args.semicolons, recover=True)
+        parser.parse()
+    except Exception as e:
+        print(f"Error executing program: {e}")
+        return
+    
+    for error in parser.errors:
+        print(f"{file_path}:{error.line}:{error.column}: {error.message}")
+    print(f"{len(parser.errors)} syntax error(s) found")
+    return len(parser.errors)
 
 def run_program(file_path):
     """
@@ -24,55 +75,111 @@ def run_program(file_path):
     """
     print(f"Running program: {file_path}")
     
-    # Read the source code
+    # Check mode reports every syntax error, so it always lexes and parses
+    if args.check:
+        return check_program(file_path)
+    
+    code = None
     try:
-        with open(file_path, 'r') as f:
-            source_code = f.read()
+        if args.engine == PYTHON_ENGINE and not args.verbose:
+            # Compile the program to Python code, or load the code from the
+            # code cache if the file did not change
+            code = compile_file(file_path, layout=not args.semicolons, mapped=args.mmap,
+                                use_cache=not args.no_cache, optimize=not args.no_optimize)
+        else:
+            # Parse the source code (or map it, for very large inputs), or
+            # load its AST from the parse cache if the file did not change
+            ast = parse_file(file_path, layout=not args.semicolons, mapped=args.mmap,
+                             use_cache=not args.no_cache)
     except FileNotFoundError:
         print(f"Error: File not found: {file_path}")
         return
-    except Exception as e:
+    except (OSError, UnicodeDecodeError) as e:
         print(f"Error reading file: {e}")
         return
+    except Exception as e:
+        print(f"Error executing program: {e}")
+        return
     
     try:
-        # Create tokens
-        lexer = Lexer(source_code)
-        tokens = lexer.tokenize()
-        
-        # Parse the tokens into an AST
-        parser = Parser(tokens)
-        ast = parser.parse()
-        
-        # Print the AST if verbose output is enabled
-        if args.verbose:
-            print("\nAbstract Syntax Tree (AST):")
-            import json
-            print(json.dumps(ast, indent=2))
+        if code is None:
+            # Print the AST if verbose output is enabled
+            if args.verbose:
+                print("\nAbstract Syntax Tree (AST):")
+                import json
+                print(json.dumps([node.to_dict() for node in ast], indent=2))
+            
+            # Fold constant expressions and remove dead code before running them
+            if not args.no_optimize:
+                optimizer = Optimizer()
+                ast = optimizer.optimize(ast)
+                if args.verbose and optimizer.removed:
+                    print("\nRemoved dead code:")
+                    for line in optimizer.report():
+                        print(f"  {line}")
         
         # Execute the program
-        interpreter = Interpreter()
-        for node in ast:
-            interpreter.evaluate(node)
+        if args.engine == PYTHON_ENGINE:
+            if code is None:
+                code = PythonCompiler(file_path).compile(ast)
+            variables = program_variables(run(code))
+        else:
+            # Limit steps, time and call depth if asked to, for programs
+            # that might not terminate
+            budget = None
+            if args.max_steps is not None or args.timeout is not None or args.max_depth is not None:
+                budget = Budget(args.max_steps, args.timeout, args.max_depth)
+            interpreter = ENGINES[args.engine](budget=budget)
+            for node in ast:
+                interpreter.evaluate(node)
+            variables = interpreter.variables
         
         # Print the final state of variables
         print("\nFinal variable values:")
-        for var_name, var_value in interpreter.variables.items():
+        for var_name, var_value in variables.items():
             print(f"{var_name} = {var_value}")
         
     except Exception as e:
         print(f"Error executing program: {e}")
+        # The function calls the error happened in, innermost last
+        for frame in getattr(e, 'call_stack', None) or ():
+            print(f"  in {frame}")
         return
 
 def main():
     parser = argparse.ArgumentParser(description='Run programs written in our custom language')
     parser.add_argument('file', help='Path to the source code file')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output (AST)')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the source file instead of reading it into memory')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check the syntax: report every syntax error and exit with status 1 if there are any')
+    parser.add_argument('--semicolons', action='store_true',
+                        help='Delimit blocks with semicolons (the old style) instead of indentation')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always lex and parse the file, without reading or writing the parse cache')
+    parser.add_argument('--no-optimize', action='store_true',
+                        help='Run the AST exactly as parsed, without constant folding or dead-code elimination')
+    parser.add_argument('--engine', choices=[*ENGINES, PYTHON_ENGINE], default='closures',
+                        help='Compile the AST to closures before running it (the default), '
+                             'walk the AST node by node, compile it to bytecode for the stack VM, '
+                             'or compile the program to Python code and run it with Python semantics')
+    
+    parser.add_argument('--max-steps', type=int, metavar='N',
+                        help='Stop the program with an error after N loop iterations and function calls')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='Stop the program with an error after it has run for SECONDS')
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help='Stop the program with an error when more than N function calls are nested')
     
     global args
     args = parser.parse_args()
+    if args.engine == PYTHON_ENGINE and (args.max_steps is not None or args.timeout is not None or
+                                         args.max_depth is not None):
+        parser.error("--max-steps, --timeout and --max-depth do not apply to --engine python")
     
-    run_program(args.file)
+    errors = run_program(args.file)
+    if args.check and errors:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
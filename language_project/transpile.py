@@ -11,8 +11,8 @@ from pathlib import Path
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.lexer.lexer import Lexer
-from src.parser.parser import Parser
+from src.parser.cache import parse_file
+from src.optimizer import Optimizer
 from src.transpiler import Transpiler
 
 def transpile_program(input_file, output_file):
@@ -25,31 +25,36 @@ def transpile_program(input_file, output_file):
     """
     print(f"Transpiling {input_file} to {output_file}")
     
-    # Read the source code
     try:
-        with open(input_file, 'r') as f:
-            source_code = f.read()
+        # Parse the source code (or map it, for very large inputs), or load
+        # its AST from the parse cache if the file did not change
+        ast = parse_file(input_file, layout=not args.semicolons, mapped=args.mmap,
+                         use_cache=not args.no_cache)
     except FileNotFoundError:
         print(f"Error: File not found: {input_file}")
         return
-    except Exception as e:
+    except (OSError, UnicodeDecodeError) as e:
         print(f"Error reading file: {e}")
         return
+    except Exception as e:
+        print(f"Error transpiling program: {e}")
+        return
     
     try:
-        # Create tokens
-        lexer = Lexer(source_code)
-        tokens = lexer.tokenize()
-        
-        # Parse the tokens into an AST
-        parser = Parser(tokens)
-        ast = parser.parse()
-        
         # Print the AST if verbose output is enabled
         if args.verbose:
             print("\nAbstract Syntax Tree (AST):")
             import json
-            print(json.dumps(ast, indent=2))
+            print(json.dumps([node.to_dict() for node in ast], indent=2))
+        
+        # Fold constant expressions and remove dead code before transpiling them
+        if not args.no_optimize:
+            optimizer = Optimizer()
+            ast = optimizer.optimize(ast)
+            if args.verbose and optimizer.removed:
+                print("\nRemoved dead code:")
+                for line in optimizer.report():
+                    print(f"  {line}")
         
         # Transpile the AST to Python
         transpiler = Transpiler()
@@ -77,6 +82,13 @@ def main():
     parser.add_argument('input_file', help='Path to the input source code file')
     parser.add_argument('output_file', help='Path to the output Python file')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output (AST)')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the source file instead of reading it into memory')
+    parser.add_argument('--semicolons', action='store_true',
+                        help='Delimit blocks with semicolons (the old style) instead of indentation')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always lex and parse the file, without reading or writing the parse cache')
+    parser.add_argument('--no-optimize', action='store_true',
+                        help='Run the AST exactly as parsed, without constant folding or dead-code elimination')
     
     global args
     args = parser.parse_args()
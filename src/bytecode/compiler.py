@@ -0,0 +1,462 @@
+"""
+Bytecode compiler: translates the AST into compact instruction arrays that
+src.bytecode.vm executes.
+
+Every instruction is two ints in an array('i'): the opcode and its
+argument (0 when unused), so code[pc] is always an opcode and
+code[pc + 1] its argument. Arguments are variable slots, indices into the
+code's constant table, jump targets (instruction offsets into code) or
+argument counts.
+
+Variables are resolved to slots at compile time. A Compiler numbers every
+variable name it meets, and the VM keeps the values of a frame in a list
+indexed by slot, so loads and stores never hash a name. The slot table is
+shared by all code compiled by one Compiler, which lets a VM compile and
+run a program one top-level statement at a time.
+
+Top-level code ("main" code) is compiled slightly differently from
+function bodies: it also tracks the value of the last statement, which
+evaluate() returns like Interpreter.evaluate does, and it records the
+order in which new variables are assigned.
+"""
+
+from array import array
+
+from src.parser.nodes import (
+    NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION,
+    IF_STATEMENT, WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT,
+    BOOLEAN, CONSTANT, TRUE_WORDS,
+)
+
+# Opcodes. The VM tests them in groups of eight (0-7, 8-15, ...), so the
+# ones that run most often come first. The *_CONSTANT and JUMP_UNLESS_*
+# superinstructions fuse an operation with a constant operand or with the
+# conditional jump that follows a comparison.
+LOAD = 0  # Push the variable in slot arg
+CONST = 1  # Push constants[arg]
+STORE = 2  # Pop into slot arg
+STORE_GLOBAL = 3  # Main code: pop into slot arg, which is also the statement's value
+FUNCTION = 4  # Push the function named constants[arg]
+CALL = 5  # Call the function below the top arg values with them
+RETURN = 6  # Return the top of the stack from the current function
+JUMP = 7  # Jump to arg
+
+ADD = 8
+SUBTRACT = 9
+MULTIPLY = 10
+DIVIDE = 11
+MODULO = 12
+ADD_CONSTANT = 13  # Top + constants[arg]
+SUBTRACT_CONSTANT = 14
+MULTIPLY_CONSTANT = 15
+
+JUMP_UNLESS_LESS = 16  # Pop two values; jump to arg unless the first is less
+JUMP_UNLESS_LESS_EQUAL = 17
+JUMP_UNLESS_GREATER = 18
+JUMP_UNLESS_GREATER_EQUAL = 19
+JUMP_UNLESS_EQUAL = 20
+JUMP_UNLESS_NOT_EQUAL = 21
+JUMP_IF_FALSE = 22  # Pop; jump to arg if it is false
+LOOP = 23  # Jump back to arg, the start of a while loop; a step of the VM's budget
+
+MODULO_CONSTANT = 24
+LESS = 25
+LESS_EQUAL = 26
+GREATER = 27
+GREATER_EQUAL = 28
+EQUAL = 29
+NOT_EQUAL = 30
+POP = 31
+
+SET_RESULT = 32  # Main code: pop the statement's value
+JUMP_IF_FALSE_OR_POP = 33  # and: keep the top and jump to arg if it is false, else pop it
+JUMP_IF_TRUE_OR_POP = 34  # or: keep the top and jump to arg if it is true, else pop it
+NEGATE = 35
+NOT = 36
+FACTORIAL_OF = 37
+SPIT = 38  # Pop arg values and print them
+TAIL_CALL = 39  # If the function below the top arg values is the running one, call it in place
+DEFINE = 40  # Define the function described by constants[arg]
+FAIL = 41  # Raise an error with the message constants[arg]
+END = 42  # End of main code
+
+OPCODE_NAMES = {
+    LOAD: 'LOAD', CONST: 'CONST', STORE: 'STORE', STORE_GLOBAL: 'STORE_GLOBAL',
+    FUNCTION: 'FUNCTION', CALL: 'CALL', RETURN: 'RETURN', JUMP: 'JUMP',
+    ADD: 'ADD', SUBTRACT: 'SUBTRACT', MULTIPLY: 'MULTIPLY', DIVIDE: 'DIVIDE',
+    MODULO: 'MODULO', ADD_CONSTANT: 'ADD_CONSTANT', SUBTRACT_CONSTANT: 'SUBTRACT_CONSTANT',
+    MULTIPLY_CONSTANT: 'MULTIPLY_CONSTANT', JUMP_UNLESS_LESS: 'JUMP_UNLESS_LESS',
+    JUMP_UNLESS_LESS_EQUAL: 'JUMP_UNLESS_LESS_EQUAL', JUMP_UNLESS_GREATER: 'JUMP_UNLESS_GREATER',
+    JUMP_UNLESS_GREATER_EQUAL: 'JUMP_UNLESS_GREATER_EQUAL', JUMP_UNLESS_EQUAL: 'JUMP_UNLESS_EQUAL',
+    JUMP_UNLESS_NOT_EQUAL: 'JUMP_UNLESS_NOT_EQUAL', JUMP_IF_FALSE: 'JUMP_IF_FALSE',
+    LOOP: 'LOOP', MODULO_CONSTANT: 'MODULO_CONSTANT', LESS: 'LESS',
+    LESS_EQUAL: 'LESS_EQUAL', GREATER: 'GREATER', GREATER_EQUAL: 'GREATER_EQUAL',
+    EQUAL: 'EQUAL', NOT_EQUAL: 'NOT_EQUAL', POP: 'POP', SET_RESULT: 'SET_RESULT',
+    JUMP_IF_FALSE_OR_POP: 'JUMP_IF_FALSE_OR_POP', JUMP_IF_TRUE_OR_POP: 'JUMP_IF_TRUE_OR_POP',
+    NEGATE: 'NEGATE', NOT: 'NOT', FACTORIAL_OF: 'FACTORIAL_OF', SPIT: 'SPIT',
+    TAIL_CALL: 'TAIL_CALL', DEFINE: 'DEFINE', FAIL: 'FAIL', END: 'END',
+}
+
+# Opcode -> change in the operand stack's size; CALL and SPIT pop their
+# argument count instead (CALL pops the function too and pushes the result)
+STACK_EFFECTS = {
+    LOAD: 1, CONST: 1, STORE: -1, STORE_GLOBAL: -1, FUNCTION: 1, RETURN: -1, JUMP: 0,
+    ADD: -1, SUBTRACT: -1, MULTIPLY: -1, DIVIDE: -1, MODULO: -1, ADD_CONSTANT: 0,
+    SUBTRACT_CONSTANT: 0, MULTIPLY_CONSTANT: 0, JUMP_UNLESS_LESS: -2,
+    JUMP_UNLESS_LESS_EQUAL: -2, JUMP_UNLESS_GREATER: -2, JUMP_UNLESS_GREATER_EQUAL: -2,
+    JUMP_UNLESS_EQUAL: -2, JUMP_UNLESS_NOT_EQUAL: -2, JUMP_IF_FALSE: -1, LOOP: 0,
+    MODULO_CONSTANT: 0, LESS: -1, LESS_EQUAL: -1, GREATER: -1, GREATER_EQUAL: -1,
+    EQUAL: -1, NOT_EQUAL: -1, POP: -1, SET_RESULT: -1, JUMP_IF_FALSE_OR_POP: -1,
+    JUMP_IF_TRUE_OR_POP: -1, NEGATE: 0, NOT: 0, FACTORIAL_OF: 0, TAIL_CALL: 0, DEFINE: 0,
+    FAIL: 0, END: 0,
+}
+
+BINARY_OPCODES = {
+    '+': ADD,
+    '-': SUBTRACT,
+    '*': MULTIPLY,
+    '/': DIVIDE,
+    '%': MODULO,
+}
+
+# Binary operations with a constant right operand
+CONSTANT_OPCODES = {
+    '+': ADD_CONSTANT,
+    '-': SUBTRACT_CONSTANT,
+    '*': MULTIPLY_CONSTANT,
+    '%': MODULO_CONSTANT,
+}
+
+COMPARISON_OPCODES = {
+    '<': LESS,
+    '<=': LESS_EQUAL,
+    '>': GREATER,
+    '>=': GREATER_EQUAL,
+    '==': EQUAL,
+    '!=': NOT_EQUAL,
+}
+
+# Comparisons used as the condition of an if or while
+JUMP_UNLESS_OPCODES = {
+    '<': JUMP_UNLESS_LESS,
+    '<=': JUMP_UNLESS_LESS_EQUAL,
+    '>': JUMP_UNLESS_GREATER,
+    '>=': JUMP_UNLESS_GREATER_EQUAL,
+    '==': JUMP_UNLESS_EQUAL,
+    '!=': JUMP_UNLESS_NOT_EQUAL,
+}
+
+
+class Code:
+    """A compiled piece of code: a function body or a top-level statement.
+
+    code is the array('i') of instructions. instructions holds the same
+    ints in a list, which the VM indexes: CPython has a fast path for
+    indexing lists that arrays lack, and it makes every instruction
+    cheaper to fetch. nodes holds the AST node each instruction was
+    compiled from, for locating runtime errors. max_stack is the most
+    operand stack entries the code uses at once.
+    """
+
+    __slots__ = ('name', 'code', 'instructions', 'constants', 'nodes', 'max_stack')
+
+    def __init__(self, name, code, constants, nodes, max_stack):
+        self.name = name
+        self.code = code
+        self.instructions = code.tolist()
+        self.constants = constants
+        self.nodes = nodes
+        self.max_stack = max_stack
+
+    def location(self, pc):
+        """(line, column) of the instruction at pc, None where unknown."""
+        node = self.nodes[pc // 2]
+        return getattr(node, 'line', None), getattr(node, 'column', None)
+
+    def disassemble(self, names=None):
+        """Return one line of text per instruction, for debugging."""
+        result = []
+        code = self.code
+        for pc in range(0, len(code), 2):
+            opcode, argument = code[pc], code[pc + 1]
+            text = f"{pc:4} {OPCODE_NAMES[opcode]:<20} {argument}"
+            if opcode in (CONST, FUNCTION, DEFINE, FAIL, ADD_CONSTANT, SUBTRACT_CONSTANT,
+                          MULTIPLY_CONSTANT, MODULO_CONSTANT):
+                text += f" ({self.constants[argument]!r})"
+            elif opcode in (LOAD, STORE, STORE_GLOBAL) and names is not None:
+                text += f" ({names[argument]})"
+            result.append(text)
+        return result
+
+
+class FunctionTemplate:
+    """What a DEFINE instruction needs to create a function at run time."""
+
+    __slots__ = ('name', 'parameters', 'slots', 'code', 'body')
+
+    def __init__(self, name, parameters, slots, code, body):
+        self.name = name
+        self.parameters = parameters
+        self.slots = slots
+        self.code = code
+        self.body = body
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+
+class _Builder:
+    """Instructions and constants of one Code being compiled."""
+
+    def __init__(self, main, function=None):
+        self.main = main
+        self.function = function  # The name of the function being compiled
+        self.code = []
+        self.nodes = []
+        self.constants = []
+        self.constant_ids = {}
+        self.depth = 0
+        self.max_depth = 0
+
+    def emit(self, opcode, argument, node):
+        """Append an instruction located at node; returns its pc."""
+        code = self.code
+        code += (opcode, argument)
+        self.nodes.append(node)
+        # Code is structured, so following the instructions in order gives
+        # the stack depth at every branch and merge point
+        if opcode == CALL or opcode == SPIT:
+            self.depth -= argument
+        else:
+            self.depth += STACK_EFFECTS[opcode]
+            if self.depth > self.max_depth:
+                self.max_depth = self.depth
+        return len(code) - 2
+
+    def patch(self, pc, target=None):
+        """Point the jump at pc to target, by default the next instruction."""
+        self.code[pc + 1] = len(self.code) if target is None else target
+
+    def constant(self, value):
+        # Keyed by type too, since 1 == 1.0 == True
+        key = (type(value), value)
+        index = self.constant_ids.get(key)
+        if index is None:
+            index = self.constant_ids[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def build(self, name):
+        return Code(name, array('i', self.code), self.constants, self.nodes, self.max_depth)
+
+
+class Compiler:
+    """Compile AST nodes to Code, numbering variables into slots.
+
+    names[slot] is the variable name of each slot.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.slots = {}
+
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.names)
+            self.names.append(name)
+        return slot
+
+    def compile(self, node):
+        """Compile a top-level statement to main code."""
+        builder = _Builder(main=True)
+        self._statement(builder, node)
+        builder.emit(END, 0, node)
+        return builder.build('<main>')
+
+    def compile_function(self, name, parameters, body):
+        """Compile a function body; it returns None if it ends without a return."""
+        builder = _Builder(main=False, function=name)
+        self._statement(builder, body)
+        builder.emit(CONST, builder.constant(None), body)
+        builder.emit(RETURN, 0, body)
+        return builder.build(name)
+
+    # Statements. In main code every statement leaves its value in the
+    # result; in function bodies statements leave nothing.
+
+    def _statement(self, builder, node):
+        kind = node.kind
+        main = builder.main
+        if kind == ASSIGNMENT:
+            self._expression(builder, node.value)
+            slot = self.slot(node.identifier)
+            builder.emit(STORE_GLOBAL if main else STORE, slot, node)
+        elif kind == BLOCK:
+            if not node.statements and main:
+                self._none_result(builder, node)
+            for statement in node.statements:
+                self._statement(builder, statement)
+        elif kind == IF_STATEMENT:
+            jump = self._jump_unless(builder, node.condition, node)
+            self._statement(builder, node.true_branch)
+            if node.false_branch:
+                end = builder.emit(JUMP, 0, node)
+                builder.patch(jump)
+                self._statement(builder, node.false_branch)
+                builder.patch(end)
+            elif main:
+                end = builder.emit(JUMP, 0, node)
+                builder.patch(jump)
+                self._none_result(builder, node)
+                builder.patch(end)
+            else:
+                builder.patch(jump)
+        elif kind == WHILE_STATEMENT:
+            if main:
+                self._none_result(builder, node)
+            top = len(builder.code)
+            exit_jump = self._jump_unless(builder, node.condition, node)
+            self._statement(builder, node.body)
+            builder.emit(LOOP, top, node)
+            builder.patch(exit_jump)
+        elif kind == RETURN_STATEMENT:
+            value = node.value
+            if value.kind == FUNCTION_CALL and value.name == builder.function:
+                # A self tail call runs in place; when the name no longer
+                # refers to the running function, TAIL_CALL does nothing
+                # and this is an ordinary call
+                self._call(builder, value, tail=True)
+            else:
+                self._expression(builder, value)
+            builder.emit(RETURN, 0, node)
+        elif kind == SPIT_FUNCTION:
+            self._spit(builder, node)
+            if main:
+                self._none_result(builder, node)
+        elif kind == FUNCTION_DEFINITION:
+            parameters = list(node.parameters)
+            template = FunctionTemplate(
+                node.name, parameters, [self.slot(name) for name in parameters],
+                self.compile_function(node.name, parameters, node.body), node.body)
+            builder.emit(DEFINE, builder.constant(template), node)
+            if main:
+                self._none_result(builder, node)
+        else:
+            self._expression(builder, node)
+            builder.emit(SET_RESULT if main else POP, 0, node)
+
+    def _jump_unless(self, builder, condition, node):
+        """Compile condition and a jump taken when it is false; returns the jump's pc."""
+        if condition.kind == COMPARISON and condition.operator in JUMP_UNLESS_OPCODES:
+            self._expression(builder, condition.left)
+            self._expression(builder, condition.right)
+            return builder.emit(JUMP_UNLESS_OPCODES[condition.operator], 0, condition)
+        self._expression(builder, condition)
+        return builder.emit(JUMP_IF_FALSE, 0, node)
+
+    def _none_result(self, builder, node):
+        builder.emit(CONST, builder.constant(None), node)
+        builder.emit(SET_RESULT, 0, node)
+
+    def _spit(self, builder, node):
+        for argument in node.arguments:
+            self._expression(builder, argument)
+        builder.emit(SPIT, len(node.arguments), node)
+
+    # Expressions push exactly one value
+
+    def _expression(self, builder, node):
+        kind = node.kind
+        if kind == IDENTIFIER:
+            builder.emit(LOAD, self.slot(node.value), node)
+        elif kind == CONSTANT or kind == STRING:
+            builder.emit(CONST, builder.constant(node.value), node)
+        elif kind == NUMBER:
+            try:
+                value = int(node.value)
+            except ValueError as error:
+                # Digits int() does not accept, such as superscripts, fail
+                # when they are reached, as in the interpreter
+                builder.emit(FAIL, builder.constant(str(error)), node)
+            else:
+                builder.emit(CONST, builder.constant(value), node)
+        elif kind == BOOLEAN:
+            builder.emit(CONST, builder.constant(node.value in TRUE_WORDS), node)
+        elif (kind == BINARY_OPERATION and node.operator in CONSTANT_OPCODES and
+              _is_constant(node.right)):
+            self._expression(builder, node.left)
+            value = _constant_value(node.right)
+            builder.emit(CONSTANT_OPCODES[node.operator], builder.constant(value), node)
+        elif kind == BINARY_OPERATION or kind == COMPARISON:
+            self._expression(builder, node.left)
+            self._expression(builder, node.right)
+            opcodes = BINARY_OPCODES if kind == BINARY_OPERATION else COMPARISON_OPCODES
+            opcode = opcodes.get(node.operator)
+            if opcode is None:
+                what = 'binary' if kind == BINARY_OPERATION else 'comparison'
+                self._fail(builder, f"Unknown {what} operator: {node.operator}", node)
+            else:
+                builder.emit(opcode, 0, node)
+        elif kind == LOGICAL_OPERATION:
+            self._expression(builder, node.left)
+            if node.operator in ('and', 'እና'):
+                jump = builder.emit(JUMP_IF_FALSE_OR_POP, 0, node)
+            elif node.operator in ('or', 'ወይም'):
+                jump = builder.emit(JUMP_IF_TRUE_OR_POP, 0, node)
+            else:
+                self._fail(builder, f"Unknown logical operator: {node.operator}", node)
+                return
+            self._expression(builder, node.right)
+            builder.patch(jump)
+        elif kind == UNARY_OPERATION:
+            self._expression(builder, node.operand)
+            if node.operator == '-':
+                builder.emit(NEGATE, 0, node)
+            elif node.operator in ('not', 'ተቃራኒ'):
+                builder.emit(NOT, 0, node)
+            else:
+                self._fail(builder, f"Unknown unary operator: {node.operator}", node)
+        elif kind == FACTORIAL:
+            self._expression(builder, node.value)
+            builder.emit(FACTORIAL_OF, 0, node)
+        elif kind == FUNCTION_CALL:
+            self._call(builder, node)
+        elif kind == SPIT_FUNCTION:
+            self._spit(builder, node)
+            builder.emit(CONST, builder.constant(None), node)
+        elif kind in (ASSIGNMENT, BLOCK, IF_STATEMENT, WHILE_STATEMENT, RETURN_STATEMENT,
+                      FUNCTION_DEFINITION):
+            # Statements only appear as expressions in hand-built trees
+            self._fail(builder, f"Unexpected statement in an expression: {node.type}", node)
+        else:
+            self._fail(builder, f"Unknown node type: {node.type}", node)
+
+    def _call(self, builder, node, tail=False):
+        builder.emit(FUNCTION, builder.constant(node.name), node)
+        for argument in node.arguments:
+            self._expression(builder, argument)
+        if tail:
+            builder.emit(TAIL_CALL, len(node.arguments), node)
+        builder.emit(CALL, len(node.arguments), node)
+
+    def _fail(self, builder, message, node):
+        builder.emit(FAIL, builder.constant(message), node)
+
+
+def _is_constant(node):
+    """Whether node compiles to a single CONST."""
+    kind = node.kind
+    if kind == NUMBER:
+        return node.value.isdecimal() and node.value.isascii()
+    return kind == CONSTANT or kind == STRING or kind == BOOLEAN
+
+
+def _constant_value(node):
+    kind = node.kind
+    if kind == NUMBER:
+        return int(node.value)
+    if kind == BOOLEAN:
+        return node.value in TRUE_WORDS
+    return node.value
@@ -0,0 +1,330 @@
+"""
+Stack-based virtual machine for code produced by src.bytecode.compiler.
+
+The VM runs one dispatch loop over the instruction array of the current
+Code. Calls push a frame on a Python list rather than recursing, so deep
+recursion in a program does not grow the Python stack. Each frame has its
+own list of variable values indexed by slot; all frames share one operand
+stack.
+
+VirtualMachine has the interface of Interpreter (evaluate(), variables,
+functions) and the same semantics: a function sees a copy of its caller's
+variables updated with the environment it captured when it was defined
+and its arguments, and the caller's variables are unchanged when it
+returns. Runtime errors are raised as InterpreterError located at the
+node that failed.
+"""
+
+import sys
+import math
+
+from src.lexer.tokens import SourceError
+from src.interpreter import InterpreterError, Function
+from src.bytecode.compiler import (
+    Compiler, LOAD, CONST, STORE, STORE_GLOBAL, FUNCTION, CALL, RETURN, JUMP, ADD, SUBTRACT,
+    MULTIPLY, DIVIDE, MODULO, ADD_CONSTANT, SUBTRACT_CONSTANT, MULTIPLY_CONSTANT,
+    JUMP_UNLESS_LESS, JUMP_UNLESS_LESS_EQUAL, JUMP_UNLESS_GREATER, JUMP_UNLESS_GREATER_EQUAL,
+    JUMP_UNLESS_EQUAL, JUMP_UNLESS_NOT_EQUAL, JUMP_IF_FALSE, LOOP, MODULO_CONSTANT,
+    LESS, LESS_EQUAL, GREATER, GREATER_EQUAL, EQUAL, NOT_EQUAL, POP, SET_RESULT,
+    JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, NEGATE, NOT, FACTORIAL_OF, SPIT,
+    TAIL_CALL, DEFINE, FAIL, END,
+)
+
+# The value of a slot whose variable is not defined
+UNDEFINED = object()
+
+
+class BytecodeFunction(Function):
+    """A function defined by a DEFINE instruction.
+
+    closure holds the captured environment as (slot, value) pairs, for
+    fast copying into new frames; closure_env holds it by name.
+    """
+
+    def __init__(self, template, closure, names):
+        super().__init__(template.name, template.parameters, template.body,
+                         {names[slot]: value for slot, value in closure})
+        self.slots = template.slots
+        self.code = template.code
+        self.closure = closure
+
+
+class VirtualMachine:
+    """Compile AST nodes to bytecode and run them.
+
+    >>> vm = VirtualMachine()
+    >>> for node in Parser(Lexer("x = 2 * 3 + 1").tokenize()).parse():
+    ...     vm.evaluate(node)
+    7
+    """
+
+    def __init__(self, max_depth=None, budget=None):
+        self.variables = {}
+        self.functions = {}
+        self.compiler = Compiler()
+        # Deepest call nesting before a program's recursion fails, like
+        # Python's own limit
+        self.max_depth = max_depth if max_depth is not None else sys.getrecursionlimit()
+        # Limits on steps, time and call depth (see src.interpreter.budget)
+        self.budget = budget
+
+    def compile(self, node):
+        """Compile a top-level statement to a Code object."""
+        return self.compiler.compile(node)
+
+    def evaluate(self, node):
+        """Compile and run a top-level statement; returns what Interpreter.evaluate would."""
+        return self.run(self.compile(node))
+
+    def run(self, code):
+        """Run compiled main code against self.variables."""
+        names = self.compiler.names
+        variables = self.variables
+        values = [variables.get(name, UNDEFINED) for name in names]
+        assigned = []
+        try:
+            return self._execute(code, values, assigned)
+        finally:
+            # Copy the values back: new variables in the order they were
+            # first assigned, like a dict, then the updated ones
+            variables = self.variables
+            for slot in assigned:
+                variables[names[slot]] = values[slot]
+            for slot, name in enumerate(names):
+                value = values[slot]
+                if value is not UNDEFINED:
+                    variables[name] = value
+
+    def _execute(self, main, values, assigned):
+        functions = self.functions
+        names = self.compiler.names
+        max_depth = self.max_depth
+        budget = self.budget
+        if budget is not None and budget.max_depth is not None:
+            max_depth = min(max_depth, budget.max_depth)
+        frames = []
+        # The operand stack is a list with an explicit top (sp), which is
+        # faster than append() and pop(). CALL makes room for the callee's
+        # max_stack entries, so writes never go past the end.
+        stack = [None] * (main.max_stack + 1)
+        sp = 0
+        current = main
+        running = None  # The function whose code is current
+        code = main.instructions
+        constants = main.constants
+        result = None
+        pc = 0
+        try:
+            while True:
+                opcode = code[pc]
+                argument = code[pc + 1]
+                pc += 2
+                if opcode < 8:
+                    if opcode == LOAD:
+                        value = values[argument]
+                        if value is UNDEFINED:
+                            raise Exception(f"Undefined variable: {names[argument]}")
+                        stack[sp] = value
+                        sp += 1
+                    elif opcode == CONST:
+                        stack[sp] = constants[argument]
+                        sp += 1
+                    elif opcode == STORE:
+                        sp -= 1
+                        values[argument] = stack[sp]
+                    elif opcode == STORE_GLOBAL:
+                        if values[argument] is UNDEFINED:
+                            assigned.append(argument)
+                        sp -= 1
+                        result = values[argument] = stack[sp]
+                    elif opcode == FUNCTION:
+                        name = constants[argument]
+                        if name not in functions:
+                            raise Exception(f"Undefined function: {name}")
+                        stack[sp] = functions[name]
+                        sp += 1
+                    elif opcode == CALL:
+                        sp -= argument + 1
+                        function = stack[sp]
+                        parameters = function.parameters
+                        if argument != len(parameters):
+                            raise Exception(f"Function {function.name} expects {len(parameters)} "
+                                            f"arguments, got {argument}")
+                        if len(frames) >= max_depth:
+                            if budget is not None and len(frames) == budget.max_depth:
+                                raise budget.too_deep(*current.location(pc - 2))
+                            raise RecursionError("maximum recursion depth exceeded")
+                        if budget is not None:
+                            budget.countdown -= 1
+                            if budget.countdown <= 0:
+                                budget.check(*current.location(pc - 2))
+                        frames.append((current, pc, values, running))
+                        running = function
+                        values = values.copy()
+                        for slot, value in function.closure:
+                            values[slot] = value
+                        # The arguments are above the function; the callee's
+                        # operands start where the function was
+                        for slot in function.slots:
+                            sp += 1
+                            values[slot] = stack[sp]
+                        sp -= argument
+                        current = function.code
+                        code = current.instructions
+                        constants = current.constants
+                        pc = 0
+                        if sp + current.max_stack >= len(stack):
+                            stack.extend([None] * (current.max_stack + len(stack)))
+                    elif opcode == RETURN:
+                        if not frames:
+                            # A top-level return ends the statement
+                            return {'type': 'return', 'value': stack[sp - 1]}
+                        current, pc, values, running = frames.pop()
+                        code = current.instructions
+                        constants = current.constants
+                        # Statements leave the stack as they found it, so the
+                        # return value is where the called function was
+                    else:  # JUMP
+                        pc = argument
+                elif opcode < 16:
+                    if opcode == ADD:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] + stack[sp]
+                    elif opcode == SUBTRACT:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] - stack[sp]
+                    elif opcode == MULTIPLY:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] * stack[sp]
+                    elif opcode == DIVIDE:
+                        sp -= 1
+                        if stack[sp] == 0:
+                            raise Exception("Division by zero")
+                        stack[sp - 1] = stack[sp - 1] / stack[sp]
+                    elif opcode == MODULO:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] % stack[sp]
+                    elif opcode == ADD_CONSTANT:
+                        stack[sp - 1] = stack[sp - 1] + constants[argument]
+                    elif opcode == SUBTRACT_CONSTANT:
+                        stack[sp - 1] = stack[sp - 1] - constants[argument]
+                    else:  # MULTIPLY_CONSTANT
+                        stack[sp - 1] = stack[sp - 1] * constants[argument]
+                elif opcode < 24:
+                    if opcode == JUMP_UNLESS_LESS:
+                        sp -= 2
+                        if not stack[sp] < stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_UNLESS_LESS_EQUAL:
+                        sp -= 2
+                        if not stack[sp] <= stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_UNLESS_GREATER:
+                        sp -= 2
+                        if not stack[sp] > stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_UNLESS_GREATER_EQUAL:
+                        sp -= 2
+                        if not stack[sp] >= stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_UNLESS_EQUAL:
+                        sp -= 2
+                        if not stack[sp] == stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_UNLESS_NOT_EQUAL:
+                        sp -= 2
+                        if not stack[sp] != stack[sp + 1]:
+                            pc = argument
+                    elif opcode == JUMP_IF_FALSE:
+                        sp -= 1
+                        if not stack[sp]:
+                            pc = argument
+                    else:  # LOOP
+                        # Every iteration is a step of the budget
+                        if budget is not None:
+                            budget.countdown -= 1
+                            if budget.countdown <= 0:
+                                budget.check(*current.location(pc - 2))
+                        pc = argument
+                elif opcode < 32:
+                    if opcode == MODULO_CONSTANT:
+                        stack[sp - 1] = stack[sp - 1] % constants[argument]
+                    elif opcode == LESS:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] < stack[sp]
+                    elif opcode == LESS_EQUAL:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] <= stack[sp]
+                    elif opcode == GREATER:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] > stack[sp]
+                    elif opcode == GREATER_EQUAL:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] >= stack[sp]
+                    elif opcode == EQUAL:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] == stack[sp]
+                    elif opcode == NOT_EQUAL:
+                        sp -= 1
+                        stack[sp - 1] = stack[sp - 1] != stack[sp]
+                    else:  # POP
+                        sp -= 1
+                elif opcode == SET_RESULT:
+                    sp -= 1
+                    result = stack[sp]
+                elif opcode == JUMP_IF_FALSE_OR_POP:
+                    if not stack[sp - 1]:
+                        pc = argument
+                    else:
+                        sp -= 1
+                elif opcode == JUMP_IF_TRUE_OR_POP:
+                    if stack[sp - 1]:
+                        pc = argument
+                    else:
+                        sp -= 1
+                elif opcode == TAIL_CALL:
+                    function = stack[sp - argument - 1]
+                    if function is running and argument == len(function.parameters):
+                        # A self tail call: the callee would start from a
+                        # copy of these values, which are not needed after
+                        # it returns, so update them and start over
+                        if budget is not None:
+                            budget.countdown -= 1
+                            if budget.countdown <= 0:
+                                budget.check(*current.location(pc - 2))
+                        for slot, value in function.closure:
+                            values[slot] = value
+                        sp -= argument
+                        for index, slot in enumerate(function.slots):
+                            values[slot] = stack[sp + index]
+                        sp -= 1
+                        pc = 0
+                    # Otherwise the CALL that follows makes an ordinary call
+                elif opcode == NEGATE:
+                    stack[sp - 1] = -stack[sp - 1]
+                elif opcode == NOT:
+                    stack[sp - 1] = not stack[sp - 1]
+                elif opcode == FACTORIAL_OF:
+                    value = stack[sp - 1]
+                    if not isinstance(value, int) or value < 0:
+                        raise Exception("Factorial is only defined for non-negative integers")
+                    stack[sp - 1] = math.factorial(value)
+                elif opcode == SPIT:
+                    sp -= argument
+                    print(' '.join([str(value) for value in stack[sp:sp + argument]]))
+                elif opcode == DEFINE:
+                    template = constants[argument]
+                    closure = [(slot, value) for slot, value in enumerate(values)
+                               if value is not UNDEFINED]
+                    functions[template.name] = BytecodeFunction(template, closure, names)
+                elif opcode == FAIL:
+                    raise Exception(constants[argument])
+                elif opcode == END:
+                    return result
+                else:
+                    raise Exception(f"Unknown opcode: {opcode}")
+        except SourceError:
+            raise
+        except Exception as error:
+            line, column = current.location(pc - 2)
+            raise InterpreterError(str(error), line, column) from error
@@ -5,197 +5,359 @@ generating intermediate code.
 """
 
 import math
+import operator
+
+from src.lexer.tokens import SourceError
+from src.parser.nodes import (
+    NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION,
+    IF_STATEMENT, WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT,
+    BOOLEAN, CONSTANT, TRUE_WORDS,
+)
+from src.interpreter.resolver import UNDEFINED, Frame, resolve
+
+
+class InterpreterError(SourceError):
+    """A runtime error, located at the AST node that was being evaluated.
+
+    call_stack holds the Frames of the calls that were running when the
+    error was raised, outermost first; it is None for an error at top level.
+    """
+
+    call_stack = None
+
+
+class ControlSignal:
+    """A value that tells blocks and loops to stop, instead of a result."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"<{self.name} signal>"
+
+
+# What a return statement evaluates to. It is passed up unchanged to the
+# function call, which takes the value from Interpreter.return_value, so
+# returning allocates nothing.
+RETURN = ControlSignal('return')
+
+
+def _divide(left, right):
+    if right == 0:
+        raise Exception("Division by zero")
+    return left / right
+
+
+# Operator -> function, shared with the optimizer so constants are folded
+# exactly as they would be evaluated
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': _divide,
+    '%': operator.mod,
+}
+
+COMPARISON_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
 
 class Function:
-    def __init__(self, name, parameters, body, closure_env):
+    def __init__(self, name, parameters, body, closure_env, scope=None):
         self.name = name
         self.parameters = parameters
         self.body = body
         self.closure_env = closure_env
+        self.scope = scope  # The resolved slots of a call's Frame
 
 class Interpreter:
-    def __init__(self):
+    def __init__(self, budget=None):
         self.variables = {}
         self.functions = {}
+        # The Frames of the running calls, outermost first, for tracebacks
+        # and profilers; frame is the innermost, None at top level
         self.call_stack = []
+        self.frame = None
+        self.return_value = None  # The value of the last return statement
+        # The arguments of a pending self tail call, set with RETURN
+        self.tail_arguments = None
+        # Limits on steps, time and call depth (see src.interpreter.budget)
+        self.budget = budget
         
     def evaluate(self, node):
-        """Evaluate an AST node and return its value."""
-        if node['type'] == 'Number':
-            return int(node['value'])
-        
-        elif node['type'] == 'String':
-            return node['value']
-        
-        elif node['type'] == 'Identifier':
-            name = node['value']
-            if name in self.variables:
-                return self.variables[name]
-            else:
+        """Evaluate a top-level AST node and return its value.
+
+        A return statement ends the statement it is in, which evaluates to
+        {'type': 'return', 'value': value}.
+        """
+        result = self._evaluate(node)
+        if result is RETURN:
+            return {'type': 'return', 'value': self.return_value}
+        return result
+
+    def _evaluate(self, node):
+        """Evaluate an AST node and return its value, or RETURN.
+
+        Dispatches on node.kind through _EVALUATORS. Errors are re-raised
+        as InterpreterError located at the innermost node that has a
+        source position.
+        """
+        try:
+            try:
+                evaluator = self._EVALUATORS[node.kind]
+            except KeyError:
+                raise Exception(f"Unknown node type: {node.type}") from None
+            return evaluator(self, node)
+        except SourceError:
+            raise
+        except Exception as error:
+            raise InterpreterError(str(error), getattr(node, 'line', None),
+                                   getattr(node, 'column', None)) from error
+
+    def _evaluate_number(self, node):
+        return int(node.value)
+
+    def _evaluate_string(self, node):
+        return node.value
+
+    def _evaluate_boolean(self, node):
+        return node.value in TRUE_WORDS
+
+    def _evaluate_constant(self, node):
+        return node.value
+
+    def _evaluate_identifier(self, node):
+        name = node.value
+        if self.frame is not None:
+            value = self.frame.load(name, self.variables)
+            if value is UNDEFINED:
                 raise Exception(f"Undefined variable: {name}")
-        
-        elif node['type'] == 'Assignment':
-            value = self.evaluate(node['value'])
-            self.variables[node['identifier']] = value
             return value
-        
-        elif node['type'] == 'BinaryOperation':
-            left = self.evaluate(node['left'])
-            right = self.evaluate(node['right'])
-            operator = node['operator']
-            
-            if operator == '+':
-                return left + right
-            elif operator == '-':
-                return left - right
-            elif operator == '*':
-                return left * right
-            elif operator == '/':
-                if right == 0:
-                    raise Exception("Division by zero")
-                return left / right
-            elif operator == '%':
-                return left % right
-            else:
-                raise Exception(f"Unknown binary operator: {operator}")
-        
-        elif node['type'] == 'Comparison':
-            left = self.evaluate(node['left'])
-            right = self.evaluate(node['right'])
-            operator = node['operator']
-            
-            if operator == '==':
-                return left == right
-            elif operator == '!=':
-                return left != right
-            elif operator == '<':
-                return left < right
-            elif operator == '<=':
-                return left <= right
-            elif operator == '>':
-                return left > right
-            elif operator == '>=':
-                return left >= right
-            else:
-                raise Exception(f"Unknown comparison operator: {operator}")
-        
-        elif node['type'] == 'LogicalOperation':
-            left = self.evaluate(node['left'])
-            operator = node['operator']
-            
-            # Short-circuit evaluation
-            if operator == 'and' or operator == 'እና':
-                if not left:
-                    return left
-                return self.evaluate(node['right'])
-            elif operator == 'or' or operator == 'ወይም':
-                if left:
-                    return left
-                return self.evaluate(node['right'])
-            else:
-                raise Exception(f"Unknown logical operator: {operator}")
-        
-        elif node['type'] == 'IfStatement':
-            condition = self.evaluate(node['condition'])
-            if condition:
-                return self.evaluate(node['true_branch'])
-            elif node['false_branch']:
-                return self.evaluate(node['false_branch'])
-            return None
-        
-        elif node['type'] == 'WhileStatement':
-            result = None
-            iteration_count = 0  # Initialize iteration counter
-            while self.evaluate(node['condition']):
-                iteration_count += 1
-                if iteration_count > 500:  # Terminate after 500 iterations
-                    print("Debug: Terminating while loop after 500 iterations")
-                    break
-                result = self.evaluate(node['body'])
-                # If we encounter a return statement, propagate it immediately
-                if isinstance(result, dict) and result.get('type') == 'return':
-                    return result
-            return result
-        
-        elif node['type'] == 'Block':
-            result = None
-            for statement in node['statements']:
-                result = self.evaluate(statement)
-                # Handle return statements in blocks
-                if isinstance(result, dict) and result.get('type') == 'return':
-                    return result
-            return result
-        
-        elif node['type'] == 'FunctionDefinition':
-            func = Function(
-                node['name'],
-                node['parameters'],
-                node['body'],
-                dict(self.variables)  # Capture current environment
-            )
-            self.functions[node['name']] = func
-            return None
-        
-        elif node['type'] == 'FunctionCall':
-            func_name = node['name']
-            if func_name not in self.functions:
-                raise Exception(f"Undefined function: {func_name}")
-            
-            func = self.functions[func_name]
-            args = [self.evaluate(arg) for arg in node['arguments']]
-            
-            if len(args) != len(func.parameters):
-                raise Exception(f"Function {func_name} expects {len(func.parameters)} arguments, got {len(args)}")
-            
-            # Save current state
-            old_vars = dict(self.variables)
-            
-            # Set up function environment
-            self.variables.update(func.closure_env)
-            for param, arg in zip(func.parameters, args):
-                self.variables[param] = arg
-            
-            # Execute function body
-            try:
-                result = self.evaluate(func.body)
-                # Handle return value
-                if isinstance(result, dict) and result.get('type') == 'return':
-                    return_value = result['value']
-                else:
-                    return_value = None
-            finally:
-                # Restore previous environment
-                self.variables = old_vars
-            
-            return return_value
-        
-        elif node['type'] == 'ReturnStatement':
-            value = self.evaluate(node['value'])
-            return {'type': 'return', 'value': value}
-        
-        elif node['type'] == 'SpitFunction':
-            # Handle both spit() and አውጣ() functions
-            args = [self.evaluate(arg) for arg in node['arguments']]
-            output = ' '.join(str(arg) for arg in args)
-            print(output)
-            return None
-        
-        elif node['type'] == 'UnaryOperation':
-            operand = self.evaluate(node['operand'])
-            operator = node['operator']
-            
-            if operator == '-':
-                return -operand
-            elif operator == 'not' or operator == 'ተቃራኒ':
-                return not operand
-            else:
-                raise Exception(f"Unknown unary operator: {operator}")
-        
-        elif node['type'] == 'Factorial':
-            value = self.evaluate(node['value'])
-            if not isinstance(value, int) or value < 0:
-                raise Exception("Factorial is only defined for non-negative integers")
-            return math.factorial(value)
-        
+        if name in self.variables:
+            return self.variables[name]
+        else:
+            raise Exception(f"Undefined variable: {name}")
+
+    def _evaluate_assignment(self, node):
+        value = self._evaluate(node.value)
+        if self.frame is not None:
+            self.frame.store(node.identifier, value)
         else:
-            raise Exception(f"Unknown node type: {node['type']}")
\ No newline at end of file
+            self.variables[node.identifier] = value
+        return value
+
+    def _evaluate_binary_operation(self, node):
+        left = self._evaluate(node.left)
+        right = self._evaluate(node.right)
+        try:
+            function = BINARY_OPERATORS[node.operator]
+        except KeyError:
+            raise Exception(f"Unknown binary operator: {node.operator}") from None
+        return function(left, right)
+
+    def _evaluate_comparison(self, node):
+        left = self._evaluate(node.left)
+        right = self._evaluate(node.right)
+        try:
+            function = COMPARISON_OPERATORS[node.operator]
+        except KeyError:
+            raise Exception(f"Unknown comparison operator: {node.operator}") from None
+        return function(left, right)
+
+    def _evaluate_logical_operation(self, node):
+        left = self._evaluate(node.left)
+        operator = node.operator
+
+        # Short-circuit evaluation
+        if operator == 'and' or operator == 'እና':
+            if not left:
+                return left
+            return self._evaluate(node.right)
+        elif operator == 'or' or operator == 'ወይም':
+            if left:
+                return left
+            return self._evaluate(node.right)
+        else:
+            raise Exception(f"Unknown logical operator: {operator}")
+
+    def _evaluate_if_statement(self, node):
+        condition = self._evaluate(node.condition)
+        if condition:
+            return self._evaluate(node.true_branch)
+        elif node.false_branch:
+            return self._evaluate(node.false_branch)
+        return None
+
+    def _evaluate_while_statement(self, node):
+        result = None
+        budget = self.budget
+        while self._evaluate(node.condition):
+            result = self._evaluate(node.body)
+            # If we encounter a return statement, propagate it immediately
+            if result is RETURN:
+                return result
+            # Every completed iteration is a step of the budget
+            if budget is not None:
+                budget.countdown -= 1
+                if budget.countdown <= 0:
+                    budget.check(node.line, node.column)
+        return result
+
+    def _evaluate_block(self, node):
+        result = None
+        for statement in node.statements:
+            result = self._evaluate(statement)
+            # Handle return statements in blocks
+            if result is RETURN:
+                return result
+        return result
+
+    def _evaluate_function_definition(self, node):
+        if self.frame is not None:
+            environment = self.frame.environment(self.variables)
+        else:
+            environment = dict(self.variables)
+        func = Function(
+            node.name,
+            node.parameters,
+            node.body,
+            environment,  # Capture current environment
+            resolve(node)
+        )
+        self.functions[node.name] = func
+        return None
+
+    def _evaluate_function_call(self, node):
+        func_name = node.name
+        if func_name not in self.functions:
+            raise Exception(f"Undefined function: {func_name}")
+
+        func = self.functions[func_name]
+        args = [self._evaluate(arg) for arg in node.arguments]
+
+        if len(args) != len(func.parameters):
+            raise Exception(f"Function {func_name} expects {len(func.parameters)} arguments, got {len(args)}")
+
+        # Every call is a step of the budget
+        budget = self.budget
+        if budget is not None:
+            if budget.max_depth is not None and len(self.call_stack) >= budget.max_depth:
+                raise budget.too_deep(node.line, node.column)
+            budget.countdown -= 1
+            if budget.countdown <= 0:
+                budget.check(node.line, node.column)
+
+        # The call gets a frame with a slot for each parameter and local
+        # variable; other names are looked up in the environment captured
+        # at definition and then in the caller's frames
+        frame = self.frame = Frame(func, args, self.frame, node)
+        self.call_stack.append(frame)
+
+        # Execute function body
+        try:
+            result = self._evaluate(func.body)
+            # A self tail call runs as the next iteration, in the same frame
+            while self.tail_arguments is not None:
+                frame.reenter(self.tail_arguments)
+                self.tail_arguments = None
+                result = self._evaluate(func.body)
+        except InterpreterError as error:
+            # Record the calls the error happened in before unwinding them
+            if error.call_stack is None:
+                error.call_stack = list(self.call_stack)
+            raise
+        finally:
+            # Return to the caller's frame
+            self.call_stack.pop()
+            self.frame = frame.parent
+
+        # Handle return value
+        if result is RETURN:
+            return self.return_value
+        return None
+
+    def _evaluate_return_statement(self, node):
+        value = node.value
+        frame = self.frame
+        if (value.kind == FUNCTION_CALL and frame is not None and
+                self.functions.get(value.name) is frame.function):
+            return self._tail_call(value, frame.function)
+        self.return_value = self._evaluate(value)
+        return RETURN
+
+    def _tail_call(self, node, func):
+        """Return from a call of func by calling func again.
+
+        The arguments are left in tail_arguments for the function call
+        being returned from, which runs the body again in its own frame
+        instead of nesting a new call.
+        """
+        args = [self._evaluate(arg) for arg in node.arguments]
+        if len(args) != len(func.parameters):
+            raise InterpreterError(
+                f"Function {func.name} expects {len(func.parameters)} arguments, got {len(args)}",
+                node.line, node.column)
+
+        # Still a step of the budget, but the call depth does not grow
+        budget = self.budget
+        if budget is not None:
+            budget.countdown -= 1
+            if budget.countdown <= 0:
+                budget.check(node.line, node.column)
+        self.tail_arguments = args
+        return RETURN
+
+    def _evaluate_spit_function(self, node):
+        # Handle both spit() and አውጣ() functions
+        args = [self._evaluate(arg) for arg in node.arguments]
+        output = ' '.join(str(arg) for arg in args)
+        print(output)
+        return None
+
+    def _evaluate_unary_operation(self, node):
+        operand = self._evaluate(node.operand)
+        operator = node.operator
+
+        if operator == '-':
+            return -operand
+        elif operator == 'not' or operator == 'ተቃራኒ':
+            return not operand
+        else:
+            raise Exception(f"Unknown unary operator: {operator}")
+
+    def _evaluate_factorial(self, node):
+        value = self._evaluate(node.value)
+        if not isinstance(value, int) or value < 0:
+            raise Exception("Factorial is only defined for non-negative integers")
+        return math.factorial(value)
+
+    # Node kind -> evaluation method
+    _EVALUATORS = {
+        NUMBER: _evaluate_number,
+        STRING: _evaluate_string,
+        IDENTIFIER: _evaluate_identifier,
+        ASSIGNMENT: _evaluate_assignment,
+        BINARY_OPERATION: _evaluate_binary_operation,
+        COMPARISON: _evaluate_comparison,
+        LOGICAL_OPERATION: _evaluate_logical_operation,
+        UNARY_OPERATION: _evaluate_unary_operation,
+        FACTORIAL: _evaluate_factorial,
+        FUNCTION_CALL: _evaluate_function_call,
+        SPIT_FUNCTION: _evaluate_spit_function,
+        IF_STATEMENT: _evaluate_if_statement,
+        WHILE_STATEMENT: _evaluate_while_statement,
+        BLOCK: _evaluate_block,
+        FUNCTION_DEFINITION: _evaluate_function_definition,
+        RETURN_STATEMENT: _evaluate_return_statement,
+        BOOLEAN: _evaluate_boolean,
+        CONSTANT: _evaluate_constant,
+    }
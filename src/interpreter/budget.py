@@ -0,0 +1,92 @@
+"""
+Execution budgets, for running programs that may not terminate.
+
+A Budget limits the number of steps a program may take, the wall-clock
+time it may run and how deeply its calls may nest. A step is one
+completed loop iteration or one function call; straight-line code
+between them is bounded by the size of the program, so counting steps
+is enough to stop any runaway program.
+
+Every engine takes a budget (Interpreter(budget=...), and likewise
+ClosureInterpreter and VirtualMachine) and raises BudgetExceeded, located
+at the loop or call that went over, when a limit is reached. Without a
+budget nothing is counted and loops run until they end.
+
+Engines keep the per-step cost to one decrement: they count down
+budget.countdown and only call check() when it reaches zero, which
+happens every CHECK_INTERVAL steps or at the step limit, whichever comes
+first. The clock is only read in check().
+"""
+
+import time
+
+from src.interpreter import InterpreterError
+
+
+class BudgetExceeded(InterpreterError):
+    """Raised when a program goes over a limit of its Budget.
+
+    limit is 'steps', 'time' or 'depth', and value the limit that was
+    exceeded (a step count, seconds or a call depth).
+    """
+
+    def __init__(self, limit, value, line=None, column=None):
+        self.limit = limit
+        self.value = value
+        if limit == 'steps':
+            message = f"Execution budget exceeded: more than {value} steps"
+        elif limit == 'time':
+            message = f"Execution budget exceeded: ran for more than {value} seconds"
+        else:
+            message = f"Execution budget exceeded: calls nested more than {value} deep"
+        super().__init__(message, line, column)
+
+
+class Budget:
+    """Limits on a program run; None means no limit.
+
+    steps caps loop iterations plus function calls, seconds the
+    wall-clock time since the budget was created (or reset()), and
+    max_depth the number of function calls running at once.
+
+    >>> interpreter = Interpreter(budget=Budget(steps=1000))
+    """
+
+    # Steps between two reads of the clock
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, steps=None, seconds=None, max_depth=None):
+        self.steps = steps
+        self.seconds = seconds
+        self.max_depth = max_depth
+        self.reset()
+
+    def reset(self):
+        """Start counting steps and time again."""
+        self.used = 0
+        self.deadline = None if self.seconds is None else time.monotonic() + self.seconds
+        self._next_check()
+
+    def _next_check(self):
+        chunk = self.CHECK_INTERVAL
+        if self.steps is not None:
+            # Check right after the last allowed step
+            chunk = min(chunk, self.steps + 1 - self.used)
+        self.chunk = self.countdown = chunk
+
+    def check(self, line=None, column=None):
+        """Account for the steps counted down since the last check.
+
+        Raises BudgetExceeded, located at line and column, if the step
+        limit or the deadline has passed.
+        """
+        self.used += self.chunk - self.countdown
+        if self.steps is not None and self.used > self.steps:
+            raise BudgetExceeded('steps', self.steps, line, column)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('time', self.seconds, line, column)
+        self._next_check()
+
+    def too_deep(self, line=None, column=None):
+        """The error for a call nested deeper than max_depth."""
+        return BudgetExceeded('depth', self.max_depth, line, column)
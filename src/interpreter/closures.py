@@ -0,0 +1,547 @@
+"""
+Closure-compiling execution engine.
+
+ClosureInterpreter compiles every AST node once into a Python closure
+specialized for its node kind and operator, for example one closure that
+adds the results of two operand closures for a '+' BinaryOperation.
+Running a program is then only calling closures: there is no dispatch on
+the node kind and no operator lookup per evaluation.
+
+Programs behave exactly as under Interpreter: the same values, output,
+variable scoping and error messages, with errors located at the same
+node, and the same Frames on call_stack. Function bodies are compiled
+against their resolved Scope, so parameters and local variables are read
+and written by slot. Self tail calls reuse the running frame, as in
+Interpreter.
+"""
+
+import math
+
+from src.lexer.tokens import SourceError
+from src.parser.nodes import (
+    NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION,
+    IF_STATEMENT, WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT,
+    BOOLEAN, CONSTANT, TRUE_WORDS,
+)
+from src.interpreter import Interpreter, InterpreterError, Function, BINARY_OPERATORS, RETURN
+from src.interpreter.resolver import UNDEFINED, Frame, resolve
+
+
+class CompiledFunction(Function):
+    """A function whose body was compiled; code runs the body."""
+
+    def __init__(self, name, parameters, body, closure_env, scope, code):
+        super().__init__(name, parameters, body, closure_env, scope)
+        self.code = code
+
+
+# Node kinds that can produce RETURN. Statements of any other kind need
+# no return check in a block.
+_MAY_RETURN = (IF_STATEMENT, WHILE_STATEMENT, BLOCK, RETURN_STATEMENT)
+
+
+def _may_return(node):
+    if node.kind == IF_STATEMENT:
+        return _may_return(node.true_branch) or (node.false_branch is not None and
+                                                 _may_return(node.false_branch))
+    if node.kind == BLOCK:
+        return any(_may_return(statement) for statement in node.statements)
+    return node.kind in _MAY_RETURN
+
+
+def _failing(message, line, column):
+    """A closure that raises message, for errors the interpreter only reports when reached."""
+    def run():
+        raise InterpreterError(message, line, column)
+    return run
+
+
+class ClosureInterpreter(Interpreter):
+    """An Interpreter that compiles each node to a closure before running it.
+
+    State (variables, functions) is kept exactly as Interpreter keeps it,
+    so the two can be used interchangeably:
+
+    >>> interpreter = ClosureInterpreter()
+    >>> for node in Parser(Lexer("x = 2 * 3 + 1").tokenize()).parse():
+    ...     interpreter.evaluate(node)
+    7
+    """
+
+    # The Scope of the function body being compiled, None at top level
+    _scope = None
+
+    def evaluate(self, node):
+        """Compile node, run it and return its value, as Interpreter.evaluate."""
+        try:
+            result = self.compile(node)()
+        except SourceError:
+            raise
+        except Exception as error:
+            # Errors no closure located, such as RecursionError
+            raise InterpreterError(str(error), getattr(node, 'line', None),
+                                   getattr(node, 'column', None)) from error
+        if result is RETURN:
+            return {'type': 'return', 'value': self.return_value}
+        return result
+
+    def compile(self, node):
+        """Return a closure that runs node and returns its value."""
+        compiler = self._COMPILERS.get(node.kind)
+        if compiler is None:
+            return _failing(f"Unknown node type: {node.type}", getattr(node, 'line', None),
+                            getattr(node, 'column', None))
+        return compiler(self, node)
+
+    def _compile_number(self, node):
+        try:
+            value = int(node.value)
+        except ValueError as error:
+            # Digits int() does not accept, such as superscripts
+            return _failing(str(error), node.line, node.column)
+        return lambda: value
+
+    def _compile_string(self, node):
+        value = node.value
+        return lambda: value
+
+    def _compile_boolean(self, node):
+        value = node.value in TRUE_WORDS
+        return lambda: value
+
+    def _compile_constant(self, node):
+        value = node.value
+        return lambda: value
+
+    def _compile_identifier(self, node):
+        interpreter = self
+        name = node.value
+        line, column = node.line, node.column
+        scope = self._scope
+
+        if scope is None:
+            def identifier():
+                try:
+                    return interpreter.variables[name]
+                except KeyError:
+                    raise InterpreterError(f"Undefined variable: {name}", line, column) from None
+        elif name in scope.slots:
+            slot = scope.slots[name]
+
+            def identifier():
+                frame = interpreter.frame
+                value = frame.values[slot]
+                if value is UNDEFINED:
+                    # Not assigned in this call yet
+                    value = frame.outer(name, interpreter.variables)
+                    if value is UNDEFINED:
+                        raise InterpreterError(f"Undefined variable: {name}", line, column)
+                return value
+        else:
+            def identifier():
+                value = interpreter.frame.outer(name, interpreter.variables)
+                if value is UNDEFINED:
+                    raise InterpreterError(f"Undefined variable: {name}", line, column)
+                return value
+        return identifier
+
+    def _compile_assignment(self, node):
+        interpreter = self
+        name = node.identifier
+        value = self.compile(node.value)
+
+        if self._scope is None:
+            def assignment():
+                result = value()
+                interpreter.variables[name] = result
+                return result
+        else:
+            slot = self._scope.slots[name]
+
+            def assignment():
+                result = value()
+                interpreter.frame.values[slot] = result
+                return result
+        return assignment
+
+    def _compile_binary_operation(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        line, column = node.line, node.column
+        operator = node.operator
+        if operator not in BINARY_OPERATORS:
+            message = f"Unknown binary operator: {operator}"
+
+            def unknown():
+                left()
+                right()
+                raise InterpreterError(message, line, column)
+            return unknown
+
+        if operator == '+':
+            def binary():
+                a = left()
+                b = right()
+                try:
+                    return a + b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '-':
+            def binary():
+                a = left()
+                b = right()
+                try:
+                    return a - b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '*':
+            def binary():
+                a = left()
+                b = right()
+                try:
+                    return a * b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '%':
+            def binary():
+                a = left()
+                b = right()
+                try:
+                    return a % b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        else:
+            function = BINARY_OPERATORS[operator]
+
+            def binary():
+                a = left()
+                b = right()
+                try:
+                    return function(a, b)
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        return binary
+
+    def _compile_comparison(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        line, column = node.line, node.column
+        operator = node.operator
+
+        if operator == '==':
+            def comparison():
+                a = left()
+                b = right()
+                return a == b
+        elif operator == '!=':
+            def comparison():
+                a = left()
+                b = right()
+                return a != b
+        elif operator == '<':
+            def comparison():
+                a = left()
+                b = right()
+                try:
+                    return a < b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '<=':
+            def comparison():
+                a = left()
+                b = right()
+                try:
+                    return a <= b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '>':
+            def comparison():
+                a = left()
+                b = right()
+                try:
+                    return a > b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        elif operator == '>=':
+            def comparison():
+                a = left()
+                b = right()
+                try:
+                    return a >= b
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+        else:
+            message = f"Unknown comparison operator: {operator}"
+
+            def comparison():
+                left()
+                right()
+                raise InterpreterError(message, line, column)
+        return comparison
+
+    def _compile_logical_operation(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        operator = node.operator
+
+        # Short-circuit evaluation
+        if operator == 'and' or operator == 'እና':
+            return lambda: left() and right()
+        elif operator == 'or' or operator == 'ወይም':
+            return lambda: left() or right()
+        message = f"Unknown logical operator: {operator}"
+        line, column = node.line, node.column
+
+        def unknown():
+            left()
+            raise InterpreterError(message, line, column)
+        return unknown
+
+    def _compile_unary_operation(self, node):
+        operand = self.compile(node.operand)
+        line, column = node.line, node.column
+        operator = node.operator
+
+        if operator == '-':
+            def negate():
+                value = operand()
+                try:
+                    return -value
+                except Exception as error:
+                    raise InterpreterError(str(error), line, column) from error
+            return negate
+        elif operator == 'not' or operator == 'ተቃራኒ':
+            return lambda: not operand()
+        message = f"Unknown unary operator: {operator}"
+
+        def unknown():
+            operand()
+            raise InterpreterError(message, line, column)
+        return unknown
+
+    def _compile_factorial(self, node):
+        operand = self.compile(node.value)
+        line, column = node.line, node.column
+        factorial = math.factorial
+
+        def run():
+            value = operand()
+            if not isinstance(value, int) or value < 0:
+                raise InterpreterError("Factorial is only defined for non-negative integers",
+                                       line, column)
+            try:
+                return factorial(value)
+            except Exception as error:
+                raise InterpreterError(str(error), line, column) from error
+        return run
+
+    def _compile_if_statement(self, node):
+        condition = self.compile(node.condition)
+        true_branch = self.compile(node.true_branch)
+        if not node.false_branch:
+            def if_statement():
+                if condition():
+                    return true_branch()
+                return None
+            return if_statement
+        false_branch = self.compile(node.false_branch)
+
+        def if_else_statement():
+            if condition():
+                return true_branch()
+            return false_branch()
+        return if_else_statement
+
+    def _compile_while_statement(self, node):
+        interpreter = self
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        line, column = node.line, node.column
+
+        def while_statement():
+            result = None
+            budget = interpreter.budget
+            while condition():
+                result = body()
+                if result is RETURN:
+                    return result
+                if budget is not None:
+                    budget.countdown -= 1
+                    if budget.countdown <= 0:
+                        budget.check(line, column)
+            return result
+        return while_statement
+
+    def _compile_block(self, node):
+        statements = node.statements
+        runs = [self.compile(statement) for statement in statements]
+        if not runs:
+            return lambda: None
+        if len(runs) == 1:
+            return runs[0]
+        last = runs[-1]
+        if not any(_may_return(statement) for statement in statements[:-1]):
+            # Only the last statement can return, and its result is the
+            # block's result either way
+            head = runs[:-1]
+
+            def block():
+                for run in head:
+                    run()
+                return last()
+            return block
+
+        checked = [(run, _may_return(statement)) for run, statement in zip(runs, statements)]
+
+        def returning_block():
+            result = None
+            for run, may_return in checked:
+                result = run()
+                if may_return and result is RETURN:
+                    return result
+            return result
+        return returning_block
+
+    def _compile_function_definition(self, node):
+        interpreter = self
+        name = node.name
+        parameters = node.parameters
+        body = node.body
+        scope = resolve(node)
+        outer = self._scope
+        self._scope = scope
+        try:
+            code = self.compile(body)
+        finally:
+            self._scope = outer
+
+        def function_definition():
+            frame = interpreter.frame
+            if frame is not None:
+                environment = frame.environment(interpreter.variables)
+            else:
+                environment = dict(interpreter.variables)
+            interpreter.functions[name] = CompiledFunction(
+                name, parameters, body, environment, scope, code)
+            return None
+        return function_definition
+
+    def _compile_function_call(self, node):
+        interpreter = self
+        name = node.name
+        arguments = [self.compile(argument) for argument in node.arguments]
+        line, column = node.line, node.column
+
+        def function_call():
+            functions = interpreter.functions
+            if name not in functions:
+                raise InterpreterError(f"Undefined function: {name}", line, column)
+            function = functions[name]
+            args = [argument() for argument in arguments]
+            parameters = function.parameters
+            if len(args) != len(parameters):
+                raise InterpreterError(
+                    f"Function {name} expects {len(parameters)} arguments, got {len(args)}",
+                    line, column)
+
+            budget = interpreter.budget
+            if budget is not None:
+                if budget.max_depth is not None and len(interpreter.call_stack) >= budget.max_depth:
+                    raise budget.too_deep(line, column)
+                budget.countdown -= 1
+                if budget.countdown <= 0:
+                    budget.check(line, column)
+
+            # Same scoping as Interpreter: the call runs in its own frame
+            frame = interpreter.frame = Frame(function, args, interpreter.frame, node)
+            call_stack = interpreter.call_stack
+            call_stack.append(frame)
+            try:
+                result = function.code()
+                # A self tail call runs as the next iteration, in the same frame
+                while interpreter.tail_arguments is not None:
+                    frame.reenter(interpreter.tail_arguments)
+                    interpreter.tail_arguments = None
+                    result = function.code()
+            except InterpreterError as error:
+                if error.call_stack is None:
+                    error.call_stack = list(call_stack)
+                raise
+            finally:
+                call_stack.pop()
+                interpreter.frame = frame.parent
+            if result is RETURN:
+                return interpreter.return_value
+            return None
+        return function_call
+
+    def _compile_return_statement(self, node):
+        interpreter = self
+        value = self.compile(node.value)
+        if self._scope is not None and node.value.kind == FUNCTION_CALL:
+            return self._compile_tail_call(node.value, value)
+
+        def return_statement():
+            interpreter.return_value = value()
+            return RETURN
+        return return_statement
+
+    def _compile_tail_call(self, node, call):
+        """A return of call, which is a self tail call if it calls the running function."""
+        interpreter = self
+        name = node.name
+        arguments = [self.compile(argument) for argument in node.arguments]
+        line, column = node.line, node.column
+
+        def tail_call():
+            function = interpreter.frame.function
+            if interpreter.functions.get(name) is not function:
+                interpreter.return_value = call()
+                return RETURN
+            args = [argument() for argument in arguments]
+            parameters = function.parameters
+            if len(args) != len(parameters):
+                raise InterpreterError(
+                    f"Function {name} expects {len(parameters)} arguments, got {len(args)}",
+                    line, column)
+
+            # As Interpreter._tail_call: a step, but no deeper
+            budget = interpreter.budget
+            if budget is not None:
+                budget.countdown -= 1
+                if budget.countdown <= 0:
+                    budget.check(line, column)
+            interpreter.tail_arguments = args
+            return RETURN
+        return tail_call
+
+    def _compile_spit_function(self, node):
+        arguments = [self.compile(argument) for argument in node.arguments]
+
+        def spit():
+            print(' '.join([str(argument()) for argument in arguments]))
+            return None
+        return spit
+
+    # Node kind -> compilation method
+    _COMPILERS = {
+        NUMBER: _compile_number,
+        STRING: _compile_string,
+        IDENTIFIER: _compile_identifier,
+        ASSIGNMENT: _compile_assignment,
+        BINARY_OPERATION: _compile_binary_operation,
+        COMPARISON: _compile_comparison,
+        LOGICAL_OPERATION: _compile_logical_operation,
+        UNARY_OPERATION: _compile_unary_operation,
+        FACTORIAL: _compile_factorial,
+        FUNCTION_CALL: _compile_function_call,
+        SPIT_FUNCTION: _compile_spit_function,
+        IF_STATEMENT: _compile_if_statement,
+        WHILE_STATEMENT: _compile_while_statement,
+        BLOCK: _compile_block,
+        FUNCTION_DEFINITION: _compile_function_definition,
+        RETURN_STATEMENT: _compile_return_statement,
+        BOOLEAN: _compile_boolean,
+        CONSTANT: _compile_constant,
+    }
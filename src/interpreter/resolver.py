@@ -0,0 +1,185 @@
+"""
+Scope resolution and call frames.
+
+resolve() runs once per function definition and gives every parameter
+and every variable the body assigns a fixed slot. A call then creates a
+Frame holding one list of that size, instead of copying every live
+variable into a new dict and restoring it afterwards, so a call costs
+O(parameters + locals) however many variables the program has.
+
+Scoping is unchanged. A function body sees, in order of precedence:
+
+    1. its parameters and the variables it has assigned (its slots)
+    2. the environment it captured when it was defined (closure_env)
+    3. everything its caller sees, down to the global variables
+
+Assignments inside a function only ever write its own slots. Reading a
+name that is not in the first two levels walks the callers' frames. No
+caller can change while one of its callees runs, so each frame caches
+what it found; repeated lookups, for example of a global in a deep
+recursion, are one dict lookup.
+
+A self tail call (`return f(...)` inside f) does not push a frame:
+Frame.reenter() rebinds the running frame to the new arguments, so tail
+recursion runs in constant Python stack and call depth.
+"""
+
+from src.parser.nodes import Node, ASSIGNMENT, FUNCTION_DEFINITION
+
+# The value of a slot that has not been assigned yet
+UNDEFINED = object()
+
+
+class Scope:
+    """The slots of a function: parameters first, then assigned variables.
+
+    slots maps each name to its slot. A parameter that appears twice maps
+    to its last slot, since the last argument wins.
+    """
+
+    __slots__ = ('names', 'slots')
+
+    def __init__(self, names):
+        self.names = names
+        self.slots = {name: slot for slot, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"Scope({self.names!r})"
+
+
+def resolve(function):
+    """Return the Scope of a FunctionDefinition node.
+
+    Nested function definitions are skipped: their assignments go to
+    their own frames.
+    """
+    names = list(function.parameters)
+    assigned = set(names)
+    stack = [function.body]
+    while stack:
+        node = stack.pop()
+        kind = node.kind
+        if kind == FUNCTION_DEFINITION:
+            continue
+        if kind == ASSIGNMENT and node.identifier not in assigned:
+            assigned.add(node.identifier)
+            names.append(node.identifier)
+        children = []
+        for name in node.fields:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, Node))
+        # Visit children in source order, so slots follow first assignment
+        stack.extend(reversed(children))
+    return Scope(names)
+
+
+class Frame:
+    """One function call: the function, its arguments and its variables.
+
+    values holds one value per slot of function.scope (UNDEFINED until
+    assigned); parent is the caller's frame, or None for a call from the
+    top level. node is the FunctionCall node that made the call, so the
+    caller's current position is node.line and node.column.
+    """
+
+    __slots__ = ('function', 'arguments', 'values', 'parent', 'node', 'cache')
+
+    def __init__(self, function, arguments, parent, node=None):
+        self.function = function
+        self.arguments = arguments
+        self.values = arguments + [UNDEFINED] * (len(function.scope) - len(arguments))
+        self.parent = parent
+        self.node = node
+        self.cache = {}
+
+    def __str__(self):
+        arguments = ', '.join(repr(argument) for argument in self.arguments)
+        text = f"{self.function.name}({arguments})"
+        if self.node is not None and self.node.line is not None:
+            text += f", called at line {self.node.line}, column {self.node.column}"
+        return text
+
+    def __repr__(self):
+        return f"<Frame {self}>"
+
+    def locals(self):
+        """The parameters and the variables the call has assigned so far."""
+        return {name: value for name, value in zip(self.function.scope.names, self.values)
+                if value is not UNDEFINED}
+
+    def load(self, name, variables):
+        """The value of name in this call, or UNDEFINED; variables are the globals."""
+        slot = self.function.scope.slots.get(name)
+        if slot is not None:
+            value = self.values[slot]
+            if value is not UNDEFINED:
+                return value
+        return self.outer(name, variables)
+
+    def store(self, name, value):
+        self.values[self.function.scope.slots[name]] = value
+
+    def reenter(self, arguments):
+        """Run the next call of a self tail call in this frame.
+
+        The call this replaces would have been a callee of this one, and
+        seen the variables this call assigned wherever the captured
+        environment does not shadow them, so those are kept. Cached outer
+        lookups stay valid: the callers and closure_env are the same.
+        """
+        scope = self.function.scope
+        closure_env = self.function.closure_env
+        values = arguments + [UNDEFINED] * (len(scope) - len(arguments))
+        for slot in range(len(arguments), len(scope)):
+            value = self.values[slot]
+            if value is not UNDEFINED and scope.names[slot] not in closure_env:
+                values[slot] = value
+        self.arguments = arguments
+        self.values = values
+
+    def outer(self, name, variables):
+        """The value of name from outside this call's slots, or UNDEFINED."""
+        frame = self
+        visited = []
+        while True:
+            cache = frame.cache
+            if name in cache:
+                value = cache[name]
+                break
+            closure_env = frame.function.closure_env
+            if name in closure_env:
+                value = closure_env[name]
+                break
+            visited.append(frame)
+            frame = frame.parent
+            if frame is None:
+                value = variables.get(name, UNDEFINED)
+                break
+            slot = frame.function.scope.slots.get(name)
+            if slot is not None and frame.values[slot] is not UNDEFINED:
+                value = frame.values[slot]
+                break
+        for frame in visited:
+            frame.cache[name] = value
+        return value
+
+    def environment(self, variables):
+        """Every variable this call sees, as a dict, for functions defined in it."""
+        frames = []
+        frame = self
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.parent
+        environment = dict(variables)
+        for frame in reversed(frames):
+            environment.update(frame.function.closure_env)
+            for name, value in zip(frame.function.scope.names, frame.values):
+                if value is not UNDEFINED:
+                    environment[name] = value
+        return environment
@@ -0,0 +1,315 @@
+"""
+Incremental lexing for the REPL and editor integrations.
+
+IncrementalLexer keeps the token stream of a text buffer up to date under
+small edits. An edit re-scans only the damaged region and splices the new
+tokens into the stream, instead of tokenizing the whole buffer again.
+
+The buffer is kept in blocks of at most BLOCK_SIZE tokens, each holding
+its own slice of the text and token offsets relative to the block start.
+An edit only reads and rebuilds the blocks around it: the blocks after
+the damaged region are reused as they are and simply start at a different
+offset. Positioned Token objects are only built when tokens() is called,
+and only for blocks whose position changed.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from src.lexer.lexer import Lexer, _TokenCache
+from src.lexer.tokens import Token, LexerError, UNKNOWN
+
+
+class _Block:
+    """A run of consecutive tokens and the text they were scanned from.
+
+    text runs from the end of the previous block's last token to the end
+    of this block's last token. entries holds (kind, value, start, end)
+    with offsets relative to the start of text; quotes counts the bare
+    (unterminated) quotes among them.
+    """
+
+    __slots__ = ('entries', 'text', 'length', 'newlines', 'quotes', 'tokens', 'anchor')
+
+    def __init__(self, entries, text):
+        self.entries = entries
+        self.text = text
+        self.length = len(text)
+        self.newlines = text.count('\n')
+        self.quotes = sum(1 for kind, value, _, _ in entries
+                          if kind == UNKNOWN and (value == '"' or value == "'"))
+        self.tokens = None  # Positioned tokens, built by IncrementalLexer.tokens()
+        self.anchor = None  # (start, line, line_start) the tokens were built for
+
+
+class IncrementalLexer:
+    """Keep the tokens of an editable text buffer in sync with the text.
+
+    >>> lexer = IncrementalLexer("x = 1")
+    >>> lexer.edit(4, 1, "42")
+    (0, 6)
+    >>> lexer.source
+    'x = 42'
+
+    tokens() always equals Lexer(lexer.source).tokenize(), including
+    positions and the LexerError for an unterminated string. edit() itself
+    never raises for lexical errors, so a buffer may pass through invalid
+    states while it is being typed.
+    """
+
+    # Tokens per block: the most an edit re-scans before reaching the edit
+    BLOCK_SIZE = 64
+
+    # The scanner may look this far past a token start (እስከሆነ ድረስ), so
+    # tokens this close to an edit or to the end of the scanned text are
+    # scanned again
+    MARGIN = Lexer._STREAM_MARGIN
+
+    # Blocks walked from the previous edit before searching all blocks
+    HINT_STEPS = 32
+
+    def __init__(self, source=''):
+        self._cache = _TokenCache(Lexer(''))
+        self._find = Lexer._token_pattern.finditer
+        self._blocks = []
+        self._lengths = []  # Text length of each block
+        self._quotes = 0  # Bare quotes in all blocks
+        self._hint = (0, 0)  # (index, start) of the block the last edit restarted at
+        self._tail = ''  # Text after the last token
+        self._length = 0
+        self._source = ''
+        self._tokens = None
+        self.edit(0, 0, source)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def source(self):
+        """The current text of the buffer."""
+        if self._source is None:
+            self._source = ''.join([block.text for block in self._blocks]) + self._tail
+        return self._source
+
+    def append(self, text):
+        """Append text to the end of the buffer."""
+        return self.edit(self._length, 0, text)
+
+    def edit(self, offset, removed, inserted):
+        """Replace removed characters at offset with the inserted text.
+
+        Returns the (start, end) span of the new text that was re-scanned.
+        """
+        if not 0 <= offset <= self._length or removed < 0 or offset + removed > self._length:
+            raise ValueError(f"Edit out of range: {offset}, {removed}")
+        self._length += len(inserted) - removed
+        self._source = None
+        self._tokens = None
+        blocks = self._blocks
+
+        # Restart at the first block whose tokens the edit may affect: the
+        # first one ending near the edit, or an earlier bare quote, whose
+        # meaning depends on all the text after it
+        first, start = self._find_block(offset)
+        if self._quotes:
+            quoted = next(index for index, block in enumerate(blocks) if block.quotes)
+            if quoted < first:
+                first, start = quoted, sum(self._lengths[:quoted])
+
+        # Scan a window of whole blocks around the edit, doubling it until
+        # the new tokens line up with old ones again (or the text ends)
+        extra = 1
+        while True:
+            texts = []
+            window_end = start
+            stop = first
+            while stop < len(blocks) and (window_end <= offset + removed + self.MARGIN or
+                                          stop - first < extra):
+                texts.append(blocks[stop].text)
+                window_end += blocks[stop].length
+                stop += 1
+            at_end = stop == len(blocks)
+            if at_end:
+                texts.append(self._tail)
+            text = ''.join(texts)
+            text = text[:offset - start] + inserted + text[offset - start + removed:]
+            result = self._scan(text, start, first, stop, offset, removed, inserted, at_end)
+            if result is not None:
+                break
+            extra *= 2
+        entries, sync = result
+
+        # Splice: the re-scanned tokens plus the rest of the synced block
+        # replace the blocks from the restart point to the synced block
+        delta = len(inserted) - removed
+        if sync is None:
+            last = len(blocks)
+            end = entries[-1][3] if entries else start
+            self._tail = text[end - start:]
+        else:
+            index, position, block_start = sync
+            block = blocks[index]
+            base = block_start + delta
+            entries.extend((kind, value, base + token_start, base + token_end)
+                           for kind, value, token_start, token_end in block.entries[position:])
+            end = base + block.length
+            last = index + 1
+            # Fold a following block into a short tail to keep blocks full
+            if len(entries) % self.BLOCK_SIZE < self.BLOCK_SIZE // 2 and last < len(blocks):
+                block = blocks[last]
+                text = text[:end - start] + block.text
+                entries.extend((kind, value, end + token_start, end + token_end)
+                               for kind, value, token_start, token_end in block.entries)
+                end += block.length
+                last += 1
+        new_blocks = self._make_blocks(entries, start, text[:end - start])
+        self._quotes += (sum(block.quotes for block in new_blocks) -
+                         sum(block.quotes for block in blocks[first:last]))
+        blocks[first:last] = new_blocks
+        self._lengths[first:last] = [block.length for block in new_blocks]
+        self._hint = (first, start)
+        return start, (entries[-1][3] if entries else start)
+
+    def _find_block(self, offset):
+        """Return (index, start) of the first block ending near offset.
+
+        Edits usually happen close to the previous one, so the search walks
+        from the last restart block and only falls back to a prefix sum
+        over all block lengths when the edit is far away.
+        """
+        lengths = self._lengths
+        margin = self.MARGIN
+        index, start = self._hint
+        index = min(index, len(lengths))
+        for _ in range(self.HINT_STEPS):
+            if index > 0 and start + margin >= offset:
+                index -= 1
+                start -= lengths[index]
+            elif index < len(lengths) and start + lengths[index] + margin < offset:
+                start += lengths[index]
+                index += 1
+            else:
+                return index, start
+        ends = list(accumulate(lengths))
+        index = bisect_left(ends, offset - margin)
+        return index, (ends[index - 1] if index else 0)
+
+    def _scan(self, text, start, first, stop, offset, removed, inserted, at_end):
+        """Re-scan the window text, which starts at offset start.
+
+        Returns the new (kind, value, start, end) entries up to the first
+        token that matches an old token after the edit, and that old token
+        as (block index, entry index, old block start). The old token is
+        None if the scan reached the end of the buffer. Returns None if
+        the window ended before the scan could sync.
+        """
+        blocks = self._blocks
+        cache = self._cache
+        margin = self.MARGIN
+        delta = len(inserted) - removed
+        edit_end = offset + len(inserted)
+
+        # Old tokens from the end of the removed text on, in old offsets
+        def old_tokens():
+            block_start = start
+            for index in range(first, stop):
+                entries = blocks[index].entries
+                for position in range(len(entries)):
+                    old_start = block_start + entries[position][2]
+                    if old_start >= offset + removed:
+                        yield old_start + delta, index, position, block_start
+                block_start += blocks[index].length
+        following = old_tokens()
+        old = next(following, None)
+
+        entries = []
+        limit = len(text) - margin
+        for match in self._find(text):
+            token = match.group(2)
+            if not at_end and (not token or match.end(2) > limit or
+                               token == '"' or token == "'"):
+                return None  # The rest of the buffer may change this token
+            if not token:
+                break
+            token_start = start + match.start(2)
+            token_end = start + match.end(2)
+            if token == '"' or token == "'":
+                kind, value = UNKNOWN, token  # Reported by tokens()
+            else:
+                kind, value = cache[token]
+            while old is not None and old[0] < token_start:
+                old = next(following, None)
+            if old is not None and old[0] == token_start and token_start >= edit_end:
+                _, index, position, block_start = old
+                old_kind, old_value, _, old_end = blocks[index].entries[position]
+                if (block_start + old_end + delta == token_end and
+                        (old_kind, old_value) == (kind, value)):
+                    return entries, old[1:]
+            entries.append((kind, value, token_start, token_end))
+        return entries, None
+
+    def _make_blocks(self, entries, start, text):
+        """Split absolute (kind, value, start, end) entries over text into blocks."""
+        size = self.BLOCK_SIZE
+        base = start
+        blocks = []
+        for index in range(0, len(entries), size):
+            chunk = entries[index:index + size]
+            end = chunk[-1][3]
+            blocks.append(_Block(
+                [(kind, value, token_start - start, token_end - start)
+                 for kind, value, token_start, token_end in chunk],
+                text[start - base:end - base],
+            ))
+            start = end
+        return blocks
+
+    def tokens(self):
+        """Return the positioned tokens of the current buffer.
+
+        Blocks whose position did not change since the last call reuse
+        their Token objects. Raises LexerError if the buffer contains an
+        unterminated string.
+        """
+        if self._tokens is not None:
+            return self._tokens
+        tokens = []
+        start = 0
+        line = 1
+        line_start = 0
+        for block in self._blocks:
+            anchor = (start, line, line_start)
+            if block.anchor != anchor:
+                block.tokens = self._position(block, start, line, line_start)
+                block.anchor = anchor
+            if block.quotes:
+                token = next(token for token in block.tokens
+                             if token.kind == UNKNOWN and token.value in ('"', "'"))
+                raise LexerError("Unterminated string literal", token.line, token.column)
+            tokens.extend(block.tokens)
+            if block.newlines:
+                line += block.newlines
+                line_start = start + block.text.rindex('\n') + 1
+            start += block.length
+        self._tokens = tokens
+        return tokens
+
+    def tokenize(self):
+        """Same as tokens(), so an IncrementalLexer can stand in for a Lexer."""
+        return self.tokens()
+
+    def _position(self, block, start, line, line_start):
+        """Build the Token objects of a block that starts at a known position."""
+        text = block.text
+        # Offsets (relative to the block) of the newline ending each line
+        newlines = [line_start - start - 1]
+        position = text.find('\n')
+        while position != -1:
+            newlines.append(position)
+            position = text.find('\n', position + 1)
+        tokens = []
+        for kind, value, token_start, token_end in block.entries:
+            index = bisect_right(newlines, token_start - 1) - 1
+            tokens.append(Token(kind, value, start + token_start, start + token_end,
+                                line + index, token_start - newlines[index]))
+        return tokens
@@ -1,61 +1,238 @@
+import re
+import sys
+from bisect import bisect_right
+from itertools import accumulate, chain, repeat
+from operator import itemgetter, sub
+
+from src.lexer.tokens import (
+    Token, SharedToken, LexerError, TOKEN_KINDS, IDENTIFIER, NUMBER, STRING, UNKNOWN,
+    NEWLINE, INDENT, DEDENT, LPAREN, RPAREN,
+)
+
+
+def _build_keyword_trie(keywords):
+    """Build a character trie mapping every keyword spelling to its token.
+
+    Keywords containing underscores (like እስከሆነ_ድረስ) are also reachable
+    through their space-separated spelling. Terminal nodes store the
+    ``(token_type, keyword)`` pair under the ``None`` key.
+    """
+    trie = {}
+    for keyword, token_type in keywords.items():
+        spellings = {keyword, keyword.replace('_', ' ')}
+        for spelling in spellings:
+            node = trie
+            for char in spelling:
+                node = node.setdefault(char, {})
+            node[None] = (token_type, spelling)
+    return trie
+
+
+def _non_decimal_digits():
+    """Return the characters that are digits but not decimal digits.
+
+    These all live below U+20000, so only the BMP and SMP are scanned.
+    """
+    return ''.join(char for char in map(chr, range(0x20000))
+                   if char.isdigit() and not char.isdecimal())
+
+
+class _TokenCache(dict):
+    """Maps token texts to (kind, value) pairs, classifying unseen texts on demand."""
+
+    def __init__(self, lexer):
+        super().__init__(lexer._fixed_tokens)
+        self.lexer = lexer
+
+    def __missing__(self, text):
+        token = self[text] = self.lexer._classify(text)
+        return token
+
+
+class _SharedTokenCache(dict):
+    """Maps token texts to SharedTokens, creating one per unseen text.
+
+    Fixed operator and keyword texts map to the class-wide tokens in
+    Lexer._shared_tokens, so only names and literals are created per call.
+    """
+
+    def __init__(self, lexer):
+        super().__init__(lexer._shared_tokens)
+        self.lexer = lexer
+
+    def __missing__(self, text):
+        token = self[text] = SharedToken(*self.lexer._classify(text))
+        return token
+
+
 class Lexer:
-    def __init__(self, source_code):
+    # Define the Amharic token map (keyword string to token type)
+    # Using uppercase for token types is a common convention.
+    amharic_keywords = {
+        # Control Flow
+        'ከሆነ': 'IF',
+        'ካልሆነ': 'ELSE',
+        'እስከሆነ_ድረስ': 'WHILE',
+        'ለእያንዳንዱ': 'FOR',  # "For each"
+        'አቋርጥ': 'BREAK',
+        'ቀጥል': 'CONTINUE',
+
+        # Function Definition
+        'ግለጽ': 'DEF',
+        'መልስ': 'RETURN',
+
+        # Logical Operators (as keywords)
+        'እና': 'AND',
+        'ወይም': 'OR',
+        'ተቃራኒ': 'NOT',  # "Opposite/negation" for boolean NOT
+
+        # Assignment (if using Amharic word)
+        'ይሁን': 'ASSIGN_KW',  # "Let it be / Becomes" for '=' written as a word
+
+        # Input/Output
+        'አውጣ': 'PRINT',  # Your 'SPIT' -> 'PRINT' token type
+        'አስገባ': 'INPUT',
+
+        # Boolean Literals
+        'እውነት': 'TRUE_LITERAL',
+        'ሐሰት': 'FALSE_LITERAL',
+
+        # Membership
+        'ውስጥ': 'IN',
+    }
+
+    # Keep English keywords for backward compatibility
+    english_keywords = {
+        'if': 'IF', 
+        'else': 'ELSE', 
+        'while': 'WHILE', 
+        'def': 'DEF', 
+        'return': 'RETURN',
+        'and': 'AND',
+        'or': 'OR',
+        'not': 'NOT',
+        'spit': 'SPIT',  # Keep existing spit function
+        'true': 'TRUE_LITERAL',
+        'false': 'FALSE_LITERAL',
+    }
+
+    # Combine both keyword sets
+    keywords = {**english_keywords, **amharic_keywords}
+
+    # Built once per class; shared by every Lexer instance
+    _keyword_trie = _build_keyword_trie(keywords)
+
+    # Fixed operator/punctuation spellings and their token types
+    _operator_tokens = {
+        '==': 'EQUALS',
+        '!=': 'NOT_EQUALS',
+        '<=': 'LESS_EQUALS',
+        '>=': 'GREATER_EQUALS',
+        '!': 'FACTORIAL',
+        '<': 'LESS',
+        '>': 'GREATER',
+        '+': 'PLUS',
+        '-': 'MINUS',
+        '*': 'MULTIPLY',
+        '/': 'DIVIDE',
+        '=': 'ASSIGN',
+        '(': 'LPAREN',
+        ')': 'RPAREN',
+        ':': 'COLON',
+        ',': 'COMMA',
+        ';': 'SEMICOLON',
+        '%': 'MODULO',
+    }
+
+    # Keywords written with a space in the source (እስከሆነ ድረስ)
+    _spaced_keywords = {
+        keyword.replace('_', ' '): token_type
+        for keyword, token_type in keywords.items() if '_' in keyword
+    }
+
+    # Identifier characters: Unicode alphanumerics, '_' and the Ethiopic
+    # ranges accepted by _is_identifier_char
+    _IDENTIFIER_CHARS = r'\w\u1200-\u139F\u2D80-\u2DDF'
+
+    # Digits that str.isdigit() accepts but \d does not (superscripts,
+    # Ethiopic numerals ፩-፱, ...)
+    _NON_DECIMAL_DIGITS = re.escape(_non_decimal_digits())
+
+    # Master pattern for the regex backend. Every match is the whitespace and
+    # comments skipped before a token (group 1) followed by the token text
+    # (group 2).
+    # Alternatives that can start with the same character are tried in the
+    # same priority order as the branches of the scanner backend (spaced
+    # keywords, then numbers, then identifiers). The \Z alternative only
+    # produces empty matches at the end of the input.
+    _token_pattern = re.compile(
+        r'((?:\s+|\#[^\n]*\n?)*)'
+        r'(==|!=|<=|>=|[!<>+\-*/=():,;%%]'
+        r'|"[^"]*"|\'[^\']*\'|["\']'
+        r'|(?:\d|[%s])+'
+        r'|(?:%s)(?![%s])'
+        r'|[%s]+'
+        r'|\S'
+        r'|\Z)' % (
+            _NON_DECIMAL_DIGITS,
+            '|'.join(re.escape(keyword) for keyword in _spaced_keywords),
+            _IDENTIFIER_CHARS,
+            _IDENTIFIER_CHARS,
+        ),
+    )
+
+    _identifier_start = re.compile(r'[%s]' % _IDENTIFIER_CHARS).match
+
+    # Token texts whose (kind, value) is determined by the text alone
+    _fixed_tokens = {
+        text: (TOKEN_KINDS[token_type], text)
+        for table in (_operator_tokens, keywords, _spaced_keywords)
+        for text, token_type in table.items()
+    }
+
+    # One immutable token per fixed text, shared by every Lexer created with
+    # positions=False
+    _shared_tokens = {
+        text: SharedToken(kind, value) for text, (kind, value) in _fixed_tokens.items()
+    }
+
+    BACKENDS = ('regex', 'scanner')
+
+    # Characters read per chunk when streaming from a file object
+    CHUNK_SIZE = 1 << 16
+
+    # A match ending this close to the end of a partial buffer may still
+    # change once more input arrives (e.g. "እስከሆነ" followed by " ድረስ")
+    _STREAM_MARGIN = max(len(keyword) for keyword in _spaced_keywords) + 1
+
+    def __init__(self, source_code, backend='regex', positions=True, layout=False):
+        """Create a lexer.
+
+        source_code is normally a string, but may also be a text file object
+        or an iterable of string chunks; see iter_tokens().
+
+        With positions=False tokens carry no source span. Every occurrence of
+        the same operator, keyword, name or literal is then the same
+        SharedToken object, which keeps large token lists small.
+
+        With layout=True the line structure is made explicit for
+        Parser(..., layout=True): a NEWLINE token ends every logical line,
+        and INDENT/DEDENT tokens open and close indented blocks; see
+        _layout(). The default is the original free-form (semicolon) style.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown lexer backend: {backend}")
+        if layout and not positions:
+            raise ValueError("Layout tokens need token positions")
+        self.backend = backend
+        self.positions = positions
+        self.layout = layout
         self.source_code = source_code
         self.position = 0
-        self.current_char = self.source_code[self.position] if self.source_code else None
-        
-        # Define the Amharic token map (keyword string to token type)
-        # Using uppercase for token types is a common convention.
-        self.amharic_keywords = {
-            # Control Flow
-            'ከሆነ': 'IF',
-            'ካልሆነ': 'ELSE',
-            'እስከሆነ_ድረስ': 'WHILE',
-            'ለእያንዳንዱ': 'FOR',  # "For each"
-            'አቋርጥ': 'BREAK',
-            'ቀጥል': 'CONTINUE',
-
-            # Function Definition
-            'ግለጽ': 'DEF',
-            'መልስ': 'RETURN',
-
-            # Logical Operators (as keywords)
-            'እና': 'AND',
-            'ወይም': 'OR',
-            'ተቃራኒ': 'NOT',  # "Opposite/negation" for boolean NOT
-
-            # Assignment (if using Amharic word)
-            'ይሁን': 'ASSIGN_KW',  # "Let it be / Becomes" for '=' written as a word
-
-            # Input/Output
-            'አውጣ': 'PRINT',  # Your 'SPIT' -> 'PRINT' token type
-            'አስገባ': 'INPUT',
-
-            # Boolean Literals
-            'እውነት': 'TRUE_LITERAL',
-            'ሐሰት': 'FALSE_LITERAL',
-
-            # Membership
-            'ውስጥ': 'IN',
-        }
-        
-        # Keep English keywords for backward compatibility
-        self.english_keywords = {
-            'if': 'IF', 
-            'else': 'ELSE', 
-            'while': 'WHILE', 
-            'def': 'DEF', 
-            'return': 'RETURN',
-            'and': 'AND',
-            'or': 'OR',
-            'not': 'NOT',
-            'spit': 'SPIT',  # Keep existing spit function
-            'true': 'TRUE_LITERAL',
-            'false': 'FALSE_LITERAL',
-        }
-        
-        # Combine both keyword sets
-        self.keywords = {**self.english_keywords, **self.amharic_keywords}
+        if isinstance(source_code, str):
+            self.current_char = source_code[0] if source_code else None
+        else:
+            self.current_char = None
 
     def advance(self):
         self.position += 1
@@ -88,32 +265,39 @@ class Lexer:
         if self.current_char == '\n':
             self.advance()
 
-    def _check_multi_word_keywords(self):
-        """Check for multi-word Amharic keywords first"""
-        # Sort keywords by length (longest first) to match longer keywords first
-        sorted_keywords = sorted(self.amharic_keywords.keys(), key=len, reverse=True)
-        
-        for keyword in sorted_keywords:
-            if '_' in keyword:
-                # Handle keywords with underscores (like እስከሆነ_ድረስ)
-                # Replace underscore with space for matching
-                keyword_to_match = keyword.replace('_', ' ')
-            else:
-                keyword_to_match = keyword
-                
-            if self.source_code[self.position:].startswith(keyword_to_match):
-                # Check if this is a complete word (not part of a larger identifier)
-                next_pos = self.position + len(keyword_to_match)
-                if (next_pos >= len(self.source_code) or 
-                    not self._is_identifier_char(self.source_code[next_pos])):
-                    
-                    # Advance position past the keyword
-                    for _ in range(len(keyword_to_match)):
-                        self.advance()
-                    
-                    return (self.amharic_keywords[keyword], keyword_to_match)
-        
-        return None
+    def _match_keyword(self):
+        """Match the longest keyword starting at the current position.
+
+        Walks the class keyword trie one character at a time, so no
+        substrings are built and the cost is bounded by the longest keyword.
+        A keyword only matches if it is not followed by an identifier
+        character (so ``iffy`` stays an identifier).
+        """
+        source = self.source_code
+        length = len(source)
+        pos = self.position
+        node = self._keyword_trie
+        match = None
+        match_end = pos
+
+        while pos < length:
+            node = node.get(source[pos])
+            if node is None:
+                break
+            pos += 1
+            entry = node.get(None)
+            if entry is not None and (pos >= length or
+                                      not self._is_identifier_char(source[pos])):
+                match = entry
+                match_end = pos
+
+        if match is None:
+            return None
+
+        # Jump straight past the keyword
+        self.position = match_end
+        self.current_char = source[match_end] if match_end < length else None
+        return match
 
     def _is_identifier_char(self, char):
         """Check if character can be part of an identifier (supports Unicode/Amharic)"""
@@ -128,7 +312,239 @@ class Lexer:
                 (0x2D80 <= char_code <= 0x2DDF))     # Ethiopic Extended
 
     def tokenize(self):
+        """Convert the source code into a list of Token objects."""
+        if self.layout:
+            return list(self._layout(self._tokenize()))
+        return self._tokenize()
+
+    def _tokenize(self):
+        if not isinstance(self.source_code, str):
+            if self.backend == 'regex':
+                return list(self._iter_tokens())
+            self._read_all()
+        if self.backend == 'regex':
+            return self._tokenize_regex()
+        return self._tokenize_scanner()
+
+    def _iter_chunks(self):
+        """Yield the source as a sequence of string chunks."""
+        source = self.source_code
+        if isinstance(source, str):
+            yield source
+        elif hasattr(source, 'read'):
+            read = source.read
+            chunk_size = self.CHUNK_SIZE
+            chunk = read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = read(chunk_size)
+        else:
+            yield from source
+
+    def _read_all(self):
+        """Replace a streamed source with the full source string."""
+        self.source_code = ''.join(self._iter_chunks())
+        self.position = 0
+        self.current_char = self.source_code[0] if self.source_code else None
+
+    def iter_tokens(self):
+        """Yield tokens one at a time without building the whole token list.
+
+        The source may be a string, a text file object (read in CHUNK_SIZE
+        pieces) or any iterable of string chunks. Only the unconsumed tail of
+        the current chunk is buffered. A token that reaches the end of the
+        buffer is held back until the next chunk arrives, so keywords,
+        strings and identifiers may cross chunk boundaries.
+
+        The scanner backend needs the whole source, so it reads it fully and
+        then yields from the token list. Layout tokens (layout=True) are
+        inserted on the fly.
+        """
+        if self.layout:
+            return self._layout(self._iter_tokens())
+        return self._iter_tokens()
+
+    def _layout(self, tokens):
+        """Insert NEWLINE, INDENT and DEDENT tokens into positioned tokens.
+
+        A logical line ends where the next token starts on a later line
+        outside parentheses; its NEWLINE is placed at the end of its last
+        token. The indentation of a line is the column of its first token
+        (every whitespace character counts as one column). A deeper line
+        opens a block with INDENT, and a shallower one closes blocks with one
+        DEDENT each; it must then line up with an enclosing block. Blank and
+        comment-only lines produce no tokens. Constant work per token.
+        """
+        indents = [0]
+        depth = 0  # Open parentheses: line breaks inside them are ignored
+        previous = None
+        end_line = 0  # Line on which the previous token ends
+        for token in tokens:
+            if token.line > end_line and depth == 0:
+                if previous is not None:
+                    yield self._newline(previous, end_line)
+                width = token.column - 1
+                if width > indents[-1]:
+                    indents.append(width)
+                    yield Token(INDENT, '', token.start, token.start, token.line, token.column)
+                elif width < indents[-1]:
+                    while width < indents[-1]:
+                        indents.pop()
+                        yield Token(DEDENT, '', token.start, token.start, token.line, token.column)
+                    if width != indents[-1]:
+                        raise LexerError("Unindent does not match any outer indentation level",
+                                         token.line, token.column)
+            kind = token.kind
+            if kind == LPAREN:
+                depth += 1
+            elif kind == RPAREN and depth:
+                depth -= 1
+            yield token
+            previous = token
+            end_line = token.line + token.value.count('\n') if kind == STRING else token.line
+
+        if previous is not None:
+            newline = self._newline(previous, end_line)
+            yield newline
+            for _ in indents[1:]:
+                yield Token(DEDENT, '', newline.end, newline.end, newline.line, newline.column)
+
+    def _newline(self, token, end_line):
+        """Return the NEWLINE token ending the line whose last token is token."""
+        if end_line == token.line:
+            column = token.column + (token.end - token.start)
+        else:
+            # A string spanning lines: the rest of its last line and the quote
+            column = len(token.value) - token.value.rindex('\n') + 1
+        return Token(NEWLINE, '', token.end, token.end, end_line, column)
+
+    def _iter_tokens(self):
+        """Yield the tokens of iter_tokens(), without layout tokens."""
+        if self.backend != 'regex':
+            if not isinstance(self.source_code, str):
+                self._read_all()
+            yield from self._tokenize_scanner()
+            return
+
+        positions = self.positions
+        cache = _TokenCache(self) if positions else _SharedTokenCache(self)
+        finditer = self._token_pattern.finditer
+        margin = self._STREAM_MARGIN
+        chunks = self._iter_chunks()
+        buffer = ''
+        base = 0  # Source offset of buffer[0]
+        line = 1
+        line_start = 0  # Source offset where the current line begins
+        at_eof = False
+
+        while not at_eof:
+            chunk = next(chunks, None)
+            if chunk is None:
+                at_eof = True
+            else:
+                buffer += chunk
+                if len(buffer) <= margin:
+                    continue
+
+            # Matches ending inside the margin (or bare quotes still waiting
+            # for their closing quote) are retried with more input
+            limit = len(buffer) if at_eof else len(buffer) - margin
+            resume = len(buffer)
+            for match in finditer(buffer):
+                skipped, text = match.groups()
+                if not at_eof and (match.end() > limit or text == '"' or text == "'"):
+                    resume = match.start()
+                    break
+                if '\n' in skipped:
+                    line += skipped.count('\n')
+                    line_start = base + match.start(1) + skipped.rindex('\n') + 1
+                if not text:
+                    continue
+                start = base + match.start(2)
+                if text == '"' or text == "'":
+                    raise LexerError("Unterminated string literal",
+                                     line, start - line_start + 1)
+                if positions:
+                    kind, value = cache[text]
+                    yield Token(kind, value, start, start + len(text),
+                                line, start - line_start + 1)
+                else:
+                    yield cache[text]
+                if '\n' in text:
+                    line += text.count('\n')
+                    line_start = start + text.rindex('\n') + 1
+            buffer = buffer[resume:]
+            base += resume
+
+    def _tokenize_regex(self):
+        """Tokenize with the compiled master pattern.
+
+        The pattern splits the source into (skipped, token text) pairs in a
+        single C-level pass. Texts are mapped to kinds and values through a
+        per-call cache, so a lexeme is only classified the first time it
+        appears, and offsets are recovered by summing the piece lengths.
+        """
+        source = self.source_code
+        cache = _TokenCache(self) if self.positions else _SharedTokenCache(self)
+        pieces = self._token_pattern.findall(source)
+        while pieces and not pieces[-1][1]:
+            pieces.pop()  # Empty matches at the end of the input
+        texts = list(map(itemgetter(1), pieces))
+        try:
+            entries = list(map(cache.__getitem__, texts))
+        except LexerError as error:
+            # Locate the first bare quote, which is what failed to classify
+            index = min(texts.index(quote) for quote in ('"', "'") if quote in texts)
+            offset = len(''.join(chain.from_iterable(pieces[:index]))) + len(pieces[index][0])
+            raise self._error(error.message, offset) from None
+        self.position = len(source)
+        self.current_char = None
+        if not self.positions:
+            return entries  # Already SharedTokens
+
+        # Running total of piece lengths: the end of each skipped run is a
+        # token start, and the end of each token text is its end offset
+        offsets = list(accumulate(map(len, chain.from_iterable(pieces))))
+        return self._make_tokens(entries, offsets[0::2], offsets[1::2])
+
+    def _make_tokens(self, entries, starts, ends):
+        """Build Token objects from (kind, value) entries and their spans."""
+        source = self.source_code
+        # line_bases[n] is one less than the offset where line n begins, so
+        # that a token's 1-based column is start - line_bases[line]
+        line_bases = [None, -1]
+        line_bases.extend(match.start() for match in re.finditer('\n', source))
+        lines = list(map(bisect_right, repeat(line_bases[1:]), starts))
+        columns = map(sub, starts, map(line_bases.__getitem__, lines))
+        return list(map(Token, map(itemgetter(0), entries), map(itemgetter(1), entries),
+                        starts, ends, lines, columns))
+
+    def _error(self, message, offset):
+        """Return a LexerError located at a source offset."""
+        source = self.source_code
+        line = source.count('\n', 0, offset) + 1
+        column = offset - source.rfind('\n', 0, offset)
+        return LexerError(message, line, column)
+
+    def _classify(self, text):
+        """Return the (kind, value) pair for a non-fixed token text."""
+        first = text[0]
+        if first == '"' or first == "'":
+            if len(text) == 1:
+                raise LexerError("Unterminated string literal")
+            return (STRING, text[1:-1])
+        elif first.isdigit():
+            return (NUMBER, text)
+        elif len(text) > 1 or self._identifier_start(first):
+            # Programs reuse a small set of names; share one string per name
+            return (IDENTIFIER, sys.intern(text))
+        return (UNKNOWN, text)
+
+    def _tokenize_scanner(self):
+        """Tokenize one character at a time (the original backend)."""
         tokens = []
+        starts = []
+        ends = []
         while self.current_char is not None:
             if self.current_char.isspace():
                 self.skip_whitespace()
@@ -137,11 +553,15 @@ class Lexer:
                 self.skip_comment()
                 continue
             
-            # Check for multi-word keywords first (highest priority)
-            multi_word_result = self._check_multi_word_keywords()
-            if multi_word_result:
-                token_type, keyword = multi_word_result
-                tokens.append((token_type, keyword))
+            start = self.position
+            
+            # Check for keywords first (highest priority), including
+            # multi-word Amharic keywords such as "እስከሆነ ድረስ"
+            keyword_result = self._match_keyword()
+            if keyword_result:
+                tokens.append(keyword_result)
+                starts.append(start)
+                ends.append(self.position)
                 continue
             
             # Check for operators before identifiers
@@ -217,18 +637,31 @@ class Lexer:
             else:
                 tokens.append(('UNKNOWN', self.current_char))
                 self.advance()
-        return tokens
+            
+            starts.append(start)
+            ends.append(self.position)
+        
+        entries = [(TOKEN_KINDS[token_type], value) for token_type, value in tokens]
+        if not self.positions:
+            shared = {(token.kind, token.value): token
+                      for token in self._shared_tokens.values()}
+            for entry in entries:
+                if entry not in shared:
+                    shared[entry] = SharedToken(*entry)
+            return list(map(shared.__getitem__, entries))
+        return self._make_tokens(entries, starts, ends)
 
     def _identifier(self):
-        result = ''
+        start = self.position
         while self.current_char is not None and self._is_identifier_char(self.current_char):
-            result += self.current_char
             self.advance()
+        # One slice instead of a new string per character
+        result = self.source_code[start:self.position]
         
         # Check if this identifier is a keyword
         if result in self.keywords:
             return (self.keywords[result], result)
-        return ('IDENTIFIER', result)
+        return ('IDENTIFIER', sys.intern(result))
 
     def _number(self):
         result = ''
@@ -245,6 +678,7 @@ class Lexer:
     def _string(self):
         """Handle string literals with both single and double quotes"""
         quote_char = self.current_char
+        start = self.position
         result = ''
         self.advance()  # Skip opening quote
         
@@ -255,6 +689,6 @@ class Lexer:
         if self.current_char == quote_char:
             self.advance()  # Skip closing quote
         else:
-            raise Exception("Unterminated string literal")
+            raise self._error("Unterminated string literal", start)
             
         return ('STRING', result)
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Lexer over a memory-mapped UTF-8 source file.
+
+MappedLexer scans the raw bytes of the file through a bytes version of the
+master pattern, so the source is never decoded or copied as a whole. ASCII
+operators, whitespace, comments, numbers and names are matched byte-wise;
+only token texts that contain non-ASCII bytes (Ethiopic names and
+keywords, string contents) are decoded. It produces exactly the tokens,
+character offsets and line/column positions of Lexer on the decoded text.
+"""
+
+import mmap
+import re
+
+from src.lexer.lexer import Lexer
+from src.lexer.tokens import Token, SharedToken, LexerError
+
+# ASCII characters that str.isspace() (and so the str pattern's \s) accepts
+_ASCII_SPACE = rb'\t\n\x0b\x0c\r\x1c-\x20'
+
+# Bytes that belong to a name/number run: ASCII word characters and any
+# non-ASCII byte. Runs with non-ASCII bytes are decoded and re-split with
+# the str pattern, which knows which Unicode characters are word characters.
+_WORD_BYTES = rb'0-9A-Za-z_\x80-\xff'
+
+
+class _RunCache(dict):
+    """Maps the bytes of a token or name run to the tokens it splits into.
+
+    Each value is a tuple of (skipped characters, token characters,
+    SharedToken) triples. A run usually holds a single token; pure ASCII
+    runs that start with a digit ("12abc") and runs containing non-ASCII
+    characters may hold several, exactly as the str pattern splits them.
+    """
+
+    def __init__(self, lexer):
+        super().__init__(
+            (text.encode('utf-8'), ((0, len(text), token),))
+            for text, token in lexer._shared_tokens.items()
+        )
+        self.lexer = lexer
+
+    def __missing__(self, data):
+        lexer = self.lexer
+        if data.isascii():
+            text = data.decode('ascii')
+            if not (text[0].isdigit() and not text.isdigit()):
+                pieces = ((0, len(text), lexer._shared_token(text)),)
+                self[data] = pieces
+                return pieces
+        else:
+            text = data.decode('utf-8')
+        pieces = []
+        for skipped, token_text in lexer._token_pattern.findall(text):
+            if token_text:
+                pieces.append((len(skipped), len(token_text), lexer._shared_token(token_text)))
+            elif skipped:
+                # Trailing non-ASCII whitespace; skip it without a token
+                pieces.append((len(skipped), 0, None))
+        pieces = self[data] = tuple(pieces)
+        return pieces
+
+
+class MappedLexer(Lexer):
+    """Tokenize a UTF-8 file through a read-only memory map.
+
+    Tokens are the same as Lexer(open(path).read()).tokenize() would
+    produce, including character offsets and line/column positions, but
+    the file is only ever held in memory as mapped pages. Use as a context
+    manager (or call close()) to release the map.
+    """
+
+    _byte_pattern = re.compile(
+        rb'((?:[' + _ASCII_SPACE + rb']+|\#[^\n]*\n?)*)'
+        rb'(==|!=|<=|>=|[!<>+\-*/=():,;%]'
+        rb'|"[^"]*"|\'[^\']*\'|["\']'
+        rb'|(?:' + b'|'.join(re.escape(keyword.encode('utf-8'))
+                             for keyword in Lexer._spaced_keywords) +
+        rb')(?![0-9A-Za-z_])'
+        rb'|[' + _WORD_BYTES + rb']+'
+        rb'|[\x00-\x7f]'
+        rb'|\Z)'
+    )
+
+    # What may follow a non-ASCII run and still belong to the same str
+    # tokens: the rest of a spaced keyword (" ድረስ") and further name bytes
+    _tail_pattern = re.compile(
+        rb'(?:' + b'|'.join(re.escape(keyword[keyword.index(' '):].encode('utf-8'))
+                            for keyword in Lexer._spaced_keywords) +
+        rb')?[' + _WORD_BYTES + rb']*'
+    )
+
+    def __init__(self, path, positions=True, layout=False):
+        super().__init__('', positions=positions, layout=layout)
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self.data = b''  # Empty files cannot be mapped
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tokenize(self):
+        """Return the list of tokens in the mapped file."""
+        return list(self.iter_tokens())
+
+    def _shared_token(self, text):
+        """Return the SharedToken for a token text (str)."""
+        token = self._shared_tokens.get(text)
+        if token is None:
+            token = SharedToken(*self._classify(text))
+        return token
+
+    def _iter_tokens(self):
+        """Yield the tokens of the mapped file one at a time."""
+        data = self.data
+        positions = self.positions
+        cache = _RunCache(self)
+        tail_match = self._tail_pattern.match
+        offset = 0  # Character offset of the end of the last match
+        line = 1
+        line_start = 0  # Character offset where the current line begins
+        resume = 0
+        matches = match = None
+
+        try:
+            while resume is not None:
+                matches = self._byte_pattern.finditer(data, resume)
+                resume = None
+                for match in matches:
+                    skipped, text = match.groups()
+                    if skipped:
+                        if skipped.isascii():
+                            offset += len(skipped)
+                            if b'\n' in skipped:
+                                line += skipped.count(b'\n')
+                                line_start = offset - (len(skipped) - skipped.rindex(b'\n') - 1)
+                        else:
+                            # Only comments can hold non-ASCII text here
+                            skipped = self._decode(skipped, line)
+                            offset += len(skipped)
+                            if '\n' in skipped:
+                                line += skipped.count('\n')
+                                line_start = offset - (len(skipped) - skipped.rindex('\n') - 1)
+                    if not text:
+                        continue
+
+                    if not text.isascii() and text[0] not in b'"\'':
+                        # A spaced keyword is the only token that spans a
+                        # space. When one may start inside this run, or a
+                        # keyword runs into a non-ASCII character, the run is
+                        # extended to the next clean boundary and split as a
+                        # whole.
+                        end = match.end()
+                        tail = tail_match(data, end).end()
+                        while tail > end:
+                            end = tail
+                            tail = tail_match(data, end).end()
+                        if end > match.end():
+                            text = data[match.start(2):end]
+                            resume = end
+
+                    try:
+                        pieces = cache[text]
+                    except LexerError as error:
+                        raise LexerError(error.message, line, offset - line_start + 1) from None
+                    except UnicodeDecodeError:
+                        raise LexerError("Invalid UTF-8 in source", line,
+                                         offset - line_start + 1) from None
+
+                    for skipped_length, length, token in pieces:
+                        offset += skipped_length
+                        if token is None:
+                            continue
+                        if positions:
+                            yield Token(token.kind, token.value, offset, offset + length,
+                                        line, offset - line_start + 1)
+                        else:
+                            yield token
+                        offset += length
+                        if b'\n' in text:
+                            # Only string literals span lines
+                            line += token.value.count('\n')
+                            line_start = offset - (len(token.value) + 1 - token.value.rindex('\n') - 1)
+
+                    if resume is not None:
+                        break
+        finally:
+            # Match objects pin the map; drop them so close() can unmap it
+            # even while a traceback still references this frame
+            matches = match = None
+
+    def _decode(self, data, line):
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            raise LexerError("Invalid UTF-8 in source", line) from None
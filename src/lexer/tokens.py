@@ -0,0 +1,176 @@
+"""
+Token representation shared by the lexer and the parser.
+
+Every token type has a small integer kind so the parser can compare kinds
+instead of type-name strings. The original string names are still
+available through TOKEN_NAMES and Token.type.
+"""
+
+# Token kinds, in the order of TOKEN_NAMES
+EOF = 0
+IDENTIFIER = 1
+NUMBER = 2
+STRING = 3
+UNKNOWN = 4
+NEWLINE = 5
+
+# Operators and punctuation
+EQUALS = 6
+NOT_EQUALS = 7
+LESS_EQUALS = 8
+GREATER_EQUALS = 9
+FACTORIAL = 10
+LESS = 11
+GREATER = 12
+PLUS = 13
+MINUS = 14
+MULTIPLY = 15
+DIVIDE = 16
+MODULO = 17
+ASSIGN = 18
+LPAREN = 19
+RPAREN = 20
+COLON = 21
+COMMA = 22
+SEMICOLON = 23
+
+# Keywords
+IF = 24
+ELSE = 25
+WHILE = 26
+FOR = 27
+BREAK = 28
+CONTINUE = 29
+DEF = 30
+RETURN = 31
+AND = 32
+OR = 33
+NOT = 34
+ASSIGN_KW = 35
+PRINT = 36
+SPIT = 37
+INPUT = 38
+TRUE_LITERAL = 39
+FALSE_LITERAL = 40
+IN = 41
+
+# Layout tokens, only emitted by Lexer(..., layout=True)
+INDENT = 42
+DEDENT = 43
+
+TOKEN_NAMES = (
+    'EOF', 'IDENTIFIER', 'NUMBER', 'STRING', 'UNKNOWN', 'NEWLINE',
+    'EQUALS', 'NOT_EQUALS', 'LESS_EQUALS', 'GREATER_EQUALS', 'FACTORIAL',
+    'LESS', 'GREATER', 'PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE', 'MODULO',
+    'ASSIGN', 'LPAREN', 'RPAREN', 'COLON', 'COMMA', 'SEMICOLON',
+    'IF', 'ELSE', 'WHILE', 'FOR', 'BREAK', 'CONTINUE', 'DEF', 'RETURN',
+    'AND', 'OR', 'NOT', 'ASSIGN_KW', 'PRINT', 'SPIT', 'INPUT',
+    'TRUE_LITERAL', 'FALSE_LITERAL', 'IN', 'INDENT', 'DEDENT',
+)
+
+# Token type name -> integer kind
+TOKEN_KINDS = {name: kind for kind, name in enumerate(TOKEN_NAMES)}
+
+
+class Token:
+    """A token with an integer kind, its text value and its source span.
+
+    start/end are offsets into the source (end is exclusive); line and
+    column are 1-based and describe the start of the token.
+
+    For compatibility with the original ``(TYPE, value)`` tuples a token
+    can be indexed, unpacked and compared with such a tuple.
+    """
+
+    __slots__ = ('kind', 'value', 'start', 'end', 'line', 'column')
+
+    def __init__(self, kind, value, start=None, end=None, line=None, column=None):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
+        self.line = line
+        self.column = column
+
+    @classmethod
+    def from_pair(cls, pair):
+        """Build a position-less token from a ``(TYPE, value)`` tuple."""
+        if isinstance(pair, Token):
+            return pair
+        token_type, value = pair
+        return cls(TOKEN_KINDS[token_type], value)
+
+    @property
+    def type(self):
+        return TOKEN_NAMES[self.kind]
+
+    def location(self):
+        """Return a human readable 'line L, column C' description."""
+        if self.line is None:
+            return 'unknown location'
+        return f"line {self.line}, column {self.column}"
+
+    def __getitem__(self, index):
+        return (TOKEN_NAMES[self.kind], self.value)[index]
+
+    def __iter__(self):
+        yield TOKEN_NAMES[self.kind]
+        yield self.value
+
+    def __len__(self):
+        return 2
+
+    def __eq__(self, other):
+        if isinstance(other, Token):
+            return self.kind == other.kind and self.value == other.value
+        if isinstance(other, tuple):
+            return (TOKEN_NAMES[self.kind], self.value) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((TOKEN_NAMES[self.kind], self.value))
+
+    def __repr__(self):
+        if self.line is None:
+            return f"Token({TOKEN_NAMES[self.kind]}, {self.value!r})"
+        return f"Token({TOKEN_NAMES[self.kind]}, {self.value!r}, {self.line}:{self.column})"
+
+
+class SharedToken(Token):
+    """An immutable, position-less token shared by every occurrence.
+
+    Lexers created with ``positions=False`` hand out one SharedToken per
+    distinct (kind, value), so a program that uses ``=`` ten thousand times
+    holds a single ``=`` token object.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, kind, value):
+        set_attribute = object.__setattr__
+        set_attribute(self, 'kind', kind)
+        set_attribute(self, 'value', value)
+        for name in ('start', 'end', 'line', 'column'):
+            set_attribute(self, name, None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SharedToken is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("SharedToken is immutable")
+
+
+class SourceError(Exception):
+    """An error tied to a position in the source code."""
+
+    def __init__(self, message, line=None, column=None):
+        self.message = message
+        self.line = line
+        self.column = column
+        if line is not None:
+            message = f"{message} (line {line}, column {column})"
+        super().__init__(message)
+
+
+class LexerError(SourceError):
+    """Raised when the source cannot be tokenized."""
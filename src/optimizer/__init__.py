@@ -0,0 +1,397 @@
+"""
+Optimizer module: AST-to-AST passes run between the parser and the
+interpreter or transpiler.
+
+Constant folding replaces literals and operations on constants with
+Constant nodes that hold the computed Python value, so the backends
+neither convert number texts nor recompute constant subexpressions (for
+example inside a loop body). Folding uses the interpreter's own operator
+functions, and an operation that would fail (1 / 0, "a" - 1) is left in
+place to fail at run time as before, with its location.
+
+Dead-code elimination then removes code that can never run: statements
+after a return inside a block, the branch of an if whose condition is a
+constant, while loops whose condition is constantly false, and top-level
+functions that are never called. Every removal is recorded in
+Optimizer.removed, and report() lists them.
+"""
+
+import math
+
+from src.interpreter import BINARY_OPERATORS, COMPARISON_OPERATORS
+from src.parser.nodes import (
+    NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION,
+    IF_STATEMENT, WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT,
+    ERROR, BOOLEAN, CONSTANT, TRUE_WORDS,
+    Assignment, BinaryOperation, Comparison, LogicalOperation, UnaryOperation,
+    Factorial, FunctionCall, SpitFunction, IfStatement, WhileStatement, Block,
+    FunctionDefinition, ReturnStatement, Constant, Node,
+)
+
+
+class Optimizer:
+    """Return optimized copies of ASTs; the input tree is not modified.
+
+    >>> Optimizer().optimize(Parser(Lexer("x = 2 * 3 + 1").tokenize()).parse())
+    [{'type': 'Assignment', 'identifier': 'x', 'value': {'type': 'Constant', 'value': 7}}]
+
+    folded counts the operations replaced by their value, and simplified
+    the identities (x * 1, x + 0, ...) applied. removed holds a
+    (node, message) pair for every piece of dead code removed; pass
+    remove_dead_code=False to only fold constants.
+    """
+
+    # Factorials of larger constants are left to run time, where they are
+    # only computed if the code is actually reached
+    MAX_FOLDED_FACTORIAL = 1000
+
+    # Folded strings (from "..." * n) may be at most this long
+    MAX_FOLDED_LENGTH = 4096
+
+    def __init__(self, remove_dead_code=True):
+        self.remove_dead_code = remove_dead_code
+        self.folded = 0
+        self.simplified = 0
+        self.removed = []
+
+    def optimize(self, ast):
+        """Optimize a parsed program (a list of statements) or a single node.
+
+        For a whole program, top-level functions that are never called are
+        removed as well.
+        """
+        if isinstance(ast, list):
+            program = self._statements(ast, top_level=True)
+            if self.remove_dead_code:
+                program = self._remove_unused_functions(program)
+            return program
+        return self._optimize(ast)
+
+    def report(self):
+        """Describe the removed code, one 'line:column: message' per removal."""
+        return [f"{node.line}:{node.column}: {message}" for node, message in self.removed]
+
+    def _optimize(self, node):
+        return self._OPTIMIZERS[node.kind](self, node)
+
+    def _literal(self, node):
+        """Pre-convert a number, string or boolean literal."""
+        if node.kind == NUMBER:
+            value = int(node.value)
+        elif node.kind == BOOLEAN:
+            value = node.value in TRUE_WORDS
+        else:
+            value = node.value
+        return Constant(node, value)
+
+    def _unchanged(self, node):
+        return node
+
+    def _fold(self, node, function, *operands):
+        """Return Constant(function(operands)), or None if it must not be folded."""
+        try:
+            value = function(*operands)
+        except Exception:
+            return None  # Left to fail at run time
+        if isinstance(value, float) and not math.isfinite(value):
+            return None  # inf and nan have no literal form
+        if isinstance(value, str) and len(value) > self.MAX_FOLDED_LENGTH:
+            return None
+        self.folded += 1
+        return Constant(node, value)
+
+    def _optimize_assignment(self, node):
+        return Assignment(node, node.identifier, self._optimize(node.value))
+
+    def _optimize_binary_operation(self, node):
+        left = self._optimize(node.left)
+        right = self._optimize(node.right)
+        operator = node.operator
+        if left.kind == CONSTANT and right.kind == CONSTANT:
+            function = BINARY_OPERATORS.get(operator)
+            if function is not None and not self._too_long(operator, left.value, right.value):
+                folded = self._fold(node, function, left.value, right.value)
+                if folded is not None:
+                    return folded
+        simplified = self._simplify(operator, left, right)
+        if simplified is not None:
+            self.simplified += 1
+            return simplified
+        return BinaryOperation(node, operator, left, right)
+
+    def _too_long(self, operator, left, right):
+        """Whether "..." * n would build an overly long string."""
+        if operator != '*':
+            return False
+        if isinstance(left, int) and isinstance(right, str):
+            left, right = right, left
+        return (isinstance(left, str) and isinstance(right, int) and
+                len(left) * right > self.MAX_FOLDED_LENGTH)
+
+    def _simplify(self, operator, left, right):
+        """Apply an identity, returning the remaining operand or None.
+
+        Identities only hold for numbers: "a" + 0 is an error and True * 1
+        is 1, so the other operand must be known to be a number, and for
+        x + 0 an integer (-0.0 + 0 is 0.0).
+        """
+        if operator == '*':
+            if _is_constant(right, 1) and _is_number(left):
+                return left
+            if _is_constant(left, 1) and _is_number(right):
+                return right
+        elif operator == '+':
+            if _is_constant(right, 0) and _is_integer(left):
+                return left
+            if _is_constant(left, 0) and _is_integer(right):
+                return right
+        elif operator == '-':
+            if _is_constant(right, 0) and _is_number(left):
+                return left
+        return None
+
+    def _optimize_comparison(self, node):
+        left = self._optimize(node.left)
+        right = self._optimize(node.right)
+        if left.kind == CONSTANT and right.kind == CONSTANT:
+            function = COMPARISON_OPERATORS.get(node.operator)
+            if function is not None:
+                folded = self._fold(node, function, left.value, right.value)
+                if folded is not None:
+                    return folded
+        return Comparison(node, node.operator, left, right)
+
+    def _optimize_logical_operation(self, node):
+        left = self._optimize(node.left)
+        right = self._optimize(node.right)
+        operator = node.operator
+        if left.kind == CONSTANT and operator in ('and', 'እና', 'or', 'ወይም'):
+            # left and right is left if left is false, else right (and the
+            # other way round for or); the right side is never evaluated
+            # when left decides
+            self.folded += 1
+            if bool(left.value) == (operator in ('and', 'እና')):
+                return right
+            return left
+        return LogicalOperation(node, operator, left, right)
+
+    def _optimize_unary_operation(self, node):
+        operand = self._optimize(node.operand)
+        if operand.kind == CONSTANT:
+            if node.operator == '-':
+                folded = self._fold(node, lambda value: -value, operand.value)
+                if folded is not None:
+                    return folded
+            elif node.operator in ('not', 'ተቃራኒ'):
+                self.folded += 1
+                return Constant(node, not operand.value)
+        return UnaryOperation(node, node.operator, operand)
+
+    def _optimize_factorial(self, node):
+        value = self._optimize(node.value)
+        if (value.kind == CONSTANT and isinstance(value.value, int) and
+                0 <= value.value <= self.MAX_FOLDED_FACTORIAL):
+            self.folded += 1
+            return Constant(node, math.factorial(value.value))
+        return Factorial(node, value)
+
+    def _optimize_function_call(self, node):
+        return FunctionCall(node, node.name, [self._optimize(argument) for argument in node.arguments])
+
+    def _optimize_spit_function(self, node):
+        return SpitFunction(node, [self._optimize(argument) for argument in node.arguments])
+
+    def _optimize_if_statement(self, node):
+        false_branch = node.false_branch
+        return IfStatement(node, self._optimize(node.condition), self._optimize(node.true_branch),
+                           self._optimize(false_branch) if false_branch else false_branch)
+
+    def _optimize_while_statement(self, node):
+        return WhileStatement(node, self._optimize(node.condition), self._optimize(node.body))
+
+    def _optimize_block(self, node):
+        return Block(node, self._statements(node.statements))
+
+    def _statements(self, statements, top_level=False):
+        """Optimize a statement list, removing the statements that never run.
+
+        An if with a constant condition is replaced by the statements of
+        the branch taken; variables are global to a program, so this does
+        not change their scope. A return ends a block, but not the program:
+        top-level statements after a return still run, so a top-level branch
+        that returns is kept in an if.
+        """
+        result = []
+        for index, statement in enumerate(statements):
+            node = self._optimize(statement)
+            if not self.remove_dead_code:
+                result.append(node)
+                continue
+            if node.kind == IF_STATEMENT and node.condition.kind == CONSTANT:
+                if node.condition.value:
+                    branch = node.true_branch
+                    if node.false_branch:
+                        self._remove(node.false_branch, "else branch never taken, the condition is always true")
+                else:
+                    branch = node.false_branch
+                    self._remove(node.true_branch, "if branch never taken, the condition is always false")
+                if branch is None:
+                    pass
+                elif top_level and _contains_return(branch):
+                    # The return must still end the branch, so keep it as an if
+                    result.append(IfStatement(node, Constant(node.condition, True), branch, None))
+                else:
+                    result.extend(branch.statements)
+            elif node.kind == WHILE_STATEMENT and node.condition.kind == CONSTANT and not node.condition.value:
+                self._remove(node, "while loop never runs, the condition is always false")
+            else:
+                result.append(node)
+            if not top_level and result and _always_returns(result[-1]):
+                rest = statements[index + 1:]
+                if rest:
+                    self._remove(rest[0], f"{len(rest)} unreachable statement(s) after return")
+                break
+        return result
+
+    def _remove(self, node, message):
+        # A block is located at its first statement when it has one
+        if node.kind == BLOCK and node.statements:
+            node = node.statements[0]
+        self.removed.append((node, message))
+
+    def _remove_unused_functions(self, program):
+        """Drop the top-level function definitions that no reachable code calls."""
+        definitions = {}
+        called = set()
+        for node in program:
+            if node.kind == FUNCTION_DEFINITION:
+                definitions.setdefault(node.name, []).append(node)
+            else:
+                called.update(_called_names(node))
+        # Functions called from used functions are used too
+        pending = list(called)
+        while pending:
+            for definition in definitions.get(pending.pop(), ()):
+                for name in _called_names(definition.body):
+                    if name not in called:
+                        called.add(name)
+                        pending.append(name)
+        result = []
+        for node in program:
+            if node.kind == FUNCTION_DEFINITION and node.name not in called:
+                self._remove(node, f"function '{node.name}' is never called")
+            else:
+                result.append(node)
+        return result
+
+    def _optimize_function_definition(self, node):
+        return FunctionDefinition(node, node.name, node.parameters, self._optimize(node.body))
+
+    def _optimize_return_statement(self, node):
+        return ReturnStatement(node, self._optimize(node.value))
+
+    # Node kind -> optimization method
+    _OPTIMIZERS = {
+        NUMBER: _literal,
+        STRING: _literal,
+        BOOLEAN: _literal,
+        IDENTIFIER: _unchanged,
+        CONSTANT: _unchanged,
+        ERROR: _unchanged,
+        ASSIGNMENT: _optimize_assignment,
+        BINARY_OPERATION: _optimize_binary_operation,
+        COMPARISON: _optimize_comparison,
+        LOGICAL_OPERATION: _optimize_logical_operation,
+        UNARY_OPERATION: _optimize_unary_operation,
+        FACTORIAL: _optimize_factorial,
+        FUNCTION_CALL: _optimize_function_call,
+        SPIT_FUNCTION: _optimize_spit_function,
+        IF_STATEMENT: _optimize_if_statement,
+        WHILE_STATEMENT: _optimize_while_statement,
+        BLOCK: _optimize_block,
+        FUNCTION_DEFINITION: _optimize_function_definition,
+        RETURN_STATEMENT: _optimize_return_statement,
+    }
+
+
+def _is_constant(node, value):
+    """Whether node is the integer constant value (not a bool or float)."""
+    return node.kind == CONSTANT and type(node.value) is int and node.value == value
+
+
+def _is_integer(node):
+    """Whether node always evaluates to an int (or fails on its own)."""
+    kind = node.kind
+    if kind == CONSTANT:
+        return type(node.value) is int
+    if kind == FACTORIAL:
+        return True
+    if kind == UNARY_OPERATION:
+        return node.operator == '-' and _is_integer(node.operand)
+    if kind == BINARY_OPERATION:
+        return node.operator in ('+', '-', '*', '%') and _is_integer(node.left) and _is_integer(node.right)
+    return False
+
+
+def _is_number(node):
+    """Whether node always evaluates to an int or float (or fails on its own)."""
+    kind = node.kind
+    if kind == CONSTANT:
+        return type(node.value) in (int, float)
+    if kind == UNARY_OPERATION:
+        return node.operator == '-'  # Only defined for numbers (bools become ints)
+    if kind == BINARY_OPERATION:
+        if node.operator in ('-', '/'):
+            return True
+        return node.operator in ('+', '*', '%') and _is_number(node.left) and _is_number(node.right)
+    return _is_integer(node)
+
+
+def _always_returns(node):
+    """Whether executing node always ends in a return statement."""
+    kind = node.kind
+    if kind == RETURN_STATEMENT:
+        return True
+    if kind == BLOCK:
+        return any(_always_returns(statement) for statement in node.statements)
+    if kind == IF_STATEMENT:
+        return (node.false_branch is not None and _always_returns(node.true_branch) and
+                _always_returns(node.false_branch))
+    return False
+
+
+def _contains_return(node):
+    """Whether node contains a return statement outside of function definitions."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node.kind
+        if kind == RETURN_STATEMENT:
+            return True
+        if kind == BLOCK:
+            stack.extend(node.statements)
+        elif kind == IF_STATEMENT:
+            stack.append(node.true_branch)
+            if node.false_branch:
+                stack.append(node.false_branch)
+        elif kind == WHILE_STATEMENT:
+            stack.append(node.body)
+    return False
+
+
+def _called_names(node):
+    """Names of all functions called anywhere in node."""
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.kind == FUNCTION_CALL:
+            names.add(node.name)
+        for name in node.fields:
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, Node))
+    return names
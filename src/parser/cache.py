@@ -0,0 +1,192 @@
+"""
+On-disk cache of parsed programs, in the spirit of __pycache__.
+
+parse_file() stores the AST of every source file it parses as a compact
+binary FlatAST in a __amhpycache__ directory next to the file. The cache
+file records the language version, the parse mode and a hash of the
+source bytes. While all three match, later calls load the AST from it
+with a single read (or a memory map) and skip lexing and parsing. Any
+change to the source makes the hash differ, so stale entries are simply
+parsed again and overwritten.
+
+Cache file layout, native byte order:
+
+    header          HEADER: magic, language version, flags, source digest,
+                    and the node, extra, root and string counts
+    int32 columns   lines, columns, a, b, c (one item per node), extra,
+                    roots, string lengths (in characters)
+    kinds           one byte per node
+    strings         the string table as one UTF-8 blob
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+
+from src.lexer.lexer import Lexer
+from src.lexer.mapped import MappedLexer
+from src.parser.parser import Parser
+from src.parser.flat import FlatAST
+
+# Bump whenever the grammar, the node classes or the flat layout change,
+# so that caches written by older versions are parsed again
+LANGUAGE_VERSION = 2
+
+CACHE_DIRECTORY = '__amhpycache__'
+
+MAGIC = b'AMHC'
+HEADER = struct.Struct('=4sII16s5I')
+
+# Header flags
+_LAYOUT = 1
+_BIG_ENDIAN = 2
+
+_FLAG_BYTEORDER = _BIG_ENDIAN if sys.byteorder == 'big' else 0
+
+
+def source_digest(data):
+    """Hash of the source bytes that keys the cache."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def cache_path(path, layout=True):
+    """Path of the cache file for the source file at path."""
+    directory, name = os.path.split(path)
+    mode = '' if layout else '-semicolons'
+    return os.path.join(directory, CACHE_DIRECTORY,
+                        f"{name}.amhpy{LANGUAGE_VERSION}{mode}.ast")
+
+
+def dump(flat, digest, layout=True):
+    """Serialize a FlatAST to bytes."""
+    strings = flat.strings
+    flags = (_LAYOUT if layout else 0) | _FLAG_BYTEORDER
+    lengths = array('i', [len(text) for text in strings])
+    parts = [HEADER.pack(MAGIC, LANGUAGE_VERSION, flags, digest, len(flat.kinds),
+                         len(flat.extra), len(flat.roots), len(strings),
+                         sum(lengths))]
+    for column in (flat.lines, flat.columns, *flat.slots, flat.extra, flat.roots, lengths):
+        parts.append(array('i', column).tobytes())
+    parts.append(bytes(flat.kinds))
+    parts.append(''.join(strings).encode('utf-8'))
+    return b''.join(parts)
+
+
+def load(buffer, digest, layout=True):
+    """Decode a serialized FlatAST, or return None if it does not match.
+
+    The int and kind columns are memoryviews into buffer, so no column is
+    copied. Returns None if the buffer was written for other source bytes,
+    another parse mode or language version, or is truncated.
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        return None
+    (magic, version, flags, stored_digest, nodes, extra, roots, strings,
+     characters) = HEADER.unpack_from(view)
+    if (magic != MAGIC or version != LANGUAGE_VERSION or stored_digest != digest or
+            flags != (_LAYOUT if layout else 0) | _FLAG_BYTEORDER):
+        return None
+    columns = []
+    offset = HEADER.size
+    for count in (nodes, nodes, nodes, nodes, nodes, extra, roots, strings):
+        end = offset + count * 4
+        columns.append(view[offset:end].cast('i'))
+        offset = end
+    kinds = view[offset:offset + nodes]
+    offset += nodes
+    if len(kinds) != nodes:
+        return None
+    try:
+        blob = bytes(view[offset:]).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    if len(blob) != characters:
+        return None
+    lines, node_columns, a, b, c, extra_column, root_column, lengths = columns
+    table = []
+    start = 0
+    for length in lengths:
+        table.append(blob[start:start + length])
+        start += length
+    return FlatAST(kinds, lines, node_columns, a, b, c, extra_column, table, root_column)
+
+
+def read_cache(path, digest, layout=True, mapped=False):
+    """Load the cached FlatAST of the source file at path, if it is fresh.
+
+    With mapped=True the cache file is memory-mapped instead of read. The
+    map stays open as long as the returned FlatAST uses it.
+    """
+    try:
+        with open(cache_path(path, layout), 'rb') as f:
+            if mapped:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+    except (OSError, ValueError):
+        return None  # No cache yet (or an empty file, which mmap rejects)
+    return load(buffer, digest, layout)
+
+
+def write_cache(path, digest, flat, layout=True):
+    """Store the FlatAST of the source file at path; returns True on success.
+
+    The file is written under a temporary name and renamed into place, so
+    a concurrent reader never sees a partial file. Failures (for example
+    a read-only directory) only mean the next run parses again.
+    """
+    target = cache_path(path, layout)
+    temporary = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(temporary, 'wb') as f:
+            f.write(dump(flat, digest, layout))
+        os.replace(temporary, target)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def parse_file(path, layout=True, mapped=False, use_cache=True):
+    """Return the AST of the source file at path.
+
+    The AST is loaded from the cache when the cache was written for the
+    same source bytes, parse mode and language version; otherwise the file
+    is lexed and parsed (with MappedLexer if mapped) and the cache is
+    updated. Raises FileNotFoundError, LexerError and ParseError as
+    reading, lexing and parsing the file would.
+    """
+    with open(path, 'rb') as f:
+        if mapped:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                data = b''  # An empty file cannot be mapped
+        else:
+            data = f.read()
+    try:
+        digest = source_digest(data)
+        if use_cache:
+            flat = read_cache(path, digest, layout, mapped)
+            if flat is not None:
+                return flat.to_ast()
+        if mapped:
+            with MappedLexer(path, layout=layout) as lexer:
+                tokens = lexer.tokenize()
+        else:
+            tokens = Lexer(data.decode('utf-8'), layout=layout).tokenize()
+        ast = Parser(tokens, layout=layout).parse()
+    finally:
+        if mapped and isinstance(data, mmap.mmap):
+            data.close()
+    if use_cache:
+        write_cache(path, digest, FlatAST.from_ast(ast), layout)
+    return ast
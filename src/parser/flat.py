@@ -0,0 +1,283 @@
+"""
+Flat, array-backed encoding of the AST.
+
+A FlatAST stores a whole program in a few typed columns instead of one
+Python object per node, for machine-generated programs with millions of
+nodes. Node i is described by:
+
+    kinds[i]                node kind (see src/parser/nodes.py)
+    lines[i], columns[i]    source location, 0 when unknown
+    a[i], b[i], c[i]        operand slots, laid out per kind by LAYOUT
+
+A slot holds an index into strings (names, operators, literal texts), the
+index of a child node, or the offset of a list in extra. A list is stored
+in extra as its length followed by its items. Slots that are not set hold
+-1. The columns can be arrays or memoryviews of the same type, so a
+FlatAST can also be backed by a buffer.
+
+Walking: iterate over a FlatAST to get a FlatNode view of each top-level
+statement. Views read like the node classes (node.kind, node.left,
+node['type'], to_dict()), so the interpreter and the transpiler run on a
+FlatAST unchanged. walk() and children() work on bare node indices
+without creating views.
+"""
+
+from array import array
+
+from src.parser.nodes import (
+    Node, NODE_TYPES, NODE_KINDS, NODE_CLASSES, NUMBER, STRING, IDENTIFIER, ASSIGNMENT,
+    BINARY_OPERATION, COMPARISON, LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL,
+    FUNCTION_CALL, SPIT_FUNCTION, IF_STATEMENT, WHILE_STATEMENT, BLOCK,
+    FUNCTION_DEFINITION, RETURN_STATEMENT, ERROR, BOOLEAN,
+)
+
+# Slot names and what a slot holds
+A, B, C = 0, 1, 2
+TEXT = 0  # Index into strings
+CHILD = 1  # Node index, or -1 for None
+CHILDREN = 2  # Offset of a list of node indices in extra
+TEXTS = 3  # Offset of a list of string indices in extra
+
+# Node kind -> ((field, slot, content), ...), in the field order of the
+# node classes. Constant nodes only exist in optimized trees and have no
+# flat encoding.
+LAYOUT = {
+    NUMBER: (('value', A, TEXT),),
+    STRING: (('value', A, TEXT),),
+    IDENTIFIER: (('value', A, TEXT),),
+    ASSIGNMENT: (('identifier', A, TEXT), ('value', B, CHILD)),
+    BINARY_OPERATION: (('operator', A, TEXT), ('left', B, CHILD), ('right', C, CHILD)),
+    COMPARISON: (('operator', A, TEXT), ('left', B, CHILD), ('right', C, CHILD)),
+    LOGICAL_OPERATION: (('operator', A, TEXT), ('left', B, CHILD), ('right', C, CHILD)),
+    UNARY_OPERATION: (('operator', A, TEXT), ('operand', B, CHILD)),
+    FACTORIAL: (('value', B, CHILD),),
+    FUNCTION_CALL: (('name', A, TEXT), ('arguments', B, CHILDREN)),
+    SPIT_FUNCTION: (('arguments', B, CHILDREN),),
+    IF_STATEMENT: (('condition', A, CHILD), ('true_branch', B, CHILD), ('false_branch', C, CHILD)),
+    WHILE_STATEMENT: (('condition', A, CHILD), ('body', B, CHILD)),
+    BLOCK: (('statements', B, CHILDREN),),
+    FUNCTION_DEFINITION: (('name', A, TEXT), ('parameters', B, TEXTS), ('body', C, CHILD)),
+    RETURN_STATEMENT: (('value', B, CHILD),),
+    ERROR: (('message', A, TEXT),),
+    BOOLEAN: (('value', A, TEXT),),
+}
+
+# Node kind -> {field: (slot, content)}, for FlatNode attribute lookups
+_FIELDS = {kind: {name: (slot, content) for name, slot, content in layout}
+           for kind, layout in LAYOUT.items()}
+
+
+class FlatAST:
+    """A program's AST stored in typed columns.
+
+    >>> flat = FlatAST.from_ast(Parser(Lexer("x = 1 + 2").tokenize()).parse())
+    >>> len(flat), flat.roots.tolist()
+    (4, [0])
+    >>> [node.to_dict()['type'] for node in flat]
+    ['Assignment']
+    """
+
+    def __init__(self, kinds, lines, columns, a, b, c, extra, strings, roots):
+        self.kinds = kinds
+        self.lines = lines
+        self.columns = columns
+        self.slots = (a, b, c)
+        self.extra = extra
+        self.strings = strings
+        self.roots = roots
+
+    @classmethod
+    def from_ast(cls, ast):
+        """Encode a parsed program: a list of top-level statement nodes.
+
+        Nodes may be node objects or the equivalent dicts. The tree is
+        walked with an explicit stack, so any nesting depth is fine.
+        """
+        kinds = array('B')
+        lines = array('i')
+        columns = array('i')
+        slots = (array('i'), array('i'), array('i'))
+        extra = array('i')
+        roots = array('i', [-1]) * len(ast)
+        strings = []
+        string_ids = {}
+
+        def intern(text):
+            index = string_ids.get(text)
+            if index is None:
+                index = string_ids[text] = len(strings)
+                strings.append(text)
+            return index
+
+        # (node, column to store its index in, position in that column)
+        stack = [(node, roots, position) for position, node in reversed(list(enumerate(ast)))]
+        while stack:
+            node, target, position = stack.pop()
+            if node is None:
+                continue
+            index = len(kinds)
+            target[position] = index
+            kind = NODE_KINDS[node['type']]
+            kinds.append(kind)
+            line = getattr(node, 'line', None)
+            column = getattr(node, 'column', None)
+            lines.append(line or 0)
+            columns.append(column or 0)
+            for slot in slots:
+                slot.append(-1)
+            children = []
+            for name, slot, content in LAYOUT[kind]:
+                value = node[name]
+                if content == TEXT:
+                    slots[slot][index] = intern(value)
+                elif content == CHILD:
+                    children.append((value, slots[slot], index))
+                else:
+                    offset = len(extra)
+                    slots[slot][index] = offset
+                    extra.append(len(value))
+                    if content == TEXTS:
+                        extra.extend(intern(item) for item in value)
+                    else:
+                        extra.extend([-1] * len(value))
+                        children.extend((item, extra, offset + 1 + position)
+                                        for position, item in enumerate(value))
+            stack.extend(reversed(children))
+        return cls(kinds, lines, columns, *slots, extra, strings, roots)
+
+    def to_ast(self):
+        """Rebuild the node objects: the inverse of from_ast().
+
+        from_ast() numbers the nodes in preorder, so every child has a
+        higher index than its parent, and building the nodes from the last
+        index back finds every child already built.
+        """
+        strings = self.strings
+        extra = self.extra
+        slots = self.slots
+        kinds = self.kinds
+        lines = self.lines
+        columns = self.columns
+        built = [None] * len(kinds)
+        for index in range(len(kinds) - 1, -1, -1):
+            kind = kinds[index]
+            node_class = NODE_CLASSES[kind]
+            node = node_class.__new__(node_class)
+            for name, slot, content in LAYOUT[kind]:
+                value = slots[slot][index]
+                if content == TEXT:
+                    value = strings[value]
+                elif content == CHILD:
+                    value = built[value] if value != -1 else None
+                else:
+                    items = extra[value + 1:value + 1 + extra[value]]
+                    if content == TEXTS:
+                        value = [strings[item] for item in items]
+                    else:
+                        value = [built[item] for item in items]
+                setattr(node, name, value)
+            node.line = lines[index] or None
+            node.column = columns[index] or None
+            built[index] = node
+        return [built[index] for index in self.roots]
+
+    def __len__(self):
+        """The number of nodes."""
+        return len(self.kinds)
+
+    def __iter__(self):
+        """Views of the top-level statements."""
+        return (FlatNode(self, index) for index in self.roots)
+
+    def node(self, index):
+        """A view of node index."""
+        return FlatNode(self, index)
+
+    def kind(self, index):
+        return self.kinds[index]
+
+    def text(self, index, field):
+        """The string stored in a TEXT field of node index."""
+        slot, _ = _FIELDS[self.kinds[index]][field]
+        return self.strings[self.slots[slot][index]]
+
+    def child(self, index, field):
+        """The node index stored in a CHILD field of node index, or -1."""
+        slot, _ = _FIELDS[self.kinds[index]][field]
+        return self.slots[slot][index]
+
+    def children(self, index):
+        """Indices of the child nodes of node index, in field order."""
+        result = []
+        for _, slot, content in LAYOUT[self.kinds[index]]:
+            value = self.slots[slot][index]
+            if content == CHILD:
+                if value != -1:
+                    result.append(value)
+            elif content == CHILDREN:
+                count = self.extra[value]
+                result.extend(self.extra[value + 1:value + 1 + count])
+        return result
+
+    def walk(self, index=None):
+        """Yield node indices in preorder, from node index or all roots."""
+        stack = [index] if index is not None else list(reversed(self.roots))
+        while stack:
+            index = stack.pop()
+            yield index
+            stack.extend(reversed(self.children(index)))
+
+
+class FlatNode(Node):
+    """A view of one node of a FlatAST that reads like a node object.
+
+    Fields are decoded from the columns on every access, so a view is
+    cheap to create and holds no data of its own.
+    """
+
+    __slots__ = ('ast', 'index')
+
+    def __init__(self, ast, index):
+        self.ast = ast
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.ast.kinds[self.index]
+
+    @property
+    def type(self):
+        return NODE_TYPES[self.ast.kinds[self.index]]
+
+    @property
+    def fields(self):
+        return tuple(_FIELDS[self.ast.kinds[self.index]])
+
+    @property
+    def line(self):
+        return self.ast.lines[self.index] or None
+
+    @property
+    def column(self):
+        return self.ast.columns[self.index] or None
+
+    def __getattr__(self, name):
+        ast = self.ast
+        index = self.index
+        try:
+            slot, content = _FIELDS[ast.kinds[index]][name]
+        except KeyError:
+            raise AttributeError(name) from None
+        value = ast.slots[slot][index]
+        if content == TEXT:
+            return ast.strings[value]
+        if content == CHILD:
+            return FlatNode(ast, value) if value != -1 else None
+        count = ast.extra[value]
+        items = ast.extra[value + 1:value + 1 + count]
+        if content == TEXTS:
+            return [ast.strings[item] for item in items]
+        return [FlatNode(ast, item) for item in items]
+
+    def __repr__(self):
+        return f"FlatNode({self.type}, {self.index})"
@@ -0,0 +1,352 @@
+"""
+Typed AST nodes built by the parser.
+
+Every node type is a small class with ``__slots__`` and an integer kind, so
+the interpreter and the transpiler can dispatch on node.kind through a
+table instead of comparing type-name strings. The original string names
+are still available through NODE_TYPES and Node.type.
+
+For compatibility with the original dict AST a node can be indexed by
+field name (``node['left']``, ``node['type']``) and compares equal to the
+dict it replaces; to_dict() converts a tree back to plain dicts (for
+example for a JSON dump).
+"""
+
+# Node kinds, in the order of NODE_TYPES
+NUMBER = 0
+STRING = 1
+IDENTIFIER = 2
+ASSIGNMENT = 3
+BINARY_OPERATION = 4
+COMPARISON = 5
+LOGICAL_OPERATION = 6
+UNARY_OPERATION = 7
+FACTORIAL = 8
+FUNCTION_CALL = 9
+SPIT_FUNCTION = 10
+IF_STATEMENT = 11
+WHILE_STATEMENT = 12
+BLOCK = 13
+FUNCTION_DEFINITION = 14
+RETURN_STATEMENT = 15
+ERROR = 16
+BOOLEAN = 17
+CONSTANT = 18
+
+NODE_TYPES = (
+    'Number', 'String', 'Identifier', 'Assignment', 'BinaryOperation',
+    'Comparison', 'LogicalOperation', 'UnaryOperation', 'Factorial',
+    'FunctionCall', 'SpitFunction', 'IfStatement', 'WhileStatement', 'Block',
+    'FunctionDefinition', 'ReturnStatement', 'Error', 'Boolean', 'Constant',
+)
+
+# Node type name -> integer kind
+NODE_KINDS = {name: kind for kind, name in enumerate(NODE_TYPES)}
+
+
+class Node:
+    """Base class of all AST nodes.
+
+    Subclasses list their fields, in the order of the original dict keys,
+    in ``fields``. The first constructor argument of every node is the
+    token (or node) whose line and column the node is located at, or None.
+    """
+
+    __slots__ = ('line', 'column')
+
+    kind = None
+    type = None
+    fields = ()
+
+    def __getitem__(self, name):
+        if name == 'type':
+            return self.type
+        if name in self.fields:
+            return getattr(self, name)
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Return the tree rooted at this node as nested plain dicts."""
+        result = {'type': self.type}
+        for name in self.fields:
+            result[name] = _to_dict(getattr(self, name))
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, Node):
+            return (self.kind == other.kind and
+                    all(getattr(self, name) == getattr(other, name) for name in self.fields))
+        if isinstance(other, dict):
+            return (other.get('type') == self.type and len(other) == len(self.fields) + 1 and
+                    all(name in other and getattr(self, name) == other[name]
+                        for name in self.fields))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def _to_dict(value):
+    if isinstance(value, Node):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+class Number(Node):
+    __slots__ = ('value',)
+    kind = NUMBER
+    type = 'Number'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class String(Node):
+    __slots__ = ('value',)
+    kind = STRING
+    type = 'String'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Identifier(Node):
+    __slots__ = ('value',)
+    kind = IDENTIFIER
+    type = 'Identifier'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Assignment(Node):
+    __slots__ = ('identifier', 'value')
+    kind = ASSIGNMENT
+    type = 'Assignment'
+    fields = ('identifier', 'value')
+
+    def __init__(self, location, identifier, value):
+        self.identifier = identifier
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class BinaryOperation(Node):
+    __slots__ = ('operator', 'left', 'right')
+    kind = BINARY_OPERATION
+    type = 'BinaryOperation'
+    fields = ('operator', 'left', 'right')
+
+    def __init__(self, location, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Comparison(BinaryOperation):
+    __slots__ = ()
+    kind = COMPARISON
+    type = 'Comparison'
+
+
+class LogicalOperation(BinaryOperation):
+    __slots__ = ()
+    kind = LOGICAL_OPERATION
+    type = 'LogicalOperation'
+
+
+class UnaryOperation(Node):
+    __slots__ = ('operator', 'operand')
+    kind = UNARY_OPERATION
+    type = 'UnaryOperation'
+    fields = ('operator', 'operand')
+
+    def __init__(self, location, operator, operand):
+        self.operator = operator
+        self.operand = operand
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Factorial(Node):
+    __slots__ = ('value',)
+    kind = FACTORIAL
+    type = 'Factorial'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class FunctionCall(Node):
+    __slots__ = ('name', 'arguments')
+    kind = FUNCTION_CALL
+    type = 'FunctionCall'
+    fields = ('name', 'arguments')
+
+    def __init__(self, location, name, arguments):
+        self.name = name
+        self.arguments = arguments
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class SpitFunction(Node):
+    """A call of spit() or its Amharic spelling አውጣ()."""
+
+    __slots__ = ('arguments',)
+    kind = SPIT_FUNCTION
+    type = 'SpitFunction'
+    fields = ('arguments',)
+
+    def __init__(self, location, arguments):
+        self.arguments = arguments
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class IfStatement(Node):
+    __slots__ = ('condition', 'true_branch', 'false_branch')
+    kind = IF_STATEMENT
+    type = 'IfStatement'
+    fields = ('condition', 'true_branch', 'false_branch')
+
+    def __init__(self, location, condition, true_branch, false_branch):
+        self.condition = condition
+        self.true_branch = true_branch
+        self.false_branch = false_branch  # A Block, or None without 'else'
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class WhileStatement(Node):
+    __slots__ = ('condition', 'body')
+    kind = WHILE_STATEMENT
+    type = 'WhileStatement'
+    fields = ('condition', 'body')
+
+    def __init__(self, location, condition, body):
+        self.condition = condition
+        self.body = body
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Block(Node):
+    __slots__ = ('statements',)
+    kind = BLOCK
+    type = 'Block'
+    fields = ('statements',)
+
+    def __init__(self, location, statements):
+        self.statements = statements
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class FunctionDefinition(Node):
+    __slots__ = ('name', 'parameters', 'body')
+    kind = FUNCTION_DEFINITION
+    type = 'FunctionDefinition'
+    fields = ('name', 'parameters', 'body')
+
+    def __init__(self, location, name, parameters, body):
+        self.name = name
+        self.parameters = parameters  # Parameter names (strings)
+        self.body = body
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class ReturnStatement(Node):
+    __slots__ = ('value',)
+    kind = RETURN_STATEMENT
+    type = 'ReturnStatement'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Error(Node):
+    """Stands in for a statement that failed to parse (Parser(recover=True))."""
+
+    __slots__ = ('message',)
+    kind = ERROR
+    type = 'Error'
+    fields = ('message',)
+
+    def __init__(self, location, message):
+        self.message = message
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+class Boolean(Node):
+    """A true/false literal; value is its text (true, false, እውነት or ሐሰት)."""
+
+    __slots__ = ('value',)
+    kind = BOOLEAN
+    type = 'Boolean'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+# Texts of the true literal; every other Boolean is false
+TRUE_WORDS = ('true', 'እውነት')
+
+
+class Constant(Node):
+    """A value computed ahead of time (by src.optimizer), not parsed.
+
+    value is the Python value itself: an int, float, bool or str.
+    """
+
+    __slots__ = ('value',)
+    kind = CONSTANT
+    type = 'Constant'
+    fields = ('value',)
+
+    def __init__(self, location, value):
+        self.value = value
+        self.line = location.line if location is not None else None
+        self.column = location.column if location is not None else None
+
+
+# Node kind -> node class
+NODE_CLASSES = (
+    Number, String, Identifier, Assignment, BinaryOperation, Comparison,
+    LogicalOperation, UnaryOperation, Factorial, FunctionCall, SpitFunction,
+    IfStatement, WhileStatement, Block, FunctionDefinition, ReturnStatement, Error,
+    Boolean, Constant,
+)
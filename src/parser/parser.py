@@ -1,140 +1,508 @@
+from collections import OrderedDict, deque
+
+from src.lexer.tokens import (
+    Token, SourceError, EOF, IDENTIFIER, NUMBER, STRING, NEWLINE,
+    EQUALS, NOT_EQUALS, LESS_EQUALS, GREATER_EQUALS, FACTORIAL, LESS, GREATER,
+    PLUS, MINUS, MULTIPLY, DIVIDE, MODULO, ASSIGN, LPAREN, RPAREN, COLON,
+    COMMA, SEMICOLON, IF, ELSE, WHILE, DEF, RETURN, AND, OR, NOT, ASSIGN_KW,
+    PRINT, SPIT, INDENT, DEDENT, TRUE_LITERAL, FALSE_LITERAL, TOKEN_NAMES,
+)
+from src.parser.nodes import (
+    Number, String, Identifier, Assignment, BinaryOperation, Comparison,
+    LogicalOperation, UnaryOperation, Factorial, FunctionCall, SpitFunction,
+    IfStatement, WhileStatement, Block, FunctionDefinition, ReturnStatement, Error,
+    Boolean,
+)
+from src.parser import nodes
+
+
+class ParseError(SourceError):
+    """Raised when the token stream does not match the grammar."""
+
+
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    # The grammar never looks further ahead than this many tokens past the
+    # current one, so a streamed token source only needs a tiny buffer
+    MAX_LOOKAHEAD = 3
+
+    # Rules whose results are cached by (rule, token position) in memoize mode
+    MEMOIZED_RULES = ('_statement', '_expression', '_factor')
+
+    # Default bound on the number of cached (rule, position) results
+    MEMO_SIZE = 4096
+
+    # Tokens where error recovery resumes parsing: statement starts and
+    # statement or block ends. Recovery stops before them, so the loop that
+    # was parsing statements carries on as usual.
+    SYNC_KINDS = frozenset((SEMICOLON, DEF, IF, WHILE, NEWLINE, DEDENT, EOF))
+
+    def __init__(self, tokens, memoize=False, memo_size=MEMO_SIZE, iterative=False,
+                 layout=False, recover=False):
+        """Create a parser over a token list or any iterable of tokens.
+
+        A list is indexed directly. Any other iterable (such as
+        Lexer.iter_tokens()) is consumed lazily through a lookahead buffer of
+        at most MAX_LOOKAHEAD tokens, so the full token list never exists.
+        Plain (TYPE, value) tuples are accepted and converted to Tokens.
+
+        With memoize=True (token lists only) the MEMOIZED_RULES cache their
+        result, or their ParseError, per token position in a least recently
+        used cache of at most memo_size entries. Parsing the same span again
+        (parse_at(), error recovery) then costs a lookup; see memo_stats().
+
+        With iterative=True nested statements and expressions are parsed
+        with explicit stacks instead of recursion, so deeply nested (e.g.
+        generated) code never hits Python's recursion limit. The tree is
+        the same as in the default mode, which is somewhat faster.
+
+        With layout=True the tokens must come from Lexer(..., layout=True),
+        and the bodies of if, else, while and def are delimited by the line
+        structure (see _suite()) instead of by the semicolon heuristics.
+
+        With recover=True a syntax error does not stop the parse. The error
+        is appended to self.errors, the tokens up to the next SYNC_KINDS
+        token are skipped, and the statement that failed is replaced by an
+        Error node (with the error 'message'). parse() then returns the
+        partial AST, and one pass reports every error.
+        """
         self.position = 0
-        self.current_token = self.tokens[self.position] if self.tokens else None
-        # Add tokens_iter for compatibility with tests
-        self.tokens_iter = iter(tokens)
+        self.previous_token = None
+        if isinstance(tokens, list):
+            if tokens and not isinstance(tokens[0], Token):
+                tokens = [Token.from_pair(token) for token in tokens]
+            self.tokens = tokens
+            self._lookahead = None
+            self.current_token = self.tokens[self.position] if self.tokens else None
+            # Add tokens_iter for compatibility with tests
+            self.tokens_iter = iter(tokens)
+        else:
+            self.tokens = None
+            self._lookahead = deque()
+            self.tokens_iter = iter(tokens)
+            self.current_token = next(self.tokens_iter, None)
+            if self.current_token is not None and not isinstance(self.current_token, Token):
+                self.current_token = Token.from_pair(self.current_token)
+                self.tokens_iter = map(Token.from_pair, self.tokens_iter)
+        # Integer kind of the current token (EOF once the tokens run out)
+        self.kind = self.current_token.kind if self.current_token is not None else EOF
+
+        self.layout = layout
+        self.recover = recover
+        self.errors = []
+        self.iterative = iterative
+        if iterative:
+            self._statement = self._iterative_statement
+            self._expression = self._iterative_expression
+
+        self.memoize = memoize
+        if memoize:
+            if self.tokens is None:
+                raise ValueError("Memoized parsing needs a token list, not a stream")
+            self.memo_size = memo_size
+            self._memo = OrderedDict()
+            self.memo_hits = 0
+            self.memo_misses = 0
+            self.memo_evictions = 0
+            # Instance attributes shadow the rule methods, so the
+            # non-memoized parser pays nothing for this mode
+            for name in self.MEMOIZED_RULES:
+                setattr(self, name, self._memoized(name, getattr(self, name)))
+
+        # The iterative statement parser recovers from errors in nested
+        # statements itself
+        if recover and not iterative:
+            self._statement = self._recovering(self._statement)
 
     def advance(self):
         self.position += 1
-        if self.position < len(self.tokens):
-            self.current_token = self.tokens[self.position]
+        self.previous_token = self.current_token
+        if self._lookahead is None:
+            if self.position < len(self.tokens):
+                self.current_token = self.tokens[self.position]
+            else:
+                self.current_token = None
+        elif self._lookahead:
+            self.current_token = self._lookahead.popleft()
         else:
-            self.current_token = None
+            self.current_token = next(self.tokens_iter, None)
+        self.kind = self.current_token.kind if self.current_token is not None else EOF
+
+    def _seek(self, position):
+        """Move to a token position (token lists only)."""
+        tokens = self.tokens
+        self.position = position
+        self.previous_token = tokens[position - 1] if position else None
+        self.current_token = tokens[position] if position < len(tokens) else None
+        self.kind = self.current_token.kind if self.current_token is not None else EOF
+
+    def _memoized(self, name, rule):
+        """Wrap a rule method so its outcome is cached per token position."""
+        memo = self._memo
+
+        def memoized_rule():
+            key = (name, self.position)
+            entry = memo.get(key)
+            if entry is not None:
+                memo.move_to_end(key)
+                self.memo_hits += 1
+                result, end = entry
+                self._seek(end)
+                if isinstance(result, ParseError):
+                    raise result
+                return result
+
+            self.memo_misses += 1
+            try:
+                result = rule()
+            except ParseError as error:
+                self._remember(key, error)
+                raise
+            self._remember(key, result)
+            return result
+
+        return memoized_rule
+
+    def _remember(self, key, result):
+        """Cache a rule outcome, evicting the least recently used entry."""
+        memo = self._memo
+        memo[key] = (result, self.position)
+        if len(memo) > self.memo_size:
+            memo.popitem(last=False)
+            self.memo_evictions += 1
+
+    def memo_stats(self):
+        """Return the memo cache counters of a memoizing parser."""
+        lookups = self.memo_hits + self.memo_misses
+        return {
+            'hits': self.memo_hits,
+            'misses': self.memo_misses,
+            'evictions': self.memo_evictions,
+            'size': len(self._memo),
+            'hit_rate': self.memo_hits / lookups if lookups else 0.0,
+        }
+
+    def _recovering(self, statement):
+        """Wrap the statement rule so a failed statement becomes an Error node."""
+        def recovering_statement():
+            start = self.position
+            token = self.current_token
+            try:
+                return statement()
+            except ParseError as error:
+                return self._recover(error, start, token)
+
+        return recovering_statement
+
+    def _recover(self, error, start, token):
+        """Record error for the statement that started at token position
+        start, skip to the next synchronization point and return the Error
+        node that stands in for the statement."""
+        self.errors.append(error)
+        sync_kinds = self.SYNC_KINDS
+        depth = 0  # Indented blocks entered while skipping
+        if self.position == start and self.current_token is not None:
+            # Always skip at least one token, so parsing makes progress
+            depth += self.kind == INDENT
+            self.advance()
+        while self.current_token is not None:
+            kind = self.kind
+            if kind == INDENT:
+                depth += 1
+            elif kind == DEDENT and depth:
+                depth -= 1
+            elif kind in sync_kinds and not depth:
+                break
+            self.advance()
+        return Error(token, error.message)
+
+    def parse_at(self, position):
+        """Parse the single statement starting at a token position.
+
+        Returns the statement node and the position just after it. In
+        memoize mode asking again for a statement that was already parsed
+        (for example by an editor or during error recovery) is a cache hit.
+        """
+        if self.tokens is None:
+            raise ValueError("parse_at needs a token list, not a stream")
+        self._seek(position)
+        statement = self._statement()
+        return statement, self.position
+
+    def _peek(self, offset=1):
+        """Return the token offset positions after the current one, or None."""
+        if self._lookahead is None:
+            peek_pos = self.position + offset
+            if peek_pos < len(self.tokens):
+                return self.tokens[peek_pos]
+            return None
+
+        if offset > self.MAX_LOOKAHEAD:
+            raise ValueError(f"Lookahead of {offset} exceeds MAX_LOOKAHEAD")
+        lookahead = self._lookahead
+        while len(lookahead) < offset:
+            token = next(self.tokens_iter, None)
+            if token is None:
+                return None
+            lookahead.append(token)
+        return lookahead[offset - 1]
+
+    def _peek_kind(self, offset=1):
+        """Return the kind of the token offset positions ahead (EOF past the end)."""
+        token = self._peek(offset)
+        return token.kind if token is not None else EOF
+
+    def _error(self, message):
+        """Return a ParseError located at the current token.
+
+        At the end of the input the error points at the last token instead.
+        """
+        token = self.current_token or self.previous_token
+        if token is None:
+            return ParseError(message)
+        return ParseError(message, token.line, token.column)
             
-    def _eat(self, token_type):
+    def _eat(self, kind):
         """
-        Checks if the current token matches the expected type and advances if it does,
-        otherwise raises an exception.
+        Checks if the current token matches the expected kind and advances if it does,
+        otherwise raises a ParseError pointing at the offending token.
         """
-        if self.current_token and self.current_token[0] == token_type:
-            value = self.current_token
+        if self.kind == kind:
+            token = self.current_token
             self.advance()
-            return value
+            return token
         else:
-            raise Exception(f"Expected token type {token_type}, got {self.current_token}")
+            found = self.current_token.type if self.current_token else 'end of input'
+            raise self._error(f"Expected token type {TOKEN_NAMES[kind]}, got {found}")
 
     def parse(self):
-        ast = []
+        return list(self.iter_parse())
+
+    def iter_parse(self):
+        """Yield top-level statements as soon as each one has been parsed.
+
+        Combined with a streamed token source this keeps memory bounded by
+        the size of the largest top-level statement.
+        """
+        while self.kind == NEWLINE:
+            self.advance()
         while self.current_token is not None:
-            statement = self._statement()
-            ast.append(statement)
-            # Skip any trailing semicolons between top-level statements
-            while self.current_token and self.current_token[0] == 'SEMICOLON':
+            yield self._statement()
+            # Skip any trailing semicolons (and line ends) between top-level statements
+            while self.kind == SEMICOLON or self.kind == NEWLINE:
                 self.advance()
-        return ast
 
     def _statement(self):
-        if self.current_token[0] == 'IF':
+        if self.kind == SEMICOLON:
+            self.advance()  # Skip the semicolon and parse the next statement
+            return self._statement()
+        rule = self._compound_rule()
+        if rule is not None:
+            return self._run(rule)
+        return self._simple_statement()
+
+    def _compound_rule(self):
+        """Return the rule generator for a statement that contains statements.
+
+        Compound statement rules are generators: each bare ``yield`` asks
+        for the next nested statement to be parsed and sent back. Returns
+        None if the current token does not start a compound statement.
+        """
+        if self.kind == IF:
             return self._if_statement()
-        elif self.current_token[0] == 'WHILE':
+        elif self.kind == WHILE:
             return self._while_statement()
-        elif self.current_token[0] == 'DEF':
+        elif self.kind == DEF:
             return self._function_definition()
-        elif self.current_token[0] == 'RETURN':
+        return None
+
+    def _simple_statement(self):
+        if self.kind == RETURN:
             return self._return_statement()
-        elif self.current_token[0] == 'ELSE':
-            raise Exception("Unexpected 'else' without matching 'if'")
-        elif self.current_token[0] == 'SEMICOLON':
-            self.advance()  # Skip the semicolon and parse the next statement
-            return self._statement()
+        elif self.kind == ELSE:
+            raise self._error("Unexpected 'else' without matching 'if'")
+        elif self.kind == INDENT:
+            raise self._error("Unexpected indent")
         else:
             return self._assignment()
 
+    def _run(self, rule):
+        """Run a compound statement rule, parsing each nested statement it
+        asks for with a recursive _statement() call."""
+        try:
+            next(rule)
+            while True:
+                rule.send(self._statement())
+        except StopIteration as stop:
+            return stop.value
+
+    def _iterative_statement(self):
+        """Parse a statement without recursing into nested statements.
+
+        The compound statements around the current one are kept as
+        suspended rule generators on an explicit stack, so the nesting depth
+        is limited by memory only.
+        """
+        rules = []
+        starts = []  # (position, token) where each rule's statement starts
+        while True:
+            while self.kind == SEMICOLON:
+                self.advance()
+            start = (self.position, self.current_token)
+            try:
+                rule = self._compound_rule()
+                if rule is not None:
+                    rules.append(rule)
+                    starts.append(start)
+                    value = None
+                else:
+                    value = self._simple_statement()
+            except ParseError as error:
+                if not self.recover:
+                    raise
+                value = self._recover(error, *start)
+            # Resume the innermost rule until one asks for another statement
+            while rules:
+                try:
+                    rules[-1].send(value)
+                    break
+                except StopIteration as stop:
+                    rules.pop()
+                    starts.pop()
+                    value = stop.value
+                except ParseError as error:
+                    if not self.recover:
+                        raise
+                    rules.pop()
+                    value = self._recover(error, *starts.pop())
+            else:
+                return value
+
+    def _suite(self):
+        """Parse the body of a compound statement in layout mode.
+
+        After the ':' either an indented block follows on the next lines
+        (NEWLINE INDENT ... DEDENT), or the body is the rest of the line:
+        statements separated by ';' up to the end of the line or an 'else'.
+        Either way the end of the body is known from the current token.
+        """
+        statements = []
+        if self.kind == NEWLINE:
+            self.advance()
+            if self.kind != INDENT:
+                raise self._error("Expected an indented block")
+            self.advance()
+            start_token = self.current_token
+            while True:
+                while self.kind == SEMICOLON or self.kind == NEWLINE:
+                    self.advance()
+                if self.kind == DEDENT:
+                    self.advance()
+                    break
+                elif self.current_token is None:
+                    break
+                statements.append((yield))
+        else:
+            start_token = self.current_token
+            statements.append((yield))
+            while self.kind == SEMICOLON:
+                self.advance()
+                if self.kind in (NEWLINE, ELSE, DEDENT, EOF):
+                    break
+                statements.append((yield))
+            if self.kind == NEWLINE:
+                self.advance()
+        return Block(start_token, statements)
+
     def _block(self):
         """Parse a block of statements (for function bodies and control structures)."""
+        start_token = self.current_token
         statements = []
         
         # Add the first statement
-        statements.append(self._statement())
+        statements.append((yield))
         
         # Check for semicolons indicating multiple statements in the block
-        while self.current_token and self.current_token[0] == 'SEMICOLON':
+        while self.kind == SEMICOLON:
             self.advance()  # Skip the semicolon
             # Check if there's another statement to parse
-            if self.current_token and self.current_token[0] not in ('EOF', None):
+            if self.current_token:
                 # Don't parse ELSE as a new statement - it should be handled by the if_statement
-                if self.current_token[0] == 'ELSE':
+                if self.kind == ELSE:
                     break
                 # For control flow keywords within blocks, we need to be more careful
                 # Only break if this looks like a new top-level function definition
-                elif self.current_token[0] == 'DEF':
+                elif self.kind == DEF:
                     # This is definitely a new top-level function, stop here
                     break
                 # For RETURN statements, they should end the current block context
-                elif self.current_token[0] == 'RETURN':
+                elif self.kind == RETURN:
                     # Add the return statement and stop
-                    statements.append(self._statement())
+                    statements.append((yield))
                     break
                 # For IF and WHILE, they can be nested within blocks, so continue parsing
                 else:
-                    statements.append(self._statement())
+                    statements.append((yield))
             else:
                 break
             
-        return {
-            'type': 'Block',
-            'statements': statements
-        }
+        return Block(start_token, statements)
 
     def _if_statement(self):
+        if_token = self.current_token
         self.advance()  # Skip 'if'
         condition = self._expression()
         
-        if self.current_token and self.current_token[0] == 'COLON':
+        if self.kind == COLON and self.layout:
+            self.advance()  # Skip ':'
+            true_branch = yield from self._suite()
+            false_branch = None
+            if self.kind == ELSE:
+                self.advance()  # Skip 'else'
+                if self.kind != COLON:
+                    raise self._error("Expected ':' after 'else'")
+                self.advance()  # Skip ':'
+                false_branch = yield from self._suite()
+            return IfStatement(if_token, condition, true_branch, false_branch)
+        elif self.kind == COLON:
             self.advance()  # Skip ':'
             
             # Parse true branch - collect statements until we see ELSE or end
+            true_token = self.current_token
             true_statements = []
             
             # Parse first statement of true branch
-            true_statements.append(self._statement())
+            true_statements.append((yield))
             
             # Continue parsing statements in true branch until we hit ELSE
-            while (self.current_token and 
-                   self.current_token[0] == 'SEMICOLON'):
+            while self.kind == SEMICOLON:
                 self.advance()  # Skip semicolon
                 
                 # Check if next token is ELSE - if so, break to handle else clause
-                if self.current_token and self.current_token[0] == 'ELSE':
+                if self.kind == ELSE:
                     break
                     
                 # Otherwise, parse another statement for the true branch
                 if self.current_token:
-                    true_statements.append(self._statement())
+                    true_statements.append((yield))
             
-            true_branch = {
-                'type': 'Block',
-                'statements': true_statements
-            }
+            true_branch = Block(true_token, true_statements)
             
             false_branch = None
             
             # Check for else part
-            if self.current_token and self.current_token[0] == 'ELSE':
+            if self.kind == ELSE:
                 self.advance()  # Skip 'else'
-                if self.current_token and self.current_token[0] == 'COLON':
+                if self.kind == COLON:
                     self.advance()  # Skip ':'
                     
                     # Parse false branch statements
+                    false_token = self.current_token
                     false_statements = []
-                    false_statements.append(self._statement())
+                    false_statements.append((yield))
                     
                     # Continue parsing semicolon-separated statements in false branch
                     # Use improved logic to detect end of if-else construct
-                    while (self.current_token and 
-                           self.current_token[0] == 'SEMICOLON'):
+                    while self.kind == SEMICOLON:
                         self.advance()  # Skip semicolon
                         
                         # Stop if we reach end of input
@@ -142,18 +510,16 @@ class Parser:
                             break
                             
                         # Stop on clear top-level construct markers
-                        if self.current_token[0] in ('IF', 'WHILE', 'DEF'):
+                        if self.kind in (IF, WHILE, DEF):
                             break
                             
                         # Smart detection: Stop if this looks like a new logical section
-                        if self.current_token[0] == 'IDENTIFIER':
+                        if self.kind == IDENTIFIER:
                             # Get the identifier to check if it's related to the if-else variables
-                            current_identifier = self.current_token[1]
+                            current_identifier = self.current_token.value
                             
                             # Look ahead to see if this is an assignment
-                            next_pos = self.position + 1
-                            if (next_pos < len(self.tokens) and 
-                                self.tokens[next_pos][0] == 'ASSIGN'):
+                            if self._peek_kind() == ASSIGN:
                                 
                                 # Be more conservative: if we already have 2+ statements in the false branch,
                                 # treat any new assignment as a separate statement
@@ -172,7 +538,7 @@ class Parser:
                                     break
                         
                         # Check for print statements - these often indicate end of logic block
-                        elif self.current_token[0] in ('SPIT', 'PRINT'):
+                        elif self.kind in (SPIT, PRINT):
                             # Print statements are usually separate from if-else logic
                             # Only include them if we have very few statements so far
                             if len(false_statements) >= 1:
@@ -180,321 +546,417 @@ class Parser:
                             
                         # Continue parsing the statement as part of false branch
                         if self.current_token:
-                            false_statements.append(self._statement())
+                            false_statements.append((yield))
                     
-                    false_branch = {
-                        'type': 'Block',
-                        'statements': false_statements
-                    }
+                    false_branch = Block(false_token, false_statements)
                 else:
-                    raise Exception("Expected ':' after 'else'")
+                    raise self._error("Expected ':' after 'else'")
                     
-            return {'type': 'IfStatement', 'condition': condition, 'true_branch': true_branch, 'false_branch': false_branch}
+            return IfStatement(if_token, condition, true_branch, false_branch)
         else:
-            raise Exception(f"Expected ':' after 'if' condition")
+            raise self._error("Expected ':' after 'if' condition")
     
     def _extract_variables_from_condition(self, condition):
         """Extract variable names from a condition expression"""
         variables = set()
-        if condition['type'] == 'Comparison':
-            if condition['left']['type'] == 'Identifier':
-                variables.add(condition['left']['value'])
-            if condition['right']['type'] == 'Identifier':
-                variables.add(condition['right']['value'])
-        elif condition['type'] == 'Identifier':
-            variables.add(condition['value'])
+        if condition.kind == nodes.COMPARISON:
+            if condition.left.kind == nodes.IDENTIFIER:
+                variables.add(condition.left.value)
+            if condition.right.kind == nodes.IDENTIFIER:
+                variables.add(condition.right.value)
+        elif condition.kind == nodes.IDENTIFIER:
+            variables.add(condition.value)
         # Add more cases as needed for complex expressions
         return variables
     
     def _extract_variables_from_statement(self, statement):
         """Extract variable names from a statement (assignments, etc.)"""
         variables = set()
-        if statement['type'] == 'Assignment':
-            variables.add(statement['identifier'])
+        if statement.kind == nodes.ASSIGNMENT:
+            variables.add(statement.identifier)
             # Also add variables from the value expression
-            if statement['value']['type'] == 'Identifier':
-                variables.add(statement['value']['value'])
-            elif statement['value']['type'] == 'BinaryOperation':
-                if statement['value']['left']['type'] == 'Identifier':
-                    variables.add(statement['value']['left']['value'])
-                if statement['value']['right']['type'] == 'Identifier':
-                    variables.add(statement['value']['right']['value'])
+            value = statement.value
+            if value.kind == nodes.IDENTIFIER:
+                variables.add(value.value)
+            elif value.kind == nodes.BINARY_OPERATION:
+                if value.left.kind == nodes.IDENTIFIER:
+                    variables.add(value.left.value)
+                if value.right.kind == nodes.IDENTIFIER:
+                    variables.add(value.right.value)
         return variables
 
     def _while_statement(self):
+        while_token = self.current_token
         self.advance()  # Skip 'while'
         condition = self._expression()
         
-        if self.current_token and self.current_token[0] == 'COLON':
+        if self.kind == COLON:
             self.advance()  # Skip ':'
             
             # Parse body - always wrap in a block
-            if self.current_token and self.current_token[0] == 'NEWLINE':
+            if self.layout:
+                body = yield from self._suite()
+            elif self.kind == NEWLINE:
                 self.advance()  # Skip newline
-                body = self._block()
+                body = yield from self._block()
             else:
                 # Parse all statements that are part of this while loop body
                 # This includes semicolon-separated statements on the same line
-                body = self._block()
+                body = yield from self._block()
             
-            return {'type': 'WhileStatement', 'condition': condition, 'body': body}
+            return WhileStatement(while_token, condition, body)
         else:
-            raise Exception("Expected ':' after 'while' condition")
+            raise self._error("Expected ':' after 'while' condition")
 
     def _function_definition(self):
+        def_token = self.current_token
         self.advance()  # Skip 'def'
         
-        if self.current_token and self.current_token[0] == 'IDENTIFIER':
-            function_name = self.current_token[1]
+        if self.kind == IDENTIFIER:
+            function_name = self.current_token.value
             self.advance()  # Skip function name
             
-            if self.current_token and self.current_token[0] == 'LPAREN':
+            if self.kind == LPAREN:
                 self.advance()  # Skip '('
                 parameters = []
                 
                 # Parse parameters
-                if self.current_token and self.current_token[0] == 'IDENTIFIER':
-                    parameters.append(self.current_token[1])
+                if self.kind == IDENTIFIER:
+                    parameters.append(self.current_token.value)
                     self.advance()
                     
-                    while self.current_token and self.current_token[0] == 'COMMA':
+                    while self.kind == COMMA:
                         self.advance()  # Skip ','
-                        if self.current_token and self.current_token[0] == 'IDENTIFIER':
-                            parameters.append(self.current_token[1])
+                        if self.kind == IDENTIFIER:
+                            parameters.append(self.current_token.value)
                             self.advance()
                         else:
-                            raise Exception("Expected parameter name after ','")
+                            raise self._error("Expected parameter name after ','")
                 
-                if self.current_token and self.current_token[0] == 'RPAREN':
+                if self.kind == RPAREN:
                     self.advance()  # Skip ')'
                     
-                    if self.current_token and self.current_token[0] == 'COLON':
+                    if self.kind == COLON:
                         self.advance()  # Skip ':'
-                        body = self._function_body()  # Use specialized function body parser
-                        return {'type': 'FunctionDefinition', 'name': function_name, 'parameters': parameters, 'body': body}
+                        if self.layout:
+                            body = yield from self._suite()
+                        else:
+                            body = yield from self._function_body()  # Use specialized function body parser
+                        return FunctionDefinition(def_token, function_name, parameters, body)
                     else:
-                        raise Exception("Expected ':' after function parameters")
+                        raise self._error("Expected ':' after function parameters")
                 else:
-                    raise Exception("Expected ')' after function parameters")
+                    raise self._error("Expected ')' after function parameters")
             else:
-                raise Exception("Expected '(' after function name")
+                raise self._error("Expected '(' after function name")
         else:
-            raise Exception("Expected function name after 'def'")
+            raise self._error("Expected function name after 'def'")
 
     def _function_body(self):
         """Parse a function body, collecting statements until we hit a new function definition."""
+        start_token = self.current_token
         statements = []
         
         # Parse statements until we hit a new top-level construct
         while self.current_token:
             # Stop if we see a new function definition
-            if self.current_token[0] == 'DEF':
+            if self.kind == DEF:
                 break
                 
             # Stop if we see what looks like a top-level assignment to a built-in operation
             # (heuristic: if we already have statements and see an identifier not followed by '(')
-            if (self.current_token[0] == 'IDENTIFIER' and 
+            if (self.kind == IDENTIFIER and 
                 len(statements) > 0):  # Only apply this heuristic if we already have statements
-                next_pos = self.position + 1
                 # Look ahead to see if this is an assignment
-                if (next_pos < len(self.tokens) and 
-                    self.tokens[next_pos][0] == 'ASSIGN'):
+                if self._peek_kind() == ASSIGN:
                     # Check for factorial operator assignment (likely top-level)
-                    if (next_pos + 1 < len(self.tokens) and
-                        self.tokens[next_pos + 1][0] == 'NUMBER' and
-                        next_pos + 2 < len(self.tokens) and
-                        self.tokens[next_pos + 2][0] == 'FACTORIAL'):
+                    if (self._peek_kind(2) == NUMBER and
+                        self._peek_kind(3) == FACTORIAL):
                         # This looks like: variable = number!
                         # Definitely a top-level statement
                         break
                     # Check if this looks like a function call assignment (common pattern)
-                    if (next_pos + 1 < len(self.tokens) and
-                        self.tokens[next_pos + 1][0] == 'IDENTIFIER' and
-                        next_pos + 2 < len(self.tokens) and
-                        self.tokens[next_pos + 2][0] == 'LPAREN'):
+                    if (self._peek_kind(2) == IDENTIFIER and
+                        self._peek_kind(3) == LPAREN):
                         # This looks like: variable = function_call(args)
                         # Likely a new top-level statement
                         break
                         
             # Stop if we see a top-level function call (not an assignment)
-            if (self.current_token[0] == 'IDENTIFIER' and 
+            if (self.kind == IDENTIFIER and 
                 len(statements) > 0):
-                next_pos = self.position + 1
-                if (next_pos < len(self.tokens) and
-                    self.tokens[next_pos][0] == 'LPAREN'):
+                if self._peek_kind() == LPAREN:
                     # This is a standalone function call, likely top-level
                     break
                     
             # Stop if we see a standalone SPIT call (top-level output)
-            if self.current_token[0] == 'SPIT':
+            if self.kind == SPIT:
                 # Spit calls at the top level are common
                 if len(statements) > 0:  # Only if we already have function body content
                     break
             
             # Parse the statement
-            statement = self._statement()
+            statement = yield
             statements.append(statement)
             
             # Skip semicolons between statements
-            while self.current_token and self.current_token[0] == 'SEMICOLON':
+            while self.kind == SEMICOLON:
                 self.advance()
                 
-        return {
-            'type': 'Block',
-            'statements': statements
-        }
+        return Block(start_token, statements)
 
     def _return_statement(self):
+        return_token = self.current_token
         self.advance()  # Skip 'return'
         value = self._expression()
-        return {'type': 'ReturnStatement', 'value': value}
+        return ReturnStatement(return_token, value)
 
     def _assignment(self):
-        if self.current_token[0] == 'IDENTIFIER':
-            identifier = self.current_token[1]
+        # Peek past the identifier instead of backtracking, so streamed
+        # tokens never need to be rewound
+        if (self.kind == IDENTIFIER and
+                self._peek_kind() in (ASSIGN, ASSIGN_KW)):
+            identifier_token = self.current_token
             self.advance()
-            
-            if self.current_token and self.current_token[0] == 'ASSIGN':
-                self.advance()  # Skip '='
-                value = self._expression()
-                return {'type': 'Assignment', 'identifier': identifier, 'value': value}
-            elif self.current_token and self.current_token[0] == 'ASSIGN_KW':
-                self.advance()  # Skip Amharic assignment keyword 'ይሁን'
-                value = self._expression()
-                return {'type': 'Assignment', 'identifier': identifier, 'value': value}
-            
-            # If no assignment, treat as an expression
-            self.position -= 1  # Go back to identifier
-            self.current_token = self.tokens[self.position]
+            # Skip '=' or the Amharic assignment keyword 'ይሁን'
+            self.advance()
+            value = self._expression()
+            return Assignment(identifier_token, identifier_token.value, value)
             
         return self._expression()
 
+    # Binary operators: token kind -> (precedence, node class). Higher binds
+    # tighter; every level is left-associative.
+    _BINARY_OPERATORS = {
+        AND: (1, LogicalOperation),
+        OR: (1, LogicalOperation),
+        EQUALS: (2, Comparison),
+        NOT_EQUALS: (2, Comparison),
+        LESS: (2, Comparison),
+        LESS_EQUALS: (2, Comparison),
+        GREATER: (2, Comparison),
+        GREATER_EQUALS: (2, Comparison),
+        PLUS: (3, BinaryOperation),
+        MINUS: (3, BinaryOperation),
+        MULTIPLY: (4, BinaryOperation),
+        DIVIDE: (4, BinaryOperation),
+        MODULO: (4, BinaryOperation),
+    }
+
     def _expression(self):
         # Logical operators have the lowest precedence
-        return self._logical()
+        return self._binary(1)
 
-    def _logical(self):
-        left = self._comparison()
-        
-        while self.current_token and self.current_token[0] in ('AND', 'OR'):
-            operator = self.current_token[1]
-            self.advance()
-            right = self._comparison()
-            left = {'type': 'LogicalOperation', 'operator': operator, 'left': left, 'right': right}
-            
-        return left
+    def _binary(self, min_precedence):
+        """Parse operands joined by binary operators that bind at least as
+        tightly as min_precedence (precedence climbing).
 
-    def _comparison(self):
-        left = self._arithmetic()
-        
-        while self.current_token and self.current_token[0] in ('EQUALS', 'NOT_EQUALS', 'LESS', 'LESS_EQUALS', 'GREATER', 'GREATER_EQUALS'):
-            operator = self.current_token[1]
+        Unary operators and factorial are handled by _factor, so they bind
+        tighter than any binary operator.
+        """
+        operators = self._BINARY_OPERATORS
+        left = self._factor()
+        entry = operators.get(self.kind)
+        while entry is not None and entry[0] >= min_precedence:
+            precedence, node_class = entry
+            operator_token = self.current_token
             self.advance()
-            right = self._arithmetic()
-            left = {'type': 'Comparison', 'operator': operator, 'left': left, 'right': right}
-            
+            # Operands of a tighter operator are folded into the right side;
+            # an operator of the same level ends it (left associativity)
+            right = self._binary(precedence + 1)
+            left = node_class(operator_token, operator_token.value, left, right)
+            entry = operators.get(self.kind)
         return left
 
-    def _arithmetic(self):
-        return self._binary_operation()
+    def _factor(self):
+        """Parse factors (numbers, identifiers, function calls, parentheses, unary operations)"""
+        parse_prefix = self._PREFIX_PARSERS.get(self.kind)
+        if parse_prefix is not None:
+            return parse_prefix(self, self.current_token)
+        raise self._factor_error()
 
-    def _binary_operation(self):
-        left = self._term()
-        
-        while self.current_token and self.current_token[0] in ('PLUS', 'MINUS'):
-            operator = self.current_token[1]
-            self.advance()
-            right = self._term()
-            left = {'type': 'BinaryOperation', 'operator': operator, 'left': left, 'right': right}
-            
-        return left
+    def _factor_error(self):
+        """Return the ParseError for a token that cannot start a factor."""
+        if self.current_token is None:
+            return self._error("Unexpected end of input")
+        token = self.current_token
+        return self._error(f"Unexpected token: {token.type} {token.value!r}")
 
-    def _term(self):
-        left = self._factor()
+    def _unary(self, token):
+        """Handle unary operators (negative numbers, logical not)"""
+        self.advance()
+        operand = self._factor()  # Recursively parse the operand
+        return UnaryOperation(token, token.value, operand)
+
+    def _parenthesized(self, token):
+        self.advance()  # Skip '('
+        expr = self._expression()
+        self._eat(RPAREN)
+        return expr
+
+    def _number(self, token):
+        self.advance()
+        number = Number(token, token.value)
         
-        while self.current_token and self.current_token[0] in ('MULTIPLY', 'DIVIDE', 'MODULO'):
-            operator = self.current_token[1]
+        # Check for factorial operator
+        if self.kind == FACTORIAL:
             self.advance()
-            right = self._factor()
-            left = {'type': 'BinaryOperation', 'operator': operator, 'left': left, 'right': right}
+            return Factorial(token, number)
             
-        return left
+        return number
 
-    def _factor(self):
-        """Parse factors (numbers, identifiers, function calls, parentheses, unary operations)"""
-        token_type, token_value = self.current_token
-        
-        # Handle unary operators (negative numbers)
-        if token_type == 'MINUS' or token_type == 'NOT' or token_type == 'ተቃራኒ':
-            operator = token_value
-            self.advance()
-            operand = self._factor()  # Recursively parse the operand
-            return {
-                'type': 'UnaryOperation',
-                'operator': operator,
-                'operand': operand
-            }
+    def _string(self, token):
+        self.advance()
+        return String(token, token.value)
+
+    def _boolean(self, token):
+        self.advance()
+        return Boolean(token, token.value)
+
+    def _name(self, token):
+        """Handle identifiers (variables, function calls, spit/አውጣ calls)"""
+        kind = self.kind
+        self.advance()
         
-        # Handle parentheses
-        elif self.current_token and self.current_token[0] == 'LPAREN':
-            self._eat('LPAREN')
-            expr = self._expression()
-            self._eat('RPAREN')
-            return expr
-
-        # Handle numbers
-        elif self.current_token and self.current_token[0] == 'NUMBER':
-            value = self.current_token[1]
-            self._eat('NUMBER')
-            
-            # Check for factorial operator
-            if self.current_token and self.current_token[0] == 'FACTORIAL':
-                self._eat('FACTORIAL')
-                return {'type': 'Factorial', 'value': {'type': 'Number', 'value': value}}
-                
-            return {'type': 'Number', 'value': value}
-            
-        # Handle string literals
-        elif self.current_token and self.current_token[0] == 'STRING':
-            value = self.current_token[1]
-            self._eat('STRING')
-            return {'type': 'String', 'value': value}
-
-        # Handle identifiers (variables, function calls)
-        elif self.current_token and self.current_token[0] == 'IDENTIFIER' or self.current_token and self.current_token[0] == 'SPIT' or self.current_token and self.current_token[0] == 'PRINT':
-            identifier = self.current_token[1]
-            token_type = self.current_token[0]
-            self.advance()
+        # Check if this is a function call
+        if self.kind == LPAREN:
+            self.advance()  # Skip '('
+            arguments = []
             
-            # Check if this is a function call
-            if self.current_token and self.current_token[0] == 'LPAREN':
-                self.advance()  # Skip '('
-                arguments = []
+            # Parse arguments
+            if self.current_token and self.kind != RPAREN:
+                arguments.append(self._expression())
                 
-                # Parse arguments
-                if self.current_token and self.current_token[0] != 'RPAREN':
+                while self.kind == COMMA:
+                    self.advance()  # Skip ','
                     arguments.append(self._expression())
-                    
-                    while self.current_token and self.current_token[0] == 'COMMA':
-                        self.advance()  # Skip ','
-                        arguments.append(self._expression())
+            
+            return self._call(token, kind, arguments)
                 
-                if self.current_token and self.current_token[0] == 'RPAREN':
-                    self.advance()  # Skip ')'
-                    
-                    # Special handling for spit function and Amharic print function
-                    if token_type == 'SPIT' or token_type == 'PRINT':
-                        return {'type': 'SpitFunction', 'arguments': arguments}
-                    else:
-                        return {'type': 'FunctionCall', 'name': identifier, 'arguments': arguments}
-                else:
-                    raise Exception("Expected ')' after function arguments")
-                    
-            # Check for factorial operator after identifier
-            if self.current_token and self.current_token[0] == 'FACTORIAL':
-                self.advance()  # Skip '!'
-                return {'type': 'Factorial', 'value': {'type': 'Identifier', 'value': identifier}}
+        return self._identifier(token)
+
+    def _call(self, token, kind, arguments):
+        """Finish a call once its arguments are parsed; expects the ')'."""
+        if self.kind == RPAREN:
+            self.advance()  # Skip ')'
             
-            return {'type': 'Identifier', 'value': identifier}
+            # Special handling for spit function and Amharic print function
+            if kind == SPIT or kind == PRINT:
+                return SpitFunction(token, arguments)
+            else:
+                return FunctionCall(token, token.value, arguments)
         else:
-            raise Exception(f"Unexpected token: {self.current_token}")
\ No newline at end of file
+            raise self._error("Expected ')' after function arguments")
+
+    def _identifier(self, token):
+        """Finish an identifier whose token was just consumed."""
+        identifier = Identifier(token, token.value)
+        
+        # Check for factorial operator after identifier
+        if self.kind == FACTORIAL:
+            self.advance()  # Skip '!'
+            return Factorial(token, identifier)
+        
+        return identifier
+
+    # Prefix parsers: token kind -> method parsing the factor it starts
+    _PREFIX_PARSERS = {
+        MINUS: _unary,
+        NOT: _unary,
+        LPAREN: _parenthesized,
+        NUMBER: _number,
+        STRING: _string,
+        TRUE_LITERAL: _boolean,
+        FALSE_LITERAL: _boolean,
+        IDENTIFIER: _name,
+        SPIT: _name,
+        PRINT: _name,
+    }
+
+    def _iterative_expression(self):
+        """Parse an expression without recursing into nested expressions.
+
+        Produces the same tree (and errors) as _expression(). Operands and
+        pending binary operators are kept on explicit stacks (shunting
+        yard), and each open parenthesis or argument list saves the stacks
+        of the level around it, so nesting depth is limited by memory only.
+        """
+        operators = self._BINARY_OPERATORS
+        levels = []  # (opening token, call kind or None, arguments, saved stacks)
+        operands = []
+        pending = []  # (precedence, node class, operator token)
+        prefixes = []  # Unary operator tokens waiting for their operand
+        while True:
+            token = self.current_token
+            kind = self.kind
+            if kind == MINUS or kind == NOT:
+                prefixes.append(token)
+                self.advance()
+                continue
+            elif kind == LPAREN:
+                self.advance()  # Skip '('
+                levels.append((token, None, None, (operands, pending, prefixes)))
+                operands, pending, prefixes = [], [], []
+                continue
+            elif kind == NUMBER:
+                node = self._number(token)
+            elif kind == STRING:
+                node = self._string(token)
+            elif kind == TRUE_LITERAL or kind == FALSE_LITERAL:
+                node = self._boolean(token)
+            elif kind == IDENTIFIER or kind == SPIT or kind == PRINT:
+                self.advance()
+                if self.kind != LPAREN:
+                    node = self._identifier(token)
+                else:
+                    self.advance()  # Skip '('
+                    if self.current_token and self.kind != RPAREN:
+                        levels.append((token, kind, [], (operands, pending, prefixes)))
+                        operands, pending, prefixes = [], [], []
+                        continue
+                    node = self._call(token, kind, [])
+            else:
+                raise self._factor_error()
+
+            # node is a complete operand: apply its unary operators, then
+            # either continue with a binary operator or close the level
+            while True:
+                while prefixes:
+                    prefix = prefixes.pop()
+                    node = UnaryOperation(prefix, prefix.value, node)
+                operands.append(node)
+
+                entry = operators.get(self.kind)
+                if entry is not None:
+                    precedence = entry[0]
+                    while pending and pending[-1][0] >= precedence:
+                        self._reduce(operands, pending)
+                    pending.append((precedence, entry[1], self.current_token))
+                    self.advance()
+                    break
+                while pending:
+                    self._reduce(operands, pending)
+                node = operands.pop()
+                if not levels:
+                    return node
+
+                token, kind, arguments, saved = levels[-1]
+                if arguments is None:
+                    self._eat(RPAREN)
+                elif self.kind == COMMA:
+                    self.advance()  # Skip ','
+                    arguments.append(node)
+                    break
+                else:
+                    arguments.append(node)
+                    node = self._call(token, kind, arguments)
+                levels.pop()
+                operands, pending, prefixes = saved
+
+    def _reduce(self, operands, pending):
+        """Replace the top two operands with the pending operator applied to them."""
+        _, node_class, operator_token = pending.pop()
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(node_class(operator_token, operator_token.value, left, right))
+
@@ -3,6 +3,13 @@ Transpiler module for converting our custom language AST to Python code.
 This allows our custom language to be executed as Python.
 """
 
+from src.parser.nodes import (
+    Node, NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION, IF_STATEMENT,
+    WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT, BOOLEAN, CONSTANT,
+    TRUE_WORDS,
+)
+
 class Transpiler:
     def __init__(self):
         self.indent_level = 0
@@ -12,113 +19,129 @@ class Transpiler:
         return "    " * self.indent_level
     
     def transpile(self, ast):
-        """Convert an AST to Python code"""
-        if isinstance(ast, list):
-            return '\n'.join(self._transpile_node(node) for node in ast)
-        else:
+        """Convert an AST to Python code.
+
+        ast is a single node, or a sequence of top-level nodes such as a
+        parsed program or a FlatAST.
+        """
+        if isinstance(ast, Node):
             return self._transpile_node(ast)
+        else:
+            return '\n'.join(self._transpile_node(node) for node in ast)
     
     def _transpile_node(self, node):
         """Transpile a single AST node"""
-        if node['type'] == 'Number':
-            return node['value']
-        
-        elif node['type'] == 'String':
-            return f'"{node["value"]}"'
-        
-        elif node['type'] == 'Identifier':
-            return node['value']
-        
-        elif node['type'] == 'Assignment':
-            value = self._transpile_node(node['value'])
-            return f"{node['identifier']} = {value}"
-        
-        elif node['type'] == 'BinaryOperation':
-            left = self._transpile_node(node['left'])
-            right = self._transpile_node(node['right'])
-            return f"({left} {node['operator']} {right})"
-        
-        elif node['type'] == 'Comparison':
-            left = self._transpile_node(node['left'])
-            right = self._transpile_node(node['right'])
-            return f"({left} {node['operator']} {right})"
-        
-        elif node['type'] == 'LogicalOperation':
-            left = self._transpile_node(node['left'])
-            right = self._transpile_node(node['right'])
+        kind = node.kind
+        if kind == NUMBER:
+            return node.value
+        
+        elif kind == STRING:
+            return f'"{node.value}"'
+        
+        elif kind == IDENTIFIER:
+            return node.value
+        
+        elif kind == BOOLEAN:
+            return 'True' if node.value in TRUE_WORDS else 'False'
+        
+        elif kind == CONSTANT:
+            # Folded strings are written like string literals
+            if isinstance(node.value, str):
+                return f'"{node.value}"'
+            return repr(node.value)
+        
+        elif kind == ASSIGNMENT:
+            value = self._transpile_node(node.value)
+            return f"{node.identifier} = {value}"
+        
+        elif kind == BINARY_OPERATION:
+            left = self._transpile_node(node.left)
+            right = self._transpile_node(node.right)
+            return f"({left} {node.operator} {right})"
+        
+        elif kind == COMPARISON:
+            left = self._transpile_node(node.left)
+            right = self._transpile_node(node.right)
+            return f"({left} {node.operator} {right})"
+        
+        elif kind == LOGICAL_OPERATION:
+            left = self._transpile_node(node.left)
+            right = self._transpile_node(node.right)
             # Convert Amharic operators to Python
-            operator = node['operator']
+            operator = node.operator
             if operator == 'እና':
                 operator = 'and'
             elif operator == 'ወይም':
                 operator = 'or'
             return f"({left} {operator} {right})"
         
-        elif node['type'] == 'IfStatement':
-            condition = self._transpile_node(node['condition'])
+        elif kind == IF_STATEMENT:
+            condition = self._transpile_node(node.condition)
             result = f"if {condition}:\n"
             
             self.indent_level += 1
-            true_branch = self._transpile_node(node['true_branch'])
+            true_branch = self._transpile_node(node.true_branch)
             result += self._add_indentation(true_branch)
             self.indent_level -= 1
             
-            if node['false_branch']:
+            if node.false_branch:
                 result += "\nelse:\n"
                 self.indent_level += 1
-                false_branch = self._transpile_node(node['false_branch'])
+                false_branch = self._transpile_node(node.false_branch)
                 result += self._add_indentation(false_branch)
                 self.indent_level -= 1
             
             return result
         
-        elif node['type'] == 'WhileStatement':
-            condition = self._transpile_node(node['condition'])
+        elif kind == WHILE_STATEMENT:
+            condition = self._transpile_node(node.condition)
             result = f"while {condition}:\n"
             
             self.indent_level += 1
-            body = self._transpile_node(node['body'])
+            body = self._transpile_node(node.body)
             result += self._add_indentation(body)
             self.indent_level -= 1
             
             return result
         
-        elif node['type'] == 'Block':
+        elif kind == BLOCK:
+            if not node.statements:
+                return "pass"  # A body emptied by dead-code elimination
             statements = []
-            for statement in node['statements']:
+            for statement in node.statements:
                 statements.append(self._transpile_node(statement))
             return '\n'.join(statements)
         
-        elif node['type'] == 'FunctionDefinition':
-            params = ', '.join(node['parameters'])
-            result = f"def {node['name']}({params}):\n"
+        elif kind == FUNCTION_DEFINITION:
+            params = ', '.join(node.parameters)
+            result = f"def {node.name}({params}):\n"
             
             self.indent_level += 1
-            body = self._transpile_node(node['body'])
+            body = self._transpile_node(node.body)
             result += self._add_indentation(body)
             self.indent_level -= 1
             
             return result
         
-        elif node['type'] == 'FunctionCall':
-            args = ', '.join(self._transpile_node(arg) for arg in node['arguments'])
-            return f"{node['name']}({args})"
+        elif kind == FUNCTION_CALL:
+            args = ', '.join(self._transpile_node(arg) for arg in node.arguments)
+            return f"{node.name}({args})"
         
-        elif node['type'] == 'ReturnStatement':
-            value = self._transpile_node(node['value'])
+        elif kind == RETURN_STATEMENT:
+            value = self._transpile_node(node.value)
             return f"return {value}"
         
-        elif node['type'] == 'SpitFunction':
+        elif kind == SPIT_FUNCTION:
             # Convert spit() and አውጣ() to print()
-            args = ', '.join(self._transpile_node(arg) for arg in node['arguments'])
+            args = ', '.join(self._transpile_node(arg) for arg in node.arguments)
             return f"print({args})"
         
-        elif node['type'] == 'Factorial':
-            value = self._transpile_node(node['value'])
+        elif kind == FACTORIAL:
+            value = self._transpile_node(node.value)
             return f"math.factorial({value})"
         
         else:
-            raise Exception(f"Unknown node type for transpilation: {node['type']}")
+            raise Exception(f"Unknown node type for transpilation: {node.type}")
     
     def _add_indentation(self, code):
         """Add proper indentation to code"""
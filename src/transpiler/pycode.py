@@ -0,0 +1,393 @@
+"""
+Compile programs to Python code objects and run them in-process.
+
+PythonCompiler builds a Python ast.Module directly from our AST, with the
+same Python semantics as the code Transpiler writes out, and compile()s it
+to a code object. run() executes a code object in a fresh namespace whose
+builtins also hold math and spit, so a program runs at CPython speed with
+no generated source text and no separate python process.
+
+Every Python node carries the line and column of the node it was built
+from, so a runtime error is raised as InterpreterError located in the
+program's source, like the interpreters' errors.
+
+compile_file() keeps compiled code in memory and on disk, next to the
+parse cache in __amhpycache__. A code cache file holds a small header
+(magic, language and compiler versions, flags, the Python bytecode magic
+number and the source digest) followed by the marshalled code object.
+"""
+
+import os
+import sys
+import math
+import struct
+import marshal
+import builtins
+import importlib.util
+import ast as pyast
+
+from src.lexer.tokens import SourceError
+from src.parser.nodes import (
+    NUMBER, STRING, IDENTIFIER, ASSIGNMENT, BINARY_OPERATION, COMPARISON,
+    LOGICAL_OPERATION, UNARY_OPERATION, FACTORIAL, FUNCTION_CALL, SPIT_FUNCTION,
+    IF_STATEMENT, WHILE_STATEMENT, BLOCK, FUNCTION_DEFINITION, RETURN_STATEMENT,
+    BOOLEAN, CONSTANT, TRUE_WORDS,
+)
+from src.parser.cache import (
+    CACHE_DIRECTORY, LANGUAGE_VERSION, source_digest, parse_file,
+)
+from src.optimizer import Optimizer
+from src.interpreter import InterpreterError
+
+# Bump whenever PythonCompiler generates different code for the same AST
+COMPILER_VERSION = 1
+
+MAGIC = b'AMHP'
+HEADER = struct.Struct('=4sIII4s16s')
+
+# Header flags
+_LAYOUT = 1
+_OPTIMIZED = 2
+
+_BINARY_OPERATORS = {
+    '+': pyast.Add,
+    '-': pyast.Sub,
+    '*': pyast.Mult,
+    '/': pyast.Div,
+    '%': pyast.Mod,
+}
+
+_COMPARISON_OPERATORS = {
+    '==': pyast.Eq,
+    '!=': pyast.NotEq,
+    '<': pyast.Lt,
+    '<=': pyast.LtE,
+    '>': pyast.Gt,
+    '>=': pyast.GtE,
+}
+
+_LOGICAL_OPERATORS = {
+    'and': pyast.And,
+    'እና': pyast.And,
+    'or': pyast.Or,
+    'ወይም': pyast.Or,
+}
+
+_UNARY_OPERATORS = {
+    '-': pyast.USub,
+    'not': pyast.Not,
+    'ተቃራኒ': pyast.Not,
+}
+
+# Python 3.12 added type parameters to function definitions
+_FUNCTION_FIELDS = {'type_params': []} if 'type_params' in pyast.FunctionDef._fields else {}
+
+
+class CompileError(SourceError):
+    """Raised when a program cannot be compiled to Python code."""
+
+
+def spit(*values):
+    """The spit builtin: print the values separated by spaces."""
+    print(' '.join([str(value) for value in values]))
+
+
+class PythonCompiler:
+    """Build Python ASTs and code objects from our AST.
+
+    >>> code = PythonCompiler().compile(Parser(Lexer("x = 2 * 3 + 1").tokenize()).parse())
+    >>> run(code)['x']
+    7
+    """
+
+    def __init__(self, filename='<program>'):
+        self.filename = filename
+        self.function_depth = 0
+
+    def compile(self, ast):
+        """Compile a sequence of top-level nodes to a code object."""
+        module = self.module(ast)
+        try:
+            return compile(module, self.filename, 'exec')
+        except SyntaxError as error:
+            # For example a function with two parameters of the same name
+            raise CompileError(error.msg, error.lineno, error.offset) from None
+        except ValueError as error:
+            # Names Python reserves, such as None
+            raise CompileError(str(error)) from None
+
+    def module(self, ast):
+        """Return the ast.Module for a sequence of top-level nodes."""
+        module = pyast.Module(body=self._statements(ast), type_ignores=[])
+        return pyast.fix_missing_locations(module)
+
+    def _statements(self, nodes):
+        body = []
+        for node in nodes:
+            if node.kind == BLOCK:
+                body.extend(self._statements(node.statements))
+            else:
+                body.append(self._statement(node))
+        return body
+
+    def _body(self, node):
+        return self._statements([node]) or [pyast.Pass()]
+
+    def _statement(self, node):
+        kind = node.kind
+        if kind == ASSIGNMENT:
+            target = pyast.Name(id=node.identifier, ctx=pyast.Store())
+            result = pyast.Assign(targets=[self._locate(target, node)],
+                                  value=self._expression(node.value))
+
+        elif kind == IF_STATEMENT:
+            orelse = self._body(node.false_branch) if node.false_branch else []
+            result = pyast.If(test=self._expression(node.condition),
+                              body=self._body(node.true_branch), orelse=orelse)
+
+        elif kind == WHILE_STATEMENT:
+            result = pyast.While(test=self._expression(node.condition),
+                                 body=self._body(node.body), orelse=[])
+
+        elif kind == FUNCTION_DEFINITION:
+            arguments = pyast.arguments(
+                posonlyargs=[], args=[pyast.arg(arg=name) for name in node.parameters],
+                vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+            self.function_depth += 1
+            try:
+                body = self._body(node.body)
+            finally:
+                self.function_depth -= 1
+            result = pyast.FunctionDef(name=node.name, args=arguments, body=body,
+                                       decorator_list=[], returns=None, **_FUNCTION_FIELDS)
+
+        elif kind == RETURN_STATEMENT:
+            if not self.function_depth:
+                # Python has no top-level return, as for transpiled code
+                raise CompileError("'return' outside function", node.line, node.column)
+            result = pyast.Return(value=self._expression(node.value))
+
+        else:
+            result = pyast.Expr(value=self._expression(node))
+        return self._locate(result, node)
+
+    def _expression(self, node):
+        kind = node.kind
+        if kind == NUMBER:
+            try:
+                result = pyast.Constant(value=int(node.value))
+            except ValueError as error:
+                # Digits int() does not accept, such as superscripts
+                raise CompileError(str(error), node.line, node.column) from None
+
+        elif kind == STRING or kind == CONSTANT:
+            result = pyast.Constant(value=node.value)
+
+        elif kind == BOOLEAN:
+            result = pyast.Constant(value=node.value in TRUE_WORDS)
+
+        elif kind == IDENTIFIER:
+            result = pyast.Name(id=node.value, ctx=pyast.Load())
+
+        elif kind == BINARY_OPERATION:
+            result = pyast.BinOp(left=self._expression(node.left),
+                                 op=self._operator(_BINARY_OPERATORS, node),
+                                 right=self._expression(node.right))
+
+        elif kind == COMPARISON:
+            result = pyast.Compare(left=self._expression(node.left),
+                                   ops=[self._operator(_COMPARISON_OPERATORS, node)],
+                                   comparators=[self._expression(node.right)])
+
+        elif kind == LOGICAL_OPERATION:
+            result = pyast.BoolOp(op=self._operator(_LOGICAL_OPERATORS, node),
+                                  values=[self._expression(node.left),
+                                          self._expression(node.right)])
+
+        elif kind == UNARY_OPERATION:
+            result = pyast.UnaryOp(op=self._operator(_UNARY_OPERATORS, node),
+                                   operand=self._expression(node.operand))
+
+        elif kind == FACTORIAL:
+            function = pyast.Attribute(value=self._locate(pyast.Name(id='math', ctx=pyast.Load()), node),
+                                       attr='factorial', ctx=pyast.Load())
+            result = pyast.Call(func=self._locate(function, node),
+                                args=[self._expression(node.value)], keywords=[])
+
+        elif kind == FUNCTION_CALL or kind == SPIT_FUNCTION:
+            name = node.name if kind == FUNCTION_CALL else 'spit'
+            function = self._locate(pyast.Name(id=name, ctx=pyast.Load()), node)
+            result = pyast.Call(func=function, keywords=[],
+                                args=[self._expression(argument) for argument in node.arguments])
+
+        else:
+            raise CompileError(f"Unknown node type for compilation: {node.type}",
+                               getattr(node, 'line', None), getattr(node, 'column', None))
+        return self._locate(result, node)
+
+    def _operator(self, operators, node):
+        try:
+            return operators[node.operator]()
+        except KeyError:
+            raise CompileError(f"Unknown operator: {node.operator}",
+                               node.line, node.column) from None
+
+    def _locate(self, result, node):
+        """Give a Python node the location of the node it was built from."""
+        line = getattr(node, 'line', None)
+        if line is not None:
+            # Python columns are 0-based; the end is only used for caret
+            # ranges in tracebacks
+            result.lineno = result.end_lineno = line
+            result.col_offset = result.end_col_offset = (node.column or 1) - 1
+        return result
+
+
+def namespace():
+    """Return fresh globals for running a program, with math and spit builtins."""
+    return {'__name__': '__main__',
+            '__builtins__': {**vars(builtins), 'math': math, 'spit': spit}}
+
+
+def run(code, globals=None):
+    """Execute a code object and return its globals.
+
+    Runtime errors are raised as InterpreterError located at the program
+    node that failed, when it is known.
+    """
+    if globals is None:
+        globals = namespace()
+    try:
+        exec(code, globals)
+    except SourceError:
+        raise
+    except Exception as error:
+        line, column = _error_location(error.__traceback__, code.co_filename)
+        raise InterpreterError(str(error), line, column) from error
+    return globals
+
+
+def _error_location(traceback, filename):
+    """Line and column of the innermost program frame in a traceback."""
+    line = column = None
+    while traceback is not None:
+        frame_code = traceback.tb_frame.f_code
+        if frame_code.co_filename == filename:
+            line, column = traceback.tb_lineno, None
+            if hasattr(frame_code, 'co_positions'):
+                positions = list(frame_code.co_positions())
+                index = traceback.tb_lasti // 2
+                if 0 <= index < len(positions) and positions[index][2] is not None:
+                    line = positions[index][0]
+                    column = positions[index][2] + 1
+        traceback = traceback.tb_next
+    return line, column
+
+
+def program_variables(globals):
+    """The variables a program assigned at top level, in assignment order."""
+    return {name: value for name, value in globals.items()
+            if not name.startswith('__') and not callable(value)}
+
+
+def code_cache_path(path, layout=True, optimize=True):
+    """Path of the compiled code cache file for the source file at path."""
+    directory, name = os.path.split(path)
+    mode = ('' if layout else '-semicolons') + ('' if optimize else '-unoptimized')
+    return os.path.join(directory, CACHE_DIRECTORY,
+                        f"{name}.amhpy{LANGUAGE_VERSION}{mode}.{sys.implementation.cache_tag}.pyc")
+
+
+def _flags(layout, optimize):
+    return (_LAYOUT if layout else 0) | (_OPTIMIZED if optimize else 0)
+
+
+def dump_code(code, digest, layout=True, optimize=True):
+    """Serialize a code object to bytes."""
+    return HEADER.pack(MAGIC, LANGUAGE_VERSION, COMPILER_VERSION, _flags(layout, optimize),
+                       importlib.util.MAGIC_NUMBER, digest) + marshal.dumps(code)
+
+
+def load_code(data, digest, layout=True, optimize=True):
+    """Decode a serialized code object, or return None if it does not match.
+
+    Returns None if data was written for other source bytes, flags,
+    versions or another Python bytecode format, or cannot be unmarshalled.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version, compiler, flags, python, stored_digest = HEADER.unpack_from(data)
+    if (magic != MAGIC or version != LANGUAGE_VERSION or compiler != COMPILER_VERSION or
+            flags != _flags(layout, optimize) or python != importlib.util.MAGIC_NUMBER or
+            stored_digest != digest):
+        return None
+    try:
+        return marshal.loads(data[HEADER.size:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def read_code_cache(path, digest, layout=True, optimize=True):
+    """Load the cached code of the source file at path, if it is fresh."""
+    try:
+        with open(code_cache_path(path, layout, optimize), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return load_code(data, digest, layout, optimize)
+
+
+def write_code_cache(path, digest, code, layout=True, optimize=True):
+    """Store the compiled code of the source file at path; returns True on success.
+
+    Written under a temporary name and renamed into place, like the parse
+    cache.
+    """
+    target = code_cache_path(path, layout, optimize)
+    temporary = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(temporary, 'wb') as f:
+            f.write(dump_code(code, digest, layout, optimize))
+        os.replace(temporary, target)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+# (absolute path, digest, flags) -> code object, for programs compiled
+# earlier in this process
+_compiled = {}
+
+
+def compile_file(path, layout=True, mapped=False, use_cache=True, optimize=True):
+    """Return the code object of the source file at path.
+
+    The code is taken from memory or from the code cache when it was
+    compiled from the same source bytes with the same flags; otherwise the
+    file is parsed (through the parse cache), optimized unless optimize is
+    False, and compiled, and the caches are updated. Raises the errors
+    parse_file() raises, and CompileError.
+    """
+    with open(path, 'rb') as f:
+        digest = source_digest(f.read())
+    key = (os.path.abspath(path), digest, _flags(layout, optimize))
+    if use_cache:
+        code = _compiled.get(key)
+        if code is None:
+            code = read_code_cache(path, digest, layout, optimize)
+        if code is not None:
+            _compiled[key] = code
+            return code
+    ast = parse_file(path, layout=layout, mapped=mapped, use_cache=use_cache)
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    code = PythonCompiler(path).compile(ast)
+    if use_cache:
+        write_code_cache(path, digest, code, layout, optimize)
+        _compiled[key] = code
+    return code
@@ -0,0 +1,89 @@
+import io
+import sys
+import os
+import unittest
+import contextlib
+from array import array
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+from src.optimizer import Optimizer
+from src.interpreter import Interpreter
+from src.bytecode.vm import VirtualMachine
+
+class TestBytecode(unittest.TestCase):
+    def _parse(self, source_code):
+        return Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+
+    def _run(self, engine, ast):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            results = [engine.evaluate(node) for node in ast]
+        return results, list(engine.variables.items()), output.getvalue()
+
+    def test_compiled_code(self):
+        vm = VirtualMachine()
+        code = vm.compile(self._parse("x = y * 2 + 1")[0])
+        self.assertIsInstance(code.code, array)
+        self.assertEqual(code.code.typecode, 'i')
+        self.assertEqual(code.disassemble(vm.compiler.names), [
+            "   0 LOAD                 0 (y)",
+            "   2 MULTIPLY_CONSTANT    0 (2)",
+            "   4 ADD_CONSTANT         1 (1)",
+            "   6 STORE_GLOBAL         1 (x)",
+            "   8 END                  0",
+        ])
+
+    def test_same_results_as_interpreter(self):
+        source_code = """
+def fact(n):
+    if n <= 1: return 1
+    return n * fact(n - 1)
+def count(limit):
+    i = 0
+    total = 0
+    while i < limit:
+        total = total + i % 3
+        i = i + 1
+    return total
+x = fact(6) + 5!
+y = count(600)
+ስም = "ሰላም"
+አውጣ(x, ስም, not false, 7 / 2)
+spit(y > 100 and "big" or "small")
+if x > 1: return x
+"""
+        ast = self._parse(source_code)
+        for program in (ast, Optimizer().optimize(ast)):
+            expected = self._run(Interpreter(), program)
+            self.assertEqual(self._run(VirtualMachine(), program), expected)
+        self.assertEqual(expected[0][-1], {'type': 'return', 'value': 840})
+        # Loops run to the end: 0 + 1 + 2 for each of 200 full rounds
+        self.assertIn(('y', 600), expected[1])
+
+    def test_deep_recursion(self):
+        # Calls do not recurse in Python, so the depth is only bounded by
+        # max_depth
+        ast = self._parse("def down(n):\n    if n == 0: return 0\n    return down(n - 1) + 1\nx = down(20000)")
+        vm = VirtualMachine(max_depth=100000)
+        self._run(vm, ast)
+        self.assertEqual(vm.variables['x'], 20000)
+
+        with self.assertRaises(Exception) as context:
+            self._run(VirtualMachine(max_depth=100), ast)
+        self.assertIn("maximum recursion depth exceeded", str(context.exception))
+
+    def test_error_location(self):
+        ast = self._parse("def f(a):\n    return a / (a - 2)\nx = f(4)\ny = f(2)")
+        vm = VirtualMachine()
+        with self.assertRaises(Exception) as context:
+            self._run(vm, ast)
+        self.assertIn("Division by zero", str(context.exception))
+        self.assertEqual((context.exception.line, context.exception.column), (2, 14))
+        self.assertEqual(vm.variables, {'x': 2.0})
+
+if __name__ == '__main__':
+    unittest.main()
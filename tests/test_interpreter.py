@@ -7,16 +7,23 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.lexer.lexer import Lexer
 from src.parser.parser import Parser
-from src.interpreter import Interpreter
+from src.parser.flat import FlatAST
+from src.interpreter import Interpreter, InterpreterError
+from src.interpreter.closures import ClosureInterpreter
+from src.interpreter.resolver import resolve
+from src.interpreter.budget import Budget, BudgetExceeded
+from src.bytecode.vm import VirtualMachine
 
 class TestInterpreter(unittest.TestCase):
+    interpreter_class = Interpreter
+
     def _interpret(self, source_code, initial_vars=None):
         lexer = Lexer(source_code)
         tokens = lexer.tokenize()
         parser = Parser(tokens)
         ast = parser.parse()
         
-        interpreter = Interpreter()
+        interpreter = self.interpreter_class()
         if initial_vars:
             interpreter.variables = initial_vars
         
@@ -60,6 +67,10 @@ class TestInterpreter(unittest.TestCase):
         self.assertEqual(variables['sum'], 15)
         self.assertEqual(variables['i'], 6)
     
+    def test_boolean_literals(self):
+        results, variables = self._interpret("x = true y = not እውነት z = false or 3")
+        self.assertEqual((variables['x'], variables['y'], variables['z']), (True, False, 3))
+    
     def test_simple_function(self):
         source_code = "def add(a, b): return a + b result = add(2, 3)"
         results, variables = self._interpret(source_code)
@@ -89,5 +100,141 @@ class TestInterpreter(unittest.TestCase):
         results, variables = self._interpret(source_code)
         self.assertEqual(variables['result'], 15)
 
+    def test_scoping(self):
+        source_code = (
+            "x = 1\n"
+            "def show(): return x + y\n"
+            "def call(y):\n"
+            "    x = 10\n"
+            "    return show()\n"
+            "def count(n):\n"
+            "    x = n\n"
+            "    if n > 0: return count(n - 1) + x\n"
+            "    return 0\n"
+            "def make(k):\n"
+            "    def twice(): return k * 2\n"
+            "    return twice()\n"
+            "a = call(5)\n"
+            "b = count(3)\n"
+            "c = make(4)\n")
+        ast = Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+        # Parameters come first in a function's slots, then its assignments
+        self.assertEqual(resolve(ast[2]).names, ['y', 'x'])
+        interpreter = self.interpreter_class()
+        for node in ast:
+            interpreter.evaluate(node)
+
+        # show() sees x from its definition and y from its caller; calls
+        # never change the caller's variables
+        self.assertEqual(interpreter.variables, {'x': 1, 'a': 6, 'b': 6, 'c': 8})
+
+    def test_call_stack(self):
+        source_code = (
+            "def inner(a):\n"
+            "    t = a * 2\n"
+            "    return t / 0\n"
+            "def outer(b): return inner(b + 1)\n"
+            "x = outer(1)\n")
+        ast = Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+        interpreter = self.interpreter_class()
+        with self.assertRaises(InterpreterError) as context:
+            for node in ast:
+                interpreter.evaluate(node)
+        
+        # The error records the calls it happened in, with their arguments,
+        # locals and call sites; the stack itself has been unwound
+        outer, inner = context.exception.call_stack
+        self.assertEqual((outer.function.name, outer.arguments, outer.locals()), ('outer', [1], {'b': 1}))
+        self.assertEqual(inner.locals(), {'a': 2, 't': 4})
+        self.assertEqual(str(inner), "inner(2), called at line 4, column 22")
+        self.assertEqual(interpreter.call_stack, [])
+        self.assertIsNone(interpreter.frame)
+
+    def test_budget(self):
+        source_code = (
+            "i = 0\n"
+            "while i < 5000: i = i + 1\n"
+            "def down(n): return 1 + down(n - 1)\n"
+            "down(1)\n")
+        ast = Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+
+        # Without a budget loops run until they end
+        interpreter = self.interpreter_class()
+        for node in ast[:2]:
+            interpreter.evaluate(node)
+        self.assertEqual(interpreter.variables['i'], 5000)
+
+        interpreter = self.interpreter_class(budget=Budget(steps=100))
+        with self.assertRaises(BudgetExceeded) as context:
+            for node in ast[:2]:
+                interpreter.evaluate(node)
+        self.assertEqual(context.exception.limit, 'steps')
+        self.assertEqual((context.exception.line, context.exception.column), (2, 1))
+        self.assertEqual(interpreter.variables['i'], 101)
+
+        interpreter = self.interpreter_class(budget=Budget(max_depth=10))
+        with self.assertRaises(BudgetExceeded) as context:
+            for node in ast[2:]:
+                interpreter.evaluate(node)
+        self.assertEqual((context.exception.limit, context.exception.value), ('depth', 10))
+        self.assertEqual(context.exception.line, 3)
+
+        interpreter = self.interpreter_class(budget=Budget(seconds=0))
+        with self.assertRaises(BudgetExceeded) as context:
+            interpreter.evaluate(Parser(Lexer("while true: x = 1").tokenize()).parse()[0])
+        self.assertEqual(context.exception.limit, 'time')
+
+    def test_error_location(self):
+        with self.assertRaises(Exception) as context:
+            self._interpret("x = 1\ny = x + missing")
+        
+        self.assertIn("Undefined variable: missing", str(context.exception))
+        self.assertEqual((context.exception.line, context.exception.column), (2, 9))
+
+    def test_flat_ast(self):
+        source_code = "def factorial(n): if n <= 1: return 1 else: return n * factorial(n - 1) result = factorial(5) y = result + missing"
+        flat = FlatAST.from_ast(Parser(Lexer(source_code).tokenize()).parse())
+        interpreter = self.interpreter_class()
+        with self.assertRaises(Exception) as context:
+            for node in flat:
+                interpreter.evaluate(node)
+        
+        self.assertEqual(interpreter.variables['result'], 120)
+        self.assertIn("Undefined variable: missing", str(context.exception))
+        self.assertEqual((context.exception.line, context.exception.column), (1, 108))
+
+class TestClosureInterpreter(TestInterpreter):
+    """Runs every interpreter test on the closure-compiling engine."""
+
+    interpreter_class = ClosureInterpreter
+
+    def test_same_results(self):
+        source_code = """
+        def sign(n): if n < 0: return -1 else: return 1
+        x = sign(-4) * 10 % 7
+        spit(x)
+        if x: return x + 1
+        """
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        results = []
+        for engine in (Interpreter(), ClosureInterpreter()):
+            results.append(([engine.evaluate(node) for node in ast], engine.variables))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0][-1], {'type': 'return', 'value': 5})
+
+        # Function bodies are compiled once, when they are defined
+        interpreter = ClosureInterpreter()
+        interpreter.evaluate(ast[0])
+        self.assertTrue(callable(interpreter.functions['sign'].code))
+
+class TestBytecodeInterpreter(TestInterpreter):
+    """Runs every interpreter test on the bytecode VM."""
+
+    interpreter_class = VirtualMachine
+
+    @unittest.skip("The VM keeps its call frames internal")
+    def test_call_stack(self):
+        pass
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,11 +1,16 @@
+import io
 import sys
 import os
+import tempfile
 import unittest
 
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.lexer.lexer import Lexer
+from src.lexer.mapped import MappedLexer
+from src.lexer.incremental import IncrementalLexer
+from src.lexer import tokens as token_kinds
 
 class TestLexer(unittest.TestCase):
     def test_arithmetic_operators(self):
@@ -185,5 +190,215 @@ class TestLexer(unittest.TestCase):
         
         self.assertEqual(tokens, expected_tokens)
 
+    def test_keyword_prefix_is_identifier(self):
+        # Keywords only match on a word boundary
+        source_code = "iffy ከሆነው ifx"
+        lexer = Lexer(source_code)
+        tokens = lexer.tokenize()
+        
+        expected_tokens = [
+            ('IDENTIFIER', 'iffy'),
+            ('IDENTIFIER', 'ከሆነው'),
+            ('IDENTIFIER', 'ifx')
+        ]
+        
+        self.assertEqual(tokens, expected_tokens)
+    
+    def test_amharic_while_spellings(self):
+        # Both the space and underscore spellings of እስከሆነ ድረስ are keywords
+        source_code = "እስከሆነ ድረስ እስከሆነ_ድረስ እስከሆነ ድረስው"
+        lexer = Lexer(source_code)
+        tokens = lexer.tokenize()
+        
+        expected_tokens = [
+            ('WHILE', 'እስከሆነ ድረስ'),
+            ('WHILE', 'እስከሆነ_ድረስ'),
+            ('IDENTIFIER', 'እስከሆነ'),
+            ('IDENTIFIER', 'ድረስው')
+        ]
+        
+        self.assertEqual(tokens, expected_tokens)
+
+    def test_backends_produce_same_tokens(self):
+        # The regex backend must match the original scanner token for token
+        examples_dir = os.path.join(os.path.dirname(__file__), '..', 'examples')
+        sources = [
+            "x = 10 # comment\ny = x! != 3",
+            "s = 'single' + \"double\" $ ²3 ፩ ሀ12 12ሀ",
+            "እስከሆነ ድረስ x: x ይሁን x - 1 # trailing comment",
+        ]
+        for name in sorted(os.listdir(examples_dir)):
+            if name.endswith('.lang'):
+                with open(os.path.join(examples_dir, name), 'r') as f:
+                    sources.append(f.read())
+        
+        for source_code in sources:
+            regex_tokens = Lexer(source_code, backend='regex').tokenize()
+            scanner_tokens = Lexer(source_code, backend='scanner').tokenize()
+            self.assertEqual(regex_tokens, scanner_tokens)
+    
+    def test_unterminated_string(self):
+        for backend in Lexer.BACKENDS:
+            with self.assertRaises(Exception):
+                Lexer('x = "open', backend=backend).tokenize()
+
+    def test_iter_tokens_across_chunk_boundaries(self):
+        source_code = 'እስከሆነ ድረስ ቁጥር <= 10: ስም = "ሰላም ዓለም"; ቁጥር = ቁጥር + 1 # done'
+        expected_tokens = Lexer(source_code).tokenize()
+        
+        # Split the source at every position, including inside the
+        # multi-word keyword, the string and the Ethiopic identifiers
+        for cut in range(len(source_code) + 1):
+            chunks = [source_code[:cut], source_code[cut:]]
+            tokens = list(Lexer(chunks).iter_tokens())
+            self.assertEqual(tokens, expected_tokens)
+    
+    def test_iter_tokens_from_file_object(self):
+        source_code = "x = 1\n" * 1000 + "spit(x)"
+        lexer = Lexer(io.StringIO(source_code))
+        lexer.CHUNK_SIZE = 7
+        
+        tokens = list(lexer.iter_tokens())
+        
+        self.assertEqual(tokens, Lexer(source_code).tokenize())
+
+    def test_token_positions(self):
+        source_code = "x = 1\n  ስም = \"a\nb\" # note\ny"
+        for backend in Lexer.BACKENDS:
+            tokens = Lexer(source_code, backend=backend).tokenize()
+            spans = [(token.kind, token.start, token.end, token.line, token.column) for token in tokens]
+            
+            self.assertEqual(spans, [
+                (token_kinds.IDENTIFIER, 0, 1, 1, 1),
+                (token_kinds.ASSIGN, 2, 3, 1, 3),
+                (token_kinds.NUMBER, 4, 5, 1, 5),
+                (token_kinds.IDENTIFIER, 8, 10, 2, 3),
+                (token_kinds.ASSIGN, 11, 12, 2, 6),
+                (token_kinds.STRING, 13, 18, 2, 8),
+                (token_kinds.IDENTIFIER, 26, 27, 4, 1),
+            ])
+    
+    def test_unterminated_string_location(self):
+        for backend in Lexer.BACKENDS:
+            with self.assertRaises(Exception) as context:
+                Lexer('x = 1\ny = "open', backend=backend).tokenize()
+            self.assertEqual((context.exception.line, context.exception.column), (2, 5))
+
+    def test_shared_tokens(self):
+        source_code = "ቁጥር = 1; ቁጥር = ቁጥር + 1; if ቁጥር > 1: spit(ቁጥር)"
+        expected_tokens = Lexer(source_code).tokenize()
+        for backend in Lexer.BACKENDS:
+            tokens = Lexer(source_code, backend=backend, positions=False).tokenize()
+            self.assertEqual(tokens, expected_tokens)
+            
+            # Every occurrence of a name or operator is the same object
+            names = [token for token in tokens if token.kind == token_kinds.IDENTIFIER]
+            self.assertEqual(len(set(map(id, names))), 1)
+            assigns = [token for token in tokens if token.kind == token_kinds.ASSIGN]
+            self.assertIs(assigns[0], assigns[1])
+            self.assertIsNone(tokens[0].line)
+        
+        streamed = list(Lexer(source_code, positions=False).iter_tokens())
+        self.assertEqual(streamed, expected_tokens)
+        with self.assertRaises(AttributeError):
+            streamed[0].value = 'other'
+
+    def test_mapped_lexer_matches_lexer(self):
+        examples_dir = os.path.join(os.path.dirname(__file__), '..', 'examples')
+        sources = [
+            "",
+            "x = 12abc # ሰላም\n«እስከሆነ ድረስ x\u00a0y",
+            "እስከሆነ ድረስx; እስከሆነ ድረስ«; ፩እስከሆነ ድረስ\n'ሰላም\nዓለም' ٣ if",
+        ]
+        for name in sorted(os.listdir(examples_dir)):
+            if name.endswith('.lang'):
+                with open(os.path.join(examples_dir, name), 'r') as f:
+                    sources.append(f.read())
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'source.lang')
+            for source_code in sources:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(source_code)
+                expected = [(token.kind, token.value, token.start, token.end, token.line, token.column)
+                            for token in Lexer(source_code).tokenize()]
+                with MappedLexer(path) as lexer:
+                    tokens = [(token.kind, token.value, token.start, token.end, token.line, token.column)
+                              for token in lexer.tokenize()]
+                self.assertEqual(tokens, expected)
+            
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('x = 1\nስም = "open')
+            with MappedLexer(path) as lexer:
+                with self.assertRaises(Exception) as context:
+                    lexer.tokenize()
+            self.assertEqual((context.exception.line, context.exception.column), (2, 6))
+
+    def test_incremental_edits(self):
+        def spans(tokenize):
+            try:
+                return [(token.kind, token.value, token.start, token.end, token.line, token.column)
+                        for token in tokenize()]
+            except Exception as error:
+                return (error.line, error.column)
+        
+        source_code = "x = 1\nእስከሆነ x < 10: x = x + 1\n" * 50
+        lexer = IncrementalLexer(source_code)
+        lexer.BLOCK_SIZE = 8
+        edits = [
+            (4, 1, "42"),                 # Change a number
+            (0, 0, "# comment\n"),        # Insert a line at the top
+            (len(source_code) // 2, 0, " ድረስ"),  # Complete a keyword in the middle
+            (20, 0, '"'),                 # Open a string...
+            (40, 0, '"'),                 # ...and close it further on
+            (0, 30, ""),                  # Delete across lines
+        ]
+        for offset, removed, inserted in edits:
+            lexer.edit(offset, removed, inserted)
+            source_code = source_code[:offset] + inserted + source_code[offset + removed:]
+            self.assertEqual(lexer.source, source_code)
+            self.assertEqual(spans(lexer.tokens), spans(Lexer(source_code).tokenize))
+    
+    def test_incremental_edit_rescans_locally(self):
+        lexer = IncrementalLexer("x = 1\n" * 10000)
+        start, end = lexer.edit(30000, 0, "y")
+        self.assertLess(end - start, 1000)
+    
+    def test_incremental_unterminated_string(self):
+        lexer = IncrementalLexer("x = 1\ny = 2")
+        lexer.edit(10, 0, '"')  # Buffers may be invalid while typing
+        with self.assertRaises(Exception) as context:
+            lexer.tokens()
+        self.assertEqual((context.exception.line, context.exception.column), (2, 5))
+        lexer.edit(12, 0, '"')
+        self.assertEqual(lexer.tokens()[-1], ('STRING', '2'))
+
+    def test_layout_tokens(self):
+        source_code = "def f(n):\n    if n:  # comment\n\n        return (n +\n  1)\n    x = 2\ny = f(1)"
+        tokens = Lexer(source_code, layout=True).tokenize()
+        self.assertEqual([token.type for token in tokens], [
+            'DEF', 'IDENTIFIER', 'LPAREN', 'IDENTIFIER', 'RPAREN', 'COLON', 'NEWLINE',
+            'INDENT', 'IF', 'IDENTIFIER', 'COLON', 'NEWLINE',
+            'INDENT', 'RETURN', 'LPAREN', 'IDENTIFIER', 'PLUS', 'NUMBER', 'RPAREN', 'NEWLINE',
+            'DEDENT', 'IDENTIFIER', 'ASSIGN', 'NUMBER', 'NEWLINE',
+            'DEDENT', 'IDENTIFIER', 'ASSIGN', 'IDENTIFIER', 'LPAREN', 'NUMBER', 'RPAREN', 'NEWLINE',
+        ])
+        
+        # Without layout the same source gives the same tokens minus layout ones
+        layout_kinds = (token_kinds.NEWLINE, token_kinds.INDENT, token_kinds.DEDENT)
+        self.assertEqual([token for token in tokens if token.kind not in layout_kinds],
+                         Lexer(source_code).tokenize())
+        self.assertEqual(list(Lexer(source_code, layout=True).iter_tokens()), tokens)
+        
+        # NEWLINE sits at the end of its line; blocks still open at the end are closed
+        newline = tokens[6]
+        self.assertEqual((newline.line, newline.column), (1, 10))
+        tokens = Lexer("while x:\n    y = 1", layout=True).tokenize()
+        self.assertEqual([token.type for token in tokens[-2:]], ['NEWLINE', 'DEDENT'])
+        
+        with self.assertRaises(Exception) as context:
+            Lexer("if x:\n    y = 1\n  z = 2", layout=True).tokenize()
+        self.assertEqual((context.exception.line, context.exception.column), (3, 3))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import sys
+import os
+import unittest
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lexer.lexer import Lexer
+from src.parser.parser import Parser
+from src.optimizer import Optimizer
+from src.interpreter import Interpreter
+from src.transpiler import Transpiler
+
+class TestOptimizer(unittest.TestCase):
+    def _optimize(self, source_code):
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        optimizer = Optimizer()
+        return optimizer.optimize(ast), optimizer
+
+    def _value(self, source_code):
+        ast, _ = self._optimize(source_code)
+        return ast[0]['value']
+
+    def test_constant_folding(self):
+        self.assertEqual(self._value("x = 2 * 3 + 1"), {'type': 'Constant', 'value': 7})
+        self.assertEqual(self._value("x = 5!"), {'type': 'Constant', 'value': 120})
+        self.assertEqual(self._value("x = not true"), {'type': 'Constant', 'value': False})
+        self.assertEqual(self._value("x = 7 / 2 > 3"), {'type': 'Constant', 'value': True})
+        self.assertEqual(self._value("x = -(4 % 3)"), {'type': 'Constant', 'value': -1})
+        self.assertEqual(self._value("x = 'ab' + 'cd'"), {'type': 'Constant', 'value': 'abcd'})
+
+        # Literals are pre-converted, and non-constant parts stay in place
+        self.assertEqual(self._value("x = y + 2 * 3"), {
+            'type': 'BinaryOperation', 'operator': '+',
+            'left': {'type': 'Identifier', 'value': 'y'},
+            'right': {'type': 'Constant', 'value': 6}
+        })
+
+        # A constant left side decides and/or without the right side
+        self.assertEqual(self._value("x = 0 and f(1)"), {'type': 'Constant', 'value': 0})
+        self.assertEqual(self._value("x = 1 and f(1)")['type'], 'FunctionCall')
+        self.assertEqual(self._value("x = 2 or f(1)"), {'type': 'Constant', 'value': 2})
+
+    def test_failing_operations_are_not_folded(self):
+        ast, optimizer = self._optimize("x = 1\ny = x + 1 / 0")
+        self.assertEqual(optimizer.folded, 0)
+        self.assertEqual(ast[1]['value']['right']['operator'], '/')
+
+        with self.assertRaises(Exception) as context:
+            interpreter = Interpreter()
+            for node in ast:
+                interpreter.evaluate(node)
+        self.assertIn("Division by zero", str(context.exception))
+        self.assertEqual((context.exception.line, context.exception.column), (2, 11))
+
+    def test_identities(self):
+        ast, optimizer = self._optimize("x = (a - b) * 1 y = 1 * n! z = 0 + n! w = (a / b) - 0")
+        self.assertEqual([node['value']['type'] for node in ast],
+                         ['BinaryOperation', 'Factorial', 'Factorial', 'BinaryOperation'])
+        self.assertEqual([node['value']['operator'] for node in ast if 'operator' in node['value'].fields],
+                         ['-', '/'])
+        self.assertEqual(optimizer.simplified, 4)
+
+        # They do not apply where the other operand might not be a number:
+        # "a" + 0 fails and true * 1 is 1
+        ast, optimizer = self._optimize("x = a * 1 y = a + 0 z = (a / b) + 0 w = true * 1")
+        self.assertEqual(optimizer.simplified, 0)
+        self.assertEqual(ast[3]['value'], {'type': 'Constant', 'value': 1})
+
+    def test_backends_agree(self):
+        source_code = """
+        def fact(n): if n <= 1 * 1: return 2 - 1 else: return n * fact(n - (3 - 2))
+        x = fact(5) + 2 * 3
+        spit(x, not false, 7 / 2)
+        """
+        ast = Parser(Lexer(source_code).tokenize()).parse()
+        optimized = Optimizer().optimize(ast)
+
+        results = []
+        for program in (ast, optimized):
+            interpreter = Interpreter()
+            for node in program:
+                interpreter.evaluate(node)
+            results.append(interpreter.variables['x'])
+        self.assertEqual(results, [126, 126])
+
+        python_code = Transpiler().transpile(optimized)
+        self.assertIn("x = (fact(5) + 6)", python_code)
+        self.assertIn("print(x, True, 3.5)", python_code)
+
+    def test_dead_code_elimination(self):
+        source_code = """
+def sign(n):
+    if n < 0: return -1
+    else: return 1
+    spit("never")
+def unused(n): return unused(n - 1)
+def helper(n): return sign(n)
+if false: spit("dead")
+else: x = helper(-5)
+while 1 > 2: spit("loop")
+return 1
+y = 2
+"""
+        ast = Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+        optimizer = Optimizer()
+        ast = optimizer.optimize(ast)
+        # A return ends a block but not the program
+        self.assertEqual([node['type'] for node in ast],
+                         ['FunctionDefinition', 'FunctionDefinition', 'Assignment',
+                          'ReturnStatement', 'Assignment'])
+        self.assertEqual([node['name'] for node in ast[:2]], ['sign', 'helper'])
+        self.assertEqual(len(ast[0]['body']['statements']), 1)
+        self.assertEqual(optimizer.report(), [
+            "5:5: 1 unreachable statement(s) after return",
+            "8:11: if branch never taken, the condition is always false",
+            "10:1: while loop never runs, the condition is always false",
+            "6:1: function 'unused' is never called",
+        ])
+
+        interpreter = Interpreter()
+        for node in ast:
+            interpreter.evaluate(node)
+        self.assertEqual((interpreter.variables['x'], interpreter.variables['y']), (-1, 2))
+
+        # A top-level branch that returns must still skip the rest of it
+        ast, optimizer = self._optimize("x = 1; if true: return 1; x = 2")
+        self.assertEqual(ast[1]['type'], 'IfStatement')
+        interpreter = Interpreter()
+        for node in ast:
+            interpreter.evaluate(node)
+        self.assertEqual(interpreter.variables['x'], 1)
+
+        # Emptied bodies still transpile
+        ast, optimizer = self._optimize("x = 1 while x < 0: if false: x = 3")
+        self.assertIn("while (x < 0):\n    pass", Transpiler().transpile(ast))
+
+        ast, optimizer = Parser(Lexer("if false: x = 1").tokenize()).parse(), Optimizer(remove_dead_code=False)
+        self.assertEqual(optimizer.optimize(ast)[0]['type'], 'IfStatement')
+        self.assertEqual(optimizer.removed, [])
+
+if __name__ == '__main__':
+    unittest.main()
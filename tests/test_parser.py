@@ -1,12 +1,17 @@
 import sys
 import os
+import tempfile
 import unittest
 
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.lexer.lexer import Lexer
-from src.parser.parser import Parser
+from src.parser.parser import Parser, ParseError
+from src.parser import nodes
+from src.parser.flat import FlatAST
+from src.parser import cache
+from src.parser.cache import parse_file
 
 class TestParser(unittest.TestCase):
     def test_arithmetic_expression(self):
@@ -311,5 +316,293 @@ class TestParser(unittest.TestCase):
         
         self.assertEqual(ast, expected_ast)
 
+    def test_boolean_literals(self):
+        ast = Parser(Lexer("x = true and not ሐሰት").tokenize()).parse()
+        self.assertEqual(ast, [{
+            'type': 'Assignment',
+            'identifier': 'x',
+            'value': {
+                'type': 'LogicalOperation',
+                'operator': 'and',
+                'left': {'type': 'Boolean', 'value': 'true'},
+                'right': {'type': 'UnaryOperation', 'operator': 'not', 'operand': {'type': 'Boolean', 'value': 'ሐሰት'}}
+            }
+        }])
+        self.assertEqual(Parser(Lexer("x = true and not ሐሰት").tokenize(), iterative=True).parse(), ast)
+
+    def test_parse_streamed_tokens(self):
+        source_code = """
+        def add(a, b): return a + b
+        x = add(1, 2); if x > 2: y = 1 else: y = 0
+        i = 0; while i < 3: i = i + 1
+        """
+        expected_ast = Parser(Lexer(source_code).tokenize()).parse()
+        
+        parser = Parser(Lexer(source_code).iter_tokens())
+        ast = list(parser.iter_parse())
+        
+        self.assertEqual(ast, expected_ast)
+
+    def test_error_location(self):
+        source_code = "x = 1\ny = (2 + 3"
+        parser = Parser(Lexer(source_code).tokenize())
+        
+        with self.assertRaises(Exception) as context:
+            parser.parse()
+        
+        # Points at the last token, since the input ended early
+        self.assertEqual((context.exception.line, context.exception.column), (2, 10))
+    
+    def test_nodes_record_location(self):
+        ast = Parser(Lexer("x = 1\nif x > 0: y = x * 2").tokenize()).parse()
+        
+        multiply = ast[1]['true_branch']['statements'][0]['value']
+        self.assertEqual((ast[1].line, ast[1].column), (2, 1))
+        self.assertEqual((multiply.line, multiply.column), (2, 17))
+
+    def test_memoized_parse(self):
+        source_code = """
+        def add(a, b): return a + b
+        x = add(1, 2); if x > 2: y = (1 + (2 * 3)) else: y = 0
+        i = 0; while i < 3: i = i + 1
+        """
+        tokens = Lexer(source_code).tokenize()
+        parser = Parser(tokens, memoize=True)
+        
+        self.assertEqual(parser.parse(), Parser(tokens).parse())
+        
+        # Re-parsing from any position reuses the cached results, so each
+        # (rule, position) pair is computed at most once
+        def parse_everywhere():
+            for position in range(len(tokens)):
+                try:
+                    parser.parse_at(position)
+                except Exception:
+                    pass
+        parse_everywhere()
+        stats = parser.memo_stats()
+        self.assertLessEqual(stats['misses'], len(Parser.MEMOIZED_RULES) * len(tokens))
+        
+        # A second sweep is answered entirely from the cache
+        parse_everywhere()
+        self.assertEqual(parser.memo_stats()['misses'], stats['misses'])
+        self.assertEqual(parser.memo_stats()['hits'], stats['hits'] + len(tokens))
+        
+        statement, end = parser.parse_at(0)
+        self.assertEqual(statement['type'], 'FunctionDefinition')
+    
+    def test_memo_cache_is_bounded(self):
+        tokens = Lexer("x = 1; " * 200).tokenize()
+        parser = Parser(tokens, memoize=True, memo_size=16)
+        parser.parse()
+        
+        stats = parser.memo_stats()
+        self.assertEqual(stats['size'], 16)
+        self.assertGreater(stats['evictions'], 0)
+
+    def test_iterative_parse(self):
+        source_code = """
+        def add(a, b): return a + b * -(a - 1)
+        x = add(1, add(2, 3)); if not x > 2 and x != 0: y = (1 + (2 * 3)) else: y = 0
+        i = 0; while i < 3: if i == 1: spit(i, "one"); i = i + 1
+        """
+        tokens = Lexer(source_code).tokenize()
+        self.assertEqual(Parser(tokens, iterative=True).parse(), Parser(tokens).parse())
+
+        with self.assertRaises(Exception) as context:
+            Parser(Lexer("x = 1\ny = f((2 + 3), 4").tokenize(), iterative=True).parse()
+        self.assertEqual((context.exception.line, context.exception.column), (2, 16))
+
+    def test_iterative_deep_nesting(self):
+        depth = 100_000
+        limit = sys.getrecursionlimit()
+
+        def nesting(node, key):
+            levels = 0
+            while node['type'] != 'Number':
+                node = node[key]
+                levels += 1
+            return levels
+
+        ast = Parser(Lexer("x = " + "(" * depth + "1" + ")" * depth).tokenize(), iterative=True).parse()
+        self.assertEqual(ast[0]['value'], {'type': 'Number', 'value': '1'})
+
+        ast = Parser(Lexer("x = " + "-" * depth + "1").tokenize(), iterative=True).parse()
+        self.assertEqual(nesting(ast[0]['value'], 'operand'), depth)
+
+        ast = Parser(Lexer("if x: while y: " * (depth // 2) + "z = 1").tokenize(), iterative=True).parse()
+        node = ast[0]
+        for _ in range(depth // 2):
+            node = node['true_branch']['statements'][0]['body']['statements'][0]
+        self.assertEqual(node['type'], 'Assignment')
+
+        self.assertEqual(sys.getrecursionlimit(), limit)
+
+    def test_layout_blocks(self):
+        source_code = """
+def is_prime(n):
+    i = 2
+    while i < n:
+        if n % i == 0: return 0
+        i = i + 1
+    return 1
+
+if is_prime(7):
+    x = 1; y = 2
+else: x = 0
+spit(x)
+"""
+        tokens = Lexer(source_code, layout=True).tokenize()
+        ast = Parser(tokens, layout=True).parse()
+        self.assertEqual([node['type'] for node in ast], ['FunctionDefinition', 'IfStatement', 'SpitFunction'])
+        
+        # The loop body ends at the dedent, not at a guessed statement
+        body = ast[0]['body']['statements']
+        self.assertEqual([node['type'] for node in body], ['Assignment', 'WhileStatement', 'ReturnStatement'])
+        loop = body[1]['body']['statements']
+        self.assertEqual([node['type'] for node in loop], ['IfStatement', 'Assignment'])
+        self.assertEqual(len(ast[1]['true_branch']['statements']), 2)
+        self.assertEqual(ast[1]['false_branch']['statements'][0]['value'], {'type': 'Number', 'value': '0'})
+        self.assertEqual(Parser(tokens, layout=True, iterative=True).parse(), ast)
+        
+        # One-line if/else still works in layout mode
+        ast = Parser(Lexer("if x > 0: y = 1 else: y = 0", layout=True).tokenize(), layout=True).parse()
+        self.assertEqual(ast, Parser(Lexer("if x > 0: y = 1 else: y = 0").tokenize()).parse())
+        
+        with self.assertRaises(Exception) as context:
+            Parser(Lexer("while x:\ny = 1", layout=True).tokenize(), layout=True).parse()
+        self.assertEqual((context.exception.line, context.exception.column), (2, 1))
+
+    def test_error_recovery(self):
+        source_code = "x = (1 + ; y = 2\ndef f(a b): return a\nif x y = 1\nwhile 1: q = )\ndef g(): return 1"
+        tokens = Lexer(source_code).tokenize()
+        parser = Parser(tokens, recover=True)
+        ast = parser.parse()
+        
+        # Every error is reported, and the statements around them survive
+        self.assertEqual([(error.line, error.column) for error in parser.errors],
+                         [(1, 10), (2, 9), (3, 6), (4, 14)])
+        self.assertEqual([node['type'] for node in ast],
+                         ['Error', 'Assignment', 'Error', 'Error', 'WhileStatement', 'FunctionDefinition'])
+        self.assertEqual(ast[4]['body']['statements'][0]['type'], 'Error')
+        
+        iterative = Parser(tokens, recover=True, iterative=True)
+        self.assertEqual(iterative.parse(), ast)
+        self.assertEqual([str(error) for error in iterative.errors], [str(error) for error in parser.errors])
+        
+        # In layout mode a broken statement is skipped up to the end of its
+        # line or block
+        source_code = "def f(a):\n    x = a +\n    if x:\n        z = )\n    return x\nok = 1"
+        parser = Parser(Lexer(source_code, layout=True).tokenize(), layout=True, recover=True)
+        ast = parser.parse()
+        self.assertEqual([(error.line, error.column) for error in parser.errors], [(2, 12), (4, 13)])
+        self.assertEqual([node['type'] for node in ast[0]['body']['statements']],
+                         ['Error', 'IfStatement', 'ReturnStatement'])
+        self.assertEqual(ast[1]['identifier'], 'ok')
+
+    def test_typed_nodes(self):
+        ast = Parser(Lexer("if x > 1: y = -x!").tokenize()).parse()
+        node = ast[0]
+        self.assertIsInstance(node, nodes.IfStatement)
+        self.assertEqual(node.kind, nodes.IF_STATEMENT)
+        self.assertEqual(nodes.NODE_TYPES[node.kind], 'IfStatement')
+        self.assertEqual(node.condition.left.value, 'x')
+        self.assertIs(node['condition'], node.condition)
+        self.assertFalse(hasattr(node, '__dict__'))
+        
+        # to_dict() is the original dict AST, with the same key order
+        expected = {
+            'type': 'IfStatement',
+            'condition': {
+                'type': 'Comparison',
+                'operator': '>',
+                'left': {'type': 'Identifier', 'value': 'x'},
+                'right': {'type': 'Number', 'value': '1'}
+            },
+            'true_branch': {'type': 'Block', 'statements': [{
+                'type': 'Assignment',
+                'identifier': 'y',
+                'value': {'type': 'UnaryOperation', 'operator': '-', 'operand': {
+                    'type': 'Factorial', 'value': {'type': 'Identifier', 'value': 'x'}}}
+            }]},
+            'false_branch': None
+        }
+        self.assertEqual(node.to_dict(), expected)
+        self.assertEqual(list(node.to_dict()), list(expected))
+        self.assertIs(type(node.to_dict()['true_branch']['statements'][0]), dict)
+        self.assertEqual(node, expected)
+        self.assertNotEqual(node.condition, dict(expected['condition'], operator='<'))
+        self.assertEqual(repr(node), repr(expected))
+
+    def test_flat_ast(self):
+        source_code = "def f(a, b):\n    if a > b: return a\n    return b\nspit(f(1, 2), -x!)"
+        ast = Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+        flat = FlatAST.from_ast(ast)
+        
+        # Views read like the original nodes, locations included
+        self.assertEqual(list(flat), ast)
+        self.assertEqual([node.to_dict() for node in flat], [node.to_dict() for node in ast])
+        definition = flat.node(flat.roots[0])
+        self.assertEqual((definition.kind, definition.name, definition.parameters), (nodes.FUNCTION_DEFINITION, 'f', ['a', 'b']))
+        self.assertEqual((definition.line, definition.column), (1, 1))
+        self.assertIsNone(definition.body.statements[0].false_branch)
+        
+        # walk() visits every node once, in preorder
+        indices = list(flat.walk())
+        self.assertEqual(sorted(indices), list(range(len(flat))))
+        self.assertEqual([nodes.NODE_TYPES[flat.kind(index)] for index in indices[:4]],
+                         ['FunctionDefinition', 'Block', 'IfStatement', 'Comparison'])
+        self.assertEqual(flat.text(flat.child(indices[2], 'condition'), 'operator'), '>')
+        
+        # Plain dicts convert too, at any depth
+        deep = {'type': 'Number', 'value': '1'}
+        for _ in range(100000):
+            deep = {'type': 'UnaryOperation', 'operator': '-', 'operand': deep}
+        flat = FlatAST.from_ast([deep])
+        self.assertEqual(len(flat), 100001)
+        self.assertEqual(len(list(flat.walk())), 100001)
+        
+        self.assertEqual(FlatAST.from_ast(ast).to_ast(), ast)
+
+    def test_parse_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.lang')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("def ደምር(a, b):\n    return a + b\nspit(ደምር(1, 2))\n")
+            ast = parse_file(path)
+            self.assertTrue(os.path.exists(cache.cache_path(path)))
+            
+            # A fresh cache is loaded instead of parsing, locations included
+            with open(path, 'rb') as f:
+                digest = cache.source_digest(f.read())
+            flat = cache.read_cache(path, digest)
+            self.assertEqual(flat.to_ast(), ast)
+            self.assertEqual(cache.read_cache(path, digest, mapped=True).to_ast(), ast)
+            cached = parse_file(path, mapped=True)
+            self.assertEqual(cached, ast)
+            self.assertEqual([(node.line, node.column) for node in cached], [(1, 1), (3, 1)])
+            
+            # Other parse modes, sources and versions do not match
+            self.assertIsNone(cache.read_cache(path, digest, layout=False))
+            self.assertIsNone(cache.read_cache(path, cache.source_digest(b'x = 1')))
+            with open(cache.cache_path(path), 'rb') as f:
+                data = f.read()
+            self.assertIsNone(cache.load(data[:-3], digest))
+            
+            # Changing the source invalidates the cache
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("x = 1\n")
+            self.assertEqual(parse_file(path), [{'type': 'Assignment', 'identifier': 'x',
+                                                 'value': {'type': 'Number', 'value': '1'}}])
+            self.assertEqual(parse_file(path), parse_file(path, use_cache=False))
+            
+            # A syntax error is raised as usual and nothing is cached
+            broken = os.path.join(directory, 'broken.lang')
+            with open(broken, 'w', encoding='utf-8') as f:
+                f.write("x = (1 +\n")
+            with self.assertRaises(ParseError):
+                parse_file(broken)
+            self.assertFalse(os.path.exists(cache.cache_path(broken)))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
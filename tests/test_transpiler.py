@@ -1,6 +1,10 @@
 import sys
 import os
+import io
+import ast as pyast
+import tempfile
 import unittest
+import contextlib
 
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -8,6 +12,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from src.lexer.lexer import Lexer
 from src.parser.parser import Parser
 from src.transpiler import Transpiler
+from src.transpiler import pycode
+from src.transpiler.pycode import PythonCompiler, CompileError, run, program_variables
+from src.interpreter import InterpreterError
 
 class TestTranspiler(unittest.TestCase):
     def _transpile(self, source_code):
@@ -72,5 +79,82 @@ class TestTranspiler(unittest.TestCase):
         expected = "def fibonacci(n):\n    if (n <= 1):\n        return n\n    else:\n        return (fibonacci((n - 1)) + fibonacci((n - 2)))\nresult = fibonacci(10)"
         self.assertEqual(result.strip(), expected.strip())
 
+class TestPythonCompiler(unittest.TestCase):
+    def _parse(self, source_code):
+        return Parser(Lexer(source_code, layout=True).tokenize(), layout=True).parse()
+    
+    def _run(self, source_code):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            variables = program_variables(run(PythonCompiler().compile(self._parse(source_code))))
+        return output.getvalue(), variables
+    
+    def test_run_in_process(self):
+        output, variables = self._run(
+            "def fact(n):\n"
+            "    if n <= 1: return 1\n"
+            "    return n * fact(n - 1)\n"
+            "i = 0\n"
+            "total = 0\n"
+            "while i < 5 እና not (i == 3):\n"
+            "    total = total + i\n"
+            "    i = i + 1\n"
+            "ስም = \"a\\nb\"\n"
+            "spit(fact(5), 4!, total, -i, true)\n")
+        self.assertEqual(output, "120 24 3 -3 True\n")
+        # Strings keep their characters as the interpreter prints them
+        self.assertEqual(variables, {'i': 3, 'total': 3, 'ስም': 'a\\nb'})
+    
+    def test_module_matches_transpiler(self):
+        ast = self._parse("def fib(n):\n"
+                          "    if n < 2 ወይም n == 2: return n\n"
+                          "    else: return fib(n - 1) + fib(n - 2)\n"
+                          "x = fib(10) % 7 * 3!\n"
+                          "while x > 0:\n"
+                          "    x = x - 1\n")
+        module = PythonCompiler().module(ast)
+        self.assertEqual(pyast.dump(module), pyast.dump(pyast.parse(Transpiler().transpile(ast))))
+        self.assertEqual([(node.lineno, node.col_offset) for node in module.body],
+                         [(1, 0), (4, 0), (5, 0)])
+    
+    def test_errors(self):
+        # Runtime errors are located at the failing node of the program
+        with self.assertRaises(InterpreterError) as context:
+            self._run("def f(a):\n    return a / 0\nx = f(1)\n")
+        self.assertEqual((context.exception.line, context.exception.column), (2, 14))
+        with self.assertRaises(InterpreterError) as context:
+            self._run("x = 1\nspit(y)\n")
+        self.assertEqual((context.exception.line, context.exception.column), (2, 6))
+        
+        with self.assertRaises(CompileError) as context:
+            PythonCompiler().compile(self._parse("x = 1\nreturn x\n"))
+        self.assertEqual(context.exception.message, "'return' outside function")
+        self.assertEqual(context.exception.line, 2)
+    
+    def test_code_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.lang')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("x = 6 * 7\n")
+            code = pycode.compile_file(path)
+            self.assertEqual(run(code)['x'], 42)
+            self.assertTrue(os.path.exists(pycode.code_cache_path(path)))
+            
+            # A fresh cache file is loaded; other flags or sources do not match
+            with open(path, 'rb') as f:
+                digest = pycode.source_digest(f.read())
+            self.assertEqual(pycode.read_code_cache(path, digest), code)
+            self.assertIsNone(pycode.read_code_cache(path, digest, optimize=False))
+            self.assertIsNone(pycode.read_code_cache(path, pycode.source_digest(b'x = 1')))
+            with open(pycode.code_cache_path(path), 'rb') as f:
+                data = f.read()
+            self.assertIsNone(pycode.load_code(data[:-3], digest))
+            
+            # Changing the source compiles it again
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("x = 1\n")
+            self.assertEqual(run(pycode.compile_file(path))['x'], 1)
+            self.assertEqual(run(pycode.compile_file(path, use_cache=False))['x'], 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file